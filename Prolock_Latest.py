@@ -1,17 +1,38 @@
+import os
 import threading
 import time
-import serial
-import adafruit_fingerprint
-import nfc
 import tkinter as tk
 from tkinter import ttk, font, messagebox
 from PIL import Image, ImageTk
-import RPi.GPIO as GPIO
 import requests
 from datetime import datetime, timedelta
-import pyttsx3  # Import pyttsx3 for text-to-speech
-
-API_URL = 'https://prolocklogger.pro/api'
+try:
+    import pyttsx3  # Import pyttsx3 for text-to-speech
+except ImportError:
+    pyttsx3 = None  # Announcements are printed instead of spoken
+from prolock_http import ProLockClient, EndpointPolicy
+from prolock_clock import ServerClock
+from prolock_schedule import ScheduleStore
+from prolock_journal import AttendanceJournal
+from prolock_capture import FingerprintCapture
+from prolock_cache import TTLCache, CredentialDirectory
+from prolock_dispatch import UiDispatcher
+from prolock_logs import LogsTableModel, LogFeed
+from prolock_door_channel import DoorCommandChannel
+from prolock_closeout import SessionCloser
+from prolock_buzzer import BuzzerScheduler
+from prolock_door import DoorController, UNLOCKED_REMOTE
+from prolock_announcer import Announcer
+from prolock_hal import FingerprintStatus, create_backend
+from prolock_trace import Tracer
+from prolock_metrics import MetricsRegistry, MetricsServer
+from prolock_slots import SlotAllocator
+from prolock_vault import TemplateVault
+from prolock_sensor_link import SensorLink
+from prolock_sensor_service import ENROLL, MAINTENANCE, SCAN, SensorBusy, SensorLinkError, SensorService
+from prolock_search import HotSetSearch
+
+API_URL = os.environ.get('PROLOCK_API_URL', 'https://prolocklogger.pro/api')  # Point at a mock server for benchmarks
 
 # API URLs for Fingerprint, NFC, and Current Date-Time
 FINGERPRINT_API_URL = f'{API_URL}/getuserbyfingerprint/'
@@ -24,28 +45,84 @@ USER_INFO_URL = f'{API_URL}/user-information/by-id-card'
 RECENT_LOGS_URL = f'{API_URL}/recent-logs'
 TIME_IN_URL = f'{API_URL}/logs/time-in'
 TIME_OUT_URL = f'{API_URL}/logs/time-out'
+TIME_OUT_BULK_URL = f'{API_URL}/logs/time-out/bulk'  # Accepts {"rfid_numbers": [...], "time_out": "HH:MM"}
 RECENT_LOGS_URL2 = f'{API_URL}/recent-logs/by-uid'
 CURRENT_DATE_TIME_URL = f'{API_URL}/current-date-time'
 LAB_SCHEDULE_URL = f'{API_URL}/student/lab-schedule/rfid/'
 LOGS_URL = f'{API_URL}/logs'
+DOOR_EVENTS_URL = f'{API_URL}/door/events'  # Server-Sent Events stream of remote open/close commands
+STUDENTS_URL = f'{API_URL}/users/role/3'  # Bulk list of students (role 3) used to fill the card directory
 
 # Laravel API endpoint URLs
 FACULTIES_URL = f'{API_URL}/users/role/2'
 ENROLL_URL = f'{API_URL}/users/update-fingerprint'
 ADMIN_URL = f'{API_URL}/admin/role/1'
 
+# Shared keep-alive client so a scan reuses one TLS connection instead of a new handshake per request.
+# Door decisions get short timeouts; time-in/time-out writes are never retried to avoid duplicate logs.
+api_client = ProLockClient({
+    CURRENT_DATE_TIME_URL: EndpointPolicy(timeout=(2, 3), retries=2),
+    FINGERPRINT_API_URL: EndpointPolicy(timeout=(2, 4), retries=1),
+    USER_INFO_URL: EndpointPolicy(timeout=(2, 4), retries=1),
+    LAB_SCHEDULE_FINGERPRINT_URL: EndpointPolicy(timeout=(2, 4), retries=1),
+    LAB_SCHEDULE_URL: EndpointPolicy(timeout=(2, 4), retries=1),
+    RECENT_LOGS_FINGERPRINT_URL2: EndpointPolicy(timeout=(2, 4), retries=1),
+    RECENT_LOGS_URL2: EndpointPolicy(timeout=(2, 4), retries=1),
+    TIME_IN_FINGERPRINT_URL: EndpointPolicy(timeout=(2, 6), retries=0),
+    TIME_OUT_FINGERPRINT_URL: EndpointPolicy(timeout=(2, 6), retries=0),
+    TIME_IN_URL: EndpointPolicy(timeout=(2, 6), retries=0),
+    TIME_OUT_URL: EndpointPolicy(timeout=(2, 6), retries=0),
+    TIME_OUT_BULK_URL: EndpointPolicy(timeout=(2, 15), retries=0),
+    RECENT_LOGS_URL: EndpointPolicy(timeout=(3, 10), retries=1),
+    DOOR_EVENTS_URL: EndpointPolicy(timeout=(5, 45), retries=0),
+    LOGS_URL: EndpointPolicy(timeout=(3, 10), retries=0),
+    FACULTIES_URL: EndpointPolicy(timeout=(3, 10), retries=2),
+    ADMIN_URL: EndpointPolicy(timeout=(3, 10), retries=2),
+    STUDENTS_URL: EndpointPolicy(timeout=(3, 20), retries=2),
+    ENROLL_URL: EndpointPolicy(timeout=(3, 10), retries=0),
+}, default_policy=EndpointPolicy(timeout=(3, 10), retries=1))
+
+# Local schedule database, kept in sync in the background so access checks work offline
+SCHEDULE_DB_PATH = 'prolock_schedules.db'
+
+# Time-in/time-out writes are journaled here first and delivered by a background sender
+JOURNAL_PATH = 'prolock_journal.log'
+
+# Fingerprint ID -> user record cache, persisted so identity lookups work right after a restart
+USER_CACHE_PATH = 'prolock_users.json'
+CARD_DIRECTORY_PATH = 'prolock_cards.json'
+FINGERPRINT_SLOTS_PATH = 'prolock_slots.json'  # Occupancy bitmap of the sensor's template library
+SENSOR_LINK_PATH = 'prolock_sensor_link.json'  # Baud rate and packet size the sensor was last set to
+TEMPLATE_VAULT_PATH = 'prolock_templates.vault'  # Off-sensor copy of every fingerprint template
+TEMPLATE_BACKUP_URL = None  # Set to a server endpoint that accepts the vault file to keep a copy off the kiosk
+ANNOUNCEMENT_CACHE_DIR = 'prolock_announcements'  # Pre-rendered WAV files, one per phrase
+TRACE_EXPORT_PATH = 'prolock_traces.jsonl'  # Recent scan traces are appended here from the trace viewer
+TRACE_BUFFER_SIZE = 200
+
+# Prometheus metrics for this door are served at http://METRICS_HOST:METRICS_PORT/metrics; port 0 picks a free port.
+# The endpoint has no authentication and lists per-user counters, so it listens on loopback only unless
+# PROLOCK_METRICS_HOST is set (e.g. to the kiosk's address on the monitoring network) to expose it.
+METRICS_HOST = os.environ.get('PROLOCK_METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.environ.get('PROLOCK_METRICS_PORT', '9108'))
+
+# Scan outcomes counted as denials in the metrics
+DENIAL_OUTCOMES = ('denied', 'no_match', 'unknown_user', 'unknown_card', 'image_failed')
+
 # GPIO pin configuration for the solenoid lock and buzzer
 SOLENOID_PIN = 17
 BUZZER_PIN = 27
+FINGER_TOUCH_PIN = None  # Set to the BCM pin wired to the sensor's touch/wake output to wait on it instead of polling
+
+# Seconds before the door relocks by itself; None keeps it unlocked until a matching lock command
+CREDENTIAL_RELOCK_SECONDS = 5
+REMOTE_RELOCK_SECONDS = 15 * 60
+ALARM_HOLD_SECONDS = 10
 
-# Setup GPIO
-GPIO.setmode(GPIO.BCM)
-GPIO.setup(SOLENOID_PIN, GPIO.OUT)
-GPIO.setup(BUZZER_PIN, GPIO.OUT)
+# Faculty whose class at this door starts or ends within this many minutes are searched for first
+HOT_SET_MARGIN_MINUTES = 15
 
-# Initialize serial connection for the fingerprint sensor
-uart = serial.Serial("/dev/ttyUSB0", baudrate=57600, timeout=1)
-finger = adafruit_fingerprint.Adafruit_Fingerprint(uart)
+# Seconds enrollment waits for a finger before giving up
+ENROLL_FINGER_TIMEOUT = 30
 
 
 # Initialize Tkinter window
@@ -63,7 +140,12 @@ class FingerprintEnrollment:
         self.root = root
         self.attendance_app = attendance_app
         self.frame = ttk.Frame(root)
-        self.next_fingerprint_id = self.get_highest_fingerprint_id() + 1  # Properly initialize next_fingerprint_id
+        self.enrolling = False
+        # The sensor is claimed for enrollment while this screen is open; commands still go through its one thread
+        self.sensor = attendance_app.sensor
+        self.finger = self.sensor.client(ENROLL, 'enrollment')
+        self.capture = FingerprintCapture(self.finger, gpio=attendance_app.gpio, touch_pin=FINGER_TOUCH_PIN)
+        self.slots = attendance_app.slots  # Free slots come from the stored bitmap, not a read_templates()
 
         # Create a canvas to handle the background color as ttk.Frame does not directly support bg color
         self.canvas = tk.Canvas(self.frame, bg='#2D3F7C')
@@ -90,6 +172,7 @@ class FingerprintEnrollment:
         )
         left_image_button.image = left_photo  # Keep a reference to avoid garbage collection
         left_image_button.pack(side="left", padx=1)
+        self.back_button = left_image_button
 
         # Define custom fonts
         heading_font = font.Font(family="Helvetica", size=16, weight="bold")
@@ -163,6 +246,16 @@ class FingerprintEnrollment:
         enroll_button.place(relx=0.61, rely=button_y_start,
                             anchor='center')  # Position right side of center within panel
 
+        # Template backup and restore, for replacing the sensor without re-enrolling everyone
+        backup_button = tk.Button(panel, text="Back Up Templates", font=bold_font, width=20, height=2, bg="#D3D1ED",
+                                  command=self.on_backup_button_click)
+        backup_button.place(relx=0.39, rely=button_y_start + button_spacing, anchor='center')
+        restore_button = tk.Button(panel, text="Restore Templates", font=bold_font, width=20, height=2, bg="#D3D1ED",
+                                   command=self.on_restore_button_click)
+        restore_button.place(relx=0.61, rely=button_y_start + button_spacing, anchor='center')
+        self.vault_status = tk.Label(panel, text="", font=bold_font, bg="#F6F5FB")
+        self.vault_status.place(relx=0.5, rely=button_y_start + 2 * button_spacing, anchor='center')
+
         # "Back to Main" Button
         # back_button = tk.Button(panel, text="Back to Main", font=bold_font, width=20, height=2, command=self.back_to_attendance)
         # back_button.place(relx=0.5, rely=button_y_start + button_spacing, anchor='center')  # Centered below other buttons in the panel
@@ -178,29 +271,39 @@ class FingerprintEnrollment:
         """Hide the Fingerprint Enrollment frame."""
         self.frame.pack_forget()
 
+    def set_busy(self, busy):
+        """Mark an enroll, backup or restore job as running; Back is disabled until it finishes."""
+        self.enrolling = busy
+        self.back_button.config(state="disabled" if busy else "normal")
+
     def back_to_attendance(self):
         """Hide current frame and show AttendanceApp frame."""
+        if self.enrolling:
+            return  # A job still holds the sensor's char buffers; scanning would overwrite them
         self.hide()
         self.attendance_app.show()
+        self.sensor.release('enrollment')
         self.attendance_app.start_fingerprint_scanning()  # Restart fingerprint scanning
 
+    def notify(self, show, title, message):
+        """Show a message box from any thread by handing it to the Tk main loop."""
+        self.attendance_app.dispatcher.call_soon(show, title, message)
+
     def get_user(self, fingerprint_id):
         """Fetch user information by fingerprint ID."""
         try:
-            response = requests.get(f"{FINGERPRINT_API_URL}{fingerprint_id}")
-            response.raise_for_status()
-            data = response.json()
-            if 'name' in data:
+            data = self.attendance_app.user_cache.get_or_load(fingerprint_id)
+            if data and 'name' in data:
                 return data['name']
             return None
         except requests.RequestException as e:
-            messagebox.showerror("Request Error", f"Failed to connect to API: {e}")
+            self.notify(messagebox.showerror, "Request Error", f"Failed to connect to API: {e}")
             return None
 
     def fetch_faculty_data(self):
         """Fetch faculty data from the Laravel API, excluding those with exactly two or more registered fingerprint IDs."""
         try:
-            response = requests.get(FACULTIES_URL)
+            response = api_client.get(FACULTIES_URL)
             response.raise_for_status()
             data = response.json()
 
@@ -213,13 +316,13 @@ class FingerprintEnrollment:
             return filtered_data
 
         except requests.RequestException as e:
-            messagebox.showerror("Error", f"Error fetching faculty data: {e}")
+            self.notify(messagebox.showerror, "Error", f"Error fetching faculty data: {e}")
             return []
 
     def fetch_admin_data(self):
         """Fetch admin data from the Laravel API, excluding those with exactly two or more registered fingerprint IDs."""
         try:
-            response = requests.get(ADMIN_URL)
+            response = api_client.get(ADMIN_URL)
             response.raise_for_status()
             data = response.json()
 
@@ -232,42 +335,26 @@ class FingerprintEnrollment:
             return filtered_data
 
         except requests.RequestException as e:
-            messagebox.showerror("Error", f"Error fetching faculty data: {e}")
+            self.notify(messagebox.showerror, "Error", f"Error fetching faculty data: {e}")
             return []
 
     def post_fingerprint(self, email, fingerprint_id):
         """Post fingerprint data to the Laravel API."""
         try:
             url = f"{ENROLL_URL}?email={email}&fingerprint_id={fingerprint_id}"
-            response = requests.put(url)
+            response = api_client.put(url)
             response.raise_for_status()
-            messagebox.showinfo("Success", "Fingerprint enrolled successfully")
+            self.notify(messagebox.showinfo, "Success", "Fingerprint enrolled successfully")
         except requests.RequestException as e:
-            messagebox.showerror("Error", f"Error posting fingerprint data: {e}")
-
-    def get_highest_fingerprint_id(self):
-        """Fetch the highest fingerprint ID stored in the sensor."""
-        try:
-            # Read all stored fingerprint templates
-            if finger.read_templates() != adafruit_fingerprint.OK:
-                return 0  # Return 0 if no fingerprints are stored
-
-            # Find the highest ID among the stored fingerprints
-            if finger.templates:
-                return max(finger.templates)
-            else:
-                return 0
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to read stored fingerprints: {e}")
-            return 0
+            self.notify(messagebox.showerror, "Error", f"Error posting fingerprint data: {e}")
 
     def check_fingerprint_exists(self):
         """Check if the current fingerprint is already registered."""
         print("Searching for existing fingerprint...")
-        if finger.finger_search() == adafruit_fingerprint.OK:
-            existing_user = self.get_user(finger.finger_id)
+        if self.finger.finger_search() == FingerprintStatus.OK:
+            existing_user = self.get_user(self.finger.finger_id)
             if existing_user:
-                messagebox.showwarning("Error", f"Fingerprint already registered to {existing_user}")
+                self.notify(messagebox.showwarning, "Error", f"Fingerprint already registered to {existing_user}")
                 return True
         return False
 
@@ -275,56 +362,70 @@ class FingerprintEnrollment:
         """Enroll a fingerprint for a faculty member, ensuring it's not already registered."""
         print("Waiting for image...")
         # Attempt to capture the first image
-        while finger.get_image() != adafruit_fingerprint.OK:
-            pass
+        deadline = time.monotonic() + ENROLL_FINGER_TIMEOUT
+        result = self.capture.capture_template(1, should_continue=lambda: time.monotonic() < deadline)
+        if result is None:
+            self.notify(messagebox.showwarning, "Error", "Timed out waiting for a finger on the sensor.")
+            return False
 
         print("Templating first image...")
-        if finger.image_2_tz(1) != adafruit_fingerprint.OK:
-            messagebox.showwarning("Error", "Failed to template the first fingerprint image.")
+        if result != FingerprintStatus.OK:
+            self.notify(messagebox.showwarning, "Error", "Failed to template the first fingerprint image.")
             return False
 
         print("Checking if fingerprint is already registered...")
-        if finger.finger_search() == adafruit_fingerprint.OK:
-            existing_user = self.get_user(finger.finger_id)
+        if self.finger.finger_search() == FingerprintStatus.OK:
+            existing_user = self.get_user(self.finger.finger_id)
             if existing_user:
-                messagebox.showwarning("Error", f"Fingerprint already registered to {existing_user}")
+                self.notify(messagebox.showwarning, "Error", f"Fingerprint already registered to {existing_user}")
                 return False
 
         # Prompt to place the finger again for verification
         print("Place the same finger again...")
-        while finger.get_image() != adafruit_fingerprint.OK:
-            pass
+        deadline = time.monotonic() + ENROLL_FINGER_TIMEOUT
+        result = self.capture.capture_template(2, should_continue=lambda: time.monotonic() < deadline)
+        if result is None:
+            self.notify(messagebox.showwarning, "Error", "Timed out waiting for a finger on the sensor.")
+            return False
 
         print("Templating second image...")
-        if finger.image_2_tz(2) != adafruit_fingerprint.OK:
-            messagebox.showwarning("Error", "Failed to template the second fingerprint image.")
+        if result != FingerprintStatus.OK:
+            self.notify(messagebox.showwarning, "Error", "Failed to template the second fingerprint image.")
             return False
 
         print("Re-Checking if fingerprint is already registered...")
-        if finger.finger_search() == adafruit_fingerprint.OK:
-            existing_user = self.get_user(finger.finger_id)
+        if self.finger.finger_search() == FingerprintStatus.OK:
+            existing_user = self.get_user(self.finger.finger_id)
             if existing_user:
-                messagebox.showwarning("Error", f"Fingerprint already registered to {existing_user}")
+                self.notify(messagebox.showwarning, "Error", f"Fingerprint already registered to {existing_user}")
                 return False
 
         print("Creating model from images...")
-        if finger.create_model() != adafruit_fingerprint.OK:
-            messagebox.showwarning("Error", "Failed to create fingerprint model from images.")
+        if self.finger.create_model() != FingerprintStatus.OK:
+            self.notify(messagebox.showwarning, "Error", "Failed to create fingerprint model from images.")
             return False
 
-        # Use self.next_fingerprint_id here
-        print(f"Storing model at location #{self.next_fingerprint_id}...")
-        if finger.store_model(self.next_fingerprint_id) != adafruit_fingerprint.OK:
-            messagebox.showwarning("Error", "Failed to store fingerprint model.")
+        # Store in the lowest free slot, so slots freed on the sensor are reused
+        fingerprint_id = self.sensor.run(self.slots.allocate, priority=ENROLL, owner='enrollment')
+        if fingerprint_id is None:
+            self.notify(messagebox.showwarning, "Error", "The fingerprint sensor is full.")
             return False
+        print(f"Storing model at location #{fingerprint_id}...")
+        if self.finger.store_model(fingerprint_id) != FingerprintStatus.OK:
+            self.slots.release(fingerprint_id)
+            self.notify(messagebox.showwarning, "Error", "Failed to store fingerprint model.")
+            return False
+        self.slots.commit(fingerprint_id)
 
         # Post the fingerprint data to the API
-        self.post_fingerprint(email, self.next_fingerprint_id)
-        self.next_fingerprint_id += 1  # Increment the ID for the next registration
+        self.post_fingerprint(email, fingerprint_id)
+        self.attendance_app.user_cache.invalidate(fingerprint_id)  # Drop any cached "not registered" answer
         return True
 
     def on_enroll_button_click(self):
         """Callback function for the enroll button."""
+        if self.enrolling:
+            return
         selected_item = self.tree.selection()
         if not selected_item:
             messagebox.showwarning("Selection Error", "Please select a row from the table.")
@@ -334,31 +435,105 @@ class FingerprintEnrollment:
         table_name = item['values'][0]  # Assuming name is in the first column
         email = item['values'][1]  # Assuming email is in the second column
 
-        # Enroll fingerprint with the selected email
-        success = self.enroll_fingerprint(email)
+        # Enroll fingerprint with the selected email; the sensor wait runs off the Tk thread
+        self.set_busy(True)
+        self.attendance_app.dispatcher.submit(self.enroll_fingerprint, email, on_done=self.on_enroll_finished,
+                                              on_error=self.on_enroll_failed)
+
+    def on_enroll_finished(self, success):
+        self.set_busy(False)
         if not success:
             messagebox.showwarning("Enrollment Error", "Failed to enroll fingerprint.")
         else:
             # Refresh the table to update or remove the faculty if they now have 2 fingerprints
             self.refresh_table()
 
+    def on_enroll_failed(self, error):
+        self.set_busy(False)
+        messagebox.showerror("Enrollment Error", f"Failed to enroll fingerprint: {error}")
+
+    def on_backup_button_click(self):
+        if self.enrolling:
+            return
+        self.set_busy(True)
+        self.attendance_app.dispatcher.submit(self.backup_templates, on_done=self.on_vault_finished,
+                                              on_error=self.on_vault_failed)
+
+    def on_restore_button_click(self):
+        if self.enrolling:
+            return
+        vault = TemplateVault(TEMPLATE_VAULT_PATH)
+        if not vault.templates:
+            messagebox.showwarning("Restore", "There is no template backup on this kiosk.")
+            return
+        if not messagebox.askyesno("Restore", f"Write {len(vault.templates)} templates to the sensor? "
+                                              "Templates in the same slots are overwritten."):
+            return
+        self.set_busy(True)
+        self.attendance_app.dispatcher.submit(self.restore_templates, vault, on_done=self.on_vault_finished,
+                                              on_error=self.on_vault_failed)
+
+    def show_vault_progress(self, done, total, slot, ok):
+        """Progress callback from the worker thread."""
+        self.attendance_app.dispatcher.call_soon(self.vault_status.config, text=f"{done}/{total} templates")
+
+    def backup_templates(self):
+        vault = TemplateVault(TEMPLATE_VAULT_PATH)
+        # One job for the whole transfer, so its load_model/upload pairs run back to back
+        report = self.sensor.run(vault.backup, self.sensor.finger, progress=self.show_vault_progress,
+                                 priority=MAINTENANCE, owner='enrollment')
+        if TEMPLATE_BACKUP_URL:
+            try:
+                vault.upload(api_client, TEMPLATE_BACKUP_URL)
+                report['uploaded'] = True
+            except requests.RequestException as e:
+                print(f"Failed to upload the template backup: {e}")
+                report['uploaded'] = False
+        return report
+
+    def restore_templates(self, vault):
+        report = self.sensor.run(vault.restore, self.sensor.finger, progress=self.show_vault_progress,
+                                 priority=MAINTENANCE, owner='enrollment')
+        # The sensor's library changed under the bitmap
+        self.sensor.run(self.slots.reconcile, priority=MAINTENANCE, owner='enrollment')
+        return report
+
+    def on_vault_finished(self, report):
+        self.set_busy(False)
+        print(f"Template {report['kind']}: {report}")
+        summary = (f"{report['templates']} templates in {report['seconds']:.1f} s "
+                   f"({report['bytes_per_s']} bytes/s)")
+        if report['kind'] == 'restore':
+            summary += f", {report['verified']} verified"
+        self.vault_status.config(text=summary)
+        if report['failed']:
+            messagebox.showwarning("Templates", f"{summary}.\nFailed slots: {report['failed']}")
+        else:
+            messagebox.showinfo("Templates", f"{summary}.")
+
+    def on_vault_failed(self, error):
+        self.set_busy(False)
+        self.vault_status.config(text="")
+        messagebox.showerror("Templates", f"Template transfer failed: {error}")
+
     def refresh_table(self):
         """Refresh the table with data from the Laravel API."""
+        self.attendance_app.dispatcher.submit(self.load_table_data, on_done=self.populate_table)
+
+    def load_table_data(self):
+        """Fetch faculty and admin rows; runs on a worker thread."""
+        return self.fetch_faculty_data() + self.fetch_admin_data()
+
+    def populate_table(self, users):
         for row in self.tree.get_children():
             self.tree.delete(row)
 
-        faculty_data = self.fetch_faculty_data()
-        for faculty in faculty_data:
-            # Only display faculty who have less than 2 fingerprints registered
-            self.tree.insert("", tk.END, values=(faculty['name'], faculty['email']))
-
-        admin_data = self.fetch_admin_data()
-        for admin in admin_data:
-            # Only display admin who have less than 2 fingerprints registered
-            self.tree.insert("", tk.END, values=(admin['name'], admin['email']))
+        for user in users:
+            # Only faculty and admins with less than 2 fingerprints registered are returned
+            self.tree.insert("", tk.END, values=(user['name'], user['email']))
 
 class AttendanceApp:
-    def __init__(self, root):
+    def __init__(self, root, hal):
         self.root = root
         self.root.title("Fingerprint and NFC Reader")
         self.root.attributes("-fullscreen", True)  # Set the window to full screen
@@ -366,14 +541,13 @@ class AttendanceApp:
         # Add key binding to exit full screen
         self.root.bind("<Escape>", self.exit_full_screen)
 
-        # Initialize the text-to-speech engine
-        try:
-            self.speech_engine = pyttsx3.init(driverName='espeak')  # Ensure the correct driver is used for Raspberry Pi
-            self.speech_engine.setProperty('rate', 150)  # Set speech rate
-            self.speech_engine.setProperty('volume', 0.9)  # Set volume level
-        except Exception as e:
-            print(f"Failed to initialize TTS engine: {e}")
-            self.speech_engine = None  # Set to None to handle in speak method
+        # Per-stage timings of recent scans and taps
+        self.root.bind("<F2>", self.show_traces)
+
+        # Network I/O runs on worker threads; widget updates are marshalled back onto the Tk thread
+        self.dispatcher = UiDispatcher(self.root)
+
+        self.start_services(hal)
 
         # Define custom fonts
         heading_font = font.Font(family="Helvetica", size=16, weight="bold")
@@ -490,37 +664,206 @@ class AttendanceApp:
         # enrollment_button = tk.Button(self.main_frame, text="Go to Fingerprint Enrollment", command=self.open_fingerprint_enrollment)  # Use self.main_frame
         # enrollment_button.pack(pady=20)
 
-        # Initialize NFC reader
+        self.start_readers()
+
+        # Handle window close event
+        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+
+    def start_services(self, hal):
+        """Set up the hardware outputs and background services; nothing here touches Tk widgets."""
+        # Records how long each stage of a scan or tap took; F2 shows the recent traces
+        self.tracer = Tracer(capacity=TRACE_BUFFER_SIZE)
+
+        self.hal = hal  # Real or simulated GPIO, fingerprint sensor and NFC reader
+        self.gpio = hal.gpio
+        self.hal.setup_outputs([SOLENOID_PIN, BUZZER_PIN])
+
+        # Buzzer patterns play on their own thread so an alarm never holds up scanning
+        self.buzzer = BuzzerScheduler(self.gpio, BUZZER_PIN)
+
+        # Every lock/unlock from any thread goes through the door state machine
+        self.door = DoorController(self.gpio, SOLENOID_PIN, credential_relock=CREDENTIAL_RELOCK_SECONDS,
+                                   remote_relock=REMOTE_RELOCK_SECONDS, alarm_hold=ALARM_HOLD_SECONDS)
+
+        # Local copies of the log endpoints, refreshed with conditional/incremental requests
+        self.recent_logs_feed = LogFeed(api_client, RECENT_LOGS_URL, 'recent logs')
+        self.log_status_feed = LogFeed(api_client, LOGS_URL, 'logs', newest_first=False)
+
+        # Keep a local copy of the server clock so scans don't fetch the time over the network
+        self.server_clock = ServerClock(api_client, CURRENT_DATE_TIME_URL)
+        self.server_clock.start()
+
+        # Schedules are looked up locally; the store refreshes known credentials in the background
+        self.schedule_store = ScheduleStore(api_client, {
+            'fingerprint': LAB_SCHEDULE_FINGERPRINT_URL,
+            'rfid': LAB_SCHEDULE_URL,
+        }, path=SCHEDULE_DB_PATH)
+        self.schedule_store.start()
+
+        # Initialize the text-to-speech engine
         try:
-            self.clf = nfc.ContactlessFrontend('usb')
+            if pyttsx3 is None:
+                raise RuntimeError("pyttsx3 is not installed")
+            self.speech_engine = pyttsx3.init(driverName='espeak')  # Ensure the correct driver is used for Raspberry Pi
+            self.speech_engine.setProperty('rate', 150)  # Set speech rate
+            self.speech_engine.setProperty('volume', 0.9)  # Set volume level
         except Exception as e:
-            print("NFC Error", f"Failed to initialize NFC reader: {e}")
-            self.clf = None
+            print(f"Failed to initialize TTS engine: {e}")
+            self.speech_engine = None  # Set to None to handle in speak method
+
+        # Announcements are played from pre-rendered WAV files; only cache misses are synthesised live
+        self.announcer = Announcer(self.speech_engine, ANNOUNCEMENT_CACHE_DIR)
+        self.announcer.prerender_phrases()
+        self.door.subscribe(self.announce_door_change)
+
+        # Identity lookups are served from a local cache, warmed from the faculty/admin lists
+        self.user_cache = TTLCache(self.load_user_by_fingerprint, maxsize=512, ttl=3600, stale_ttl=7 * 86400,
+                                   path=USER_CACHE_PATH, name='user cache')
+        threading.Thread(target=self.warm_user_cache, daemon=True).start()
+
+        # Card taps are resolved from a local directory of card UIDs
+        self.card_directory = CredentialDirectory(api_client, USER_INFO_URL, bulk_url=STUDENTS_URL,
+                                                  path=CARD_DIRECTORY_PATH)
+        self.card_directory.start()
+
+        # Attendance writes go to a durable local journal so a network hiccup never loses a log
+        self.journal = AttendanceJournal(api_client, path=JOURNAL_PATH)
+        self.journal.on_sent = lambda event: self.refresh_logs_table()
+        self.journal.start()
+
+        # Closes every open student session in one request when the faculty member locks up
+        self.session_closer = SessionCloser(api_client, TIME_OUT_BULK_URL, TIME_OUT_URL)
+
+        # Track the last time-in for each user by fingerprint ID
+        self.last_time_in = {}
+
+        self.register_metrics()
+
+    def register_metrics(self):
+        """Create this door's metrics. Counters are updated on the hot paths; the rest are read at scrape time."""
+        self.metrics = MetricsRegistry()
+        self.scans_metric = self.metrics.counter('scans_total', "Finished fingerprint scans and card taps by outcome.",
+                                                 labels=('kind', 'outcome'))
+        self.matches_metric = self.metrics.counter('fingerprint_matches_total',
+                                                   "Fingerprints found in the sensor library.")
+        self.denials_metric = self.metrics.counter('denials_total', "Scans and taps that did not grant access.",
+                                                   labels=('kind', 'reason'))
+        self.scan_seconds_metric = self.metrics.histogram('scan_seconds', "Time from finger-down or tap to decision.",
+                                                          labels=('kind',))
+        self.stage_seconds_metric = self.metrics.histogram('stage_seconds', "Time spent in each scan pipeline stage.",
+                                                           labels=('kind', 'stage'))
+        self.api_seconds_metric = self.metrics.histogram('api_request_seconds', "ProLock API request attempts.",
+                                                         labels=('endpoint', 'ok'))
+        self.search_seconds_metric = self.metrics.histogram(
+            'fingerprint_search_seconds', "Sensor library searches; path is 'hot' for a hot-set hit, else 'full'.",
+            labels=('path', 'matched'))
+        self.tracer.subscribe(self.on_trace_finished)
+        api_client.subscribe(self.on_api_request)
+
+        self.metrics.gauge('journal_depth', "Attendance events waiting to be sent.",
+                           lambda: self.journal.stats()['depth'])
+        self.metrics.gauge('journal_oldest_pending_seconds', "Age of the oldest unsent attendance event.",
+                           lambda: self.journal.stats()['oldest_pending_age'])
+        self.metrics.gauge('journal_parked', "Attendance events set aside after repeated delivery failures.",
+                           lambda: self.journal.stats()['parked'])
+        self.metrics.gauge('ui_queue_depth', "Widget updates waiting for the Tk main loop.",
+                           lambda: self.dispatcher.calls.qsize())
+        self.metrics.gauge('cache_hit_ratio', "Share of lookups answered from the local cache.",
+                           lambda: {('user',): self.user_cache.stats()['hit_rate'],
+                                    ('card',): self.card_directory.stats()['hit_rate']}, labels=('cache',))
+        self.metrics.counter_callback('buzzer_activations_total', "Buzzer patterns started, by pattern.",
+                                      lambda: {(name,): count for name, count in
+                                               self.buzzer.stats()['activations'].items()}, labels=('pattern',))
+        self.metrics.gauge('sensor_slots_free', "Empty template slots in the fingerprint sensor.",
+                           lambda: self.slots.free_count() if getattr(self, 'slots', None) else None)
+        self.metrics.gauge('sensor_baudrate', "Baud rate of the fingerprint sensor UART.",
+                           lambda: self.sensor_link.settings['baudrate'] if getattr(self, 'finger', None) else None)
+        self.metrics.gauge('hot_set_slots', "Sensor slots searched before the full library.",
+                           lambda: len(self.hot_search.hot_slots) if getattr(self, 'hot_search', None) else None)
+        self.metrics.gauge('sensor_queue_depth', "Fingerprint sensor commands waiting for the UART.",
+                           lambda: self.sensor.queue_depth() if getattr(self, 'sensor', None) else None)
+        self.metrics.gauge('door_locked', "1 while the solenoid is locked.", lambda: self.door.is_locked())
+        self.metrics.gauge('thread_alive', "1 while the named worker thread is running.", self.thread_liveness,
+                           labels=('thread',))
+
+    def on_trace_finished(self, trace):
+        self.scans_metric.inc(labels=(trace.kind, trace.outcome))
+        if trace.outcome in DENIAL_OUTCOMES:
+            self.denials_metric.inc(labels=(trace.kind, trace.outcome))
+        self.scan_seconds_metric.observe(trace.ended - trace.started, labels=(trace.kind,))
+        for name, start, end in trace.spans:
+            self.stage_seconds_metric.observe(end - start, labels=(trace.kind, name))
+
+    def on_search(self, path, seconds, matched):
+        self.search_seconds_metric.observe(seconds, labels=(path, 'true' if matched else 'false'))
+
+    def on_api_request(self, endpoint, seconds, ok):
+        if endpoint.startswith(API_URL):
+            endpoint = endpoint[len(API_URL):]
+        self.api_seconds_metric.observe(seconds, labels=(endpoint, 'true' if ok else 'false'))
+
+    def thread_liveness(self):
+        threads = {
+            'nfc': getattr(self, 'nfc_thread', None),
+            'fingerprint': getattr(self, 'fingerprint_thread', None),
+            'sensor': getattr(getattr(self, 'sensor', None), 'thread', None),
+            'door_channel': getattr(getattr(self, 'door_channel', None), 'thread', None),
+            'journal': self.journal.thread,
+            'schedule_sync': self.schedule_store.thread,
+            'clock_sync': self.server_clock.thread,
+            'card_sync': self.card_directory.thread,
+            'buzzer': self.buzzer.thread,
+            'announcer': self.announcer.thread,
+        }
+        return {(name,): thread is not None and thread.is_alive() for name, thread in threads.items()}
+
+    def start_readers(self):
+        """Open the NFC reader and fingerprint sensor and start their threads and the door channel."""
+        # Initialize NFC reader
+        self.clf = self.hal.open_nfc()
 
         self.running = True
         self.nfc_thread = threading.Thread(target=self.read_nfc_loop)
         self.nfc_thread.start()
 
-        # Initialize serial connection for fingerprint sensor
-        self.finger = self.initialize_serial()
+        # Open the fingerprint sensor at the link settings it was last left at
+        self.sensor_link = SensorLink(self.hal, path=SENSOR_LINK_PATH)
+        sensor = self.sensor_link.open()
+        self.sensor = None
+        self.finger = None
+        self.capture = None
+        self.slots = None
+        self.hot_search = None
+        if sensor:
+            # Only the sensor service thread talks to the UART; self.finger queues the scan loop's commands to it
+            self.sensor = SensorService(sensor)
+            self.finger = self.sensor.client(SCAN, 'scan')
+            self.slots = SlotAllocator(sensor, path=FINGERPRINT_SLOTS_PATH)
+            self.hot_search = HotSetSearch(self.hal, sensor)
+            self.hot_search.subscribe(self.on_search)
+            self.capture = FingerprintCapture(self.finger, gpio=self.gpio, touch_pin=FINGER_TOUCH_PIN)
+            self.capture.subscribe(self.on_fingerprint_event)
 
         # Start fingerprint scanning in a separate thread
-        self.fingerprint_thread = threading.Thread(target=self.auto_scan_fingerprint)
+        self.scan_stop = threading.Event()
+        self.fingerprint_thread = threading.Thread(target=self.auto_scan_fingerprint, args=(self.scan_stop,))
         self.fingerprint_thread.start()
 
-        # Track the last time-in for each user by fingerprint ID
-        self.last_time_in = {}
-        self.is_manual_unlock = False  # Flag to check if the door was manually unlocked
-
-        # Start periodic checking of log status
-        self.root.after(1000, self.check_log_status_periodically)  # Check log status every 10 seconds
+        # Remote open/close commands arrive over the event stream, or adaptive polling if it is unavailable
+        self.door_channel = DoorCommandChannel(api_client, DOOR_EVENTS_URL, self.fetch_latest_log_status,
+                                               self.apply_door_status, conditional=self.log_status_feed.conditional)
+        self.door_channel.start()
 
-        # Handle window close event
-        self.root.protocol("WM_DELETE_WINDOW", self.on_closing)
+        try:
+            self.metrics_server = MetricsServer(self.metrics, METRICS_HOST, METRICS_PORT).start()
+            print(f"Metrics available at {self.metrics_server.url}")
+        except OSError as e:
+            print(f"Metrics endpoint disabled, could not listen on port {METRICS_PORT}: {e}")
+            self.metrics_server = None
 
     def update_clock(self):
         """Update the clock label with the current time."""
-        current_time = datetime.now().strftime("%A %d-%m-%Y %H:%M:%S")
+        current_time = self.server_clock.now().strftime("%A %d-%m-%Y %H:%M:%S")
         self.clock_label.config(text=current_time)
         self.root.after(1000, self.update_clock)
 
@@ -528,17 +871,53 @@ class AttendanceApp:
         """Exit full screen mode."""
         self.root.attributes("-fullscreen", False)
 
+    def show_traces(self, event=None):
+        """Open a window listing the stage timings of recent scans and taps, newest first."""
+        window = tk.Toplevel(self.root)
+        window.title("Recent scan traces")
+        center_window(window, 1100, 500)
+
+        columns = ("Time", "Kind", "Credential", "Outcome", "Total (ms)", "Stages (ms)")
+        tree = ttk.Treeview(window, columns=columns, show='headings')
+        for col, width in zip(columns, (90, 80, 160, 100, 90, 560)):
+            tree.heading(col, text=col)
+            tree.column(col, width=width, anchor='w')
+        tree.pack(fill="both", expand=True, padx=10, pady=10)
+
+        def refresh():
+            tree.delete(*tree.get_children())
+            for trace in self.tracer.recent():
+                stages = ", ".join(f"{span['name']} {span['ms']:.0f}" for span in trace['spans'])
+                tree.insert("", tk.END, values=(
+                    datetime.fromtimestamp(trace['started']).strftime("%H:%M:%S"),
+                    trace['kind'],
+                    trace['attrs'].get('credential', ''),
+                    trace['outcome'],
+                    f"{trace['total_ms']:.0f}",
+                    stages,
+                ))
+
+        def export():
+            try:
+                count = self.tracer.export_jsonl(TRACE_EXPORT_PATH)
+            except OSError as e:
+                messagebox.showerror("Export failed", f"Could not write {TRACE_EXPORT_PATH}: {e}", parent=window)
+                return
+            messagebox.showinfo("Exported", f"{count} traces appended to {TRACE_EXPORT_PATH}.", parent=window)
+
+        buttons = tk.Frame(window)
+        buttons.pack(pady=(0, 10))
+        tk.Button(buttons, text="Refresh", command=refresh).pack(side=tk.LEFT, padx=5)
+        tk.Button(buttons, text="Export JSON lines", command=export).pack(side=tk.LEFT, padx=5)
+        tk.Button(buttons, text="Close", command=window.destroy).pack(side=tk.LEFT, padx=5)
+        refresh()
+
     def show(self):
         self.main_frame.pack(fill="both", expand=True)
 
     def hide(self):
         self.main_frame.pack_forget()
 
-    def open_fingerprint_enrollment(self):
-        self.hide()  # Hide the current frame
-        self.fingerprint_enrollment = FingerprintEnrollment(self.root, self)
-        self.fingerprint_enrollment.show()  # Show the FingerprintEnrollment frame
-
     def create_label_entry(self, frame, text, font_style):
         label = ttk.Label(frame, text=text, font=font_style, background="#F6F5FB")
         label.pack(pady=5)
@@ -561,69 +940,82 @@ class AttendanceApp:
         for col in columns:
             self.logs_tree.heading(col, text=col)
             self.logs_tree.column(col, minwidth=100, width=100, anchor='center')
+        self.logs_model = LogsTableModel(self.logs_tree, self.log_row_values)
 
-    def initialize_serial(self):
-        try:
-            uart = serial.Serial("/dev/ttyUSB0", baudrate=57600, timeout=1)
-            return adafruit_fingerprint.Adafruit_Fingerprint(uart)
-        except serial.SerialException as e:
-            print("Serial Error", f"Failed to connect to serial port: {e}")
-            return None
-
-    def unlock_door(self):
-        GPIO.output(SOLENOID_PIN, GPIO.LOW)
-        print("Door unlocked.")
+    def unlock_door(self, source=None):
+        """Hold the door open for a faculty session until lock_door() is called."""
+        self.door.handle('hold_open', source=source)
 
-    def lock_door(self):
-        GPIO.output(SOLENOID_PIN, GPIO.HIGH)
-        print("Door locked.")
+    def lock_door(self, source=None):
+        self.door.handle('release', source=source)
 
     def fetch_latest_log_status(self):
-        try:
-            response = requests.get(LOGS_URL)
-            response.raise_for_status()
-            logs = response.json().get("logs", [])
-
-            if logs:
-                latest_log = logs[-1]  # Get the latest log (assumes logs are in chronological order)
-                status = latest_log.get("status", "")
-
-                # Only lock the door if it was not manually unlocked
-                if not self.is_manual_unlock:
-                    if status == "close":
-                        self.lock_door()
-                    elif status == "open":
-                        self.unlock_door()
-        except requests.RequestException as e:
-            print(f"Error fetching log status: {e}")
+        """Return the status of the latest log ('open' or 'close'); raises RequestException."""
+        self.log_status_feed.refresh()
+        latest_log = self.log_status_feed.latest()  # Logs are in chronological order
+        return latest_log.get("status", "") if latest_log else None
+
+    def apply_door_status(self, status):
+        """Act on a remote door command; called from the door channel thread."""
+        # The state machine ignores remote commands while a faculty session holds the door open
+        if status == "close":
+            self.door.handle('remote_close', source='remote')
+        elif status == "open":
+            self.door.handle('remote_open', source='remote')
+
+    def announce_door_change(self, old_state, new_state, event, source):
+        """Say when the door is opened or closed remotely; card and fingerprint unlocks already greet the user."""
+        if event == 'remote_open' and old_state != new_state:
+            self.announcer.say('door_unlocked')
+        elif event == 'remote_close' or (event == 'relock' and old_state == UNLOCKED_REMOTE):
+            self.announcer.say('door_locked')
+
+    def load_user_by_fingerprint(self, fingerprint_id):
+        """Cache loader: fetch one user by fingerprint ID, None if the ID isn't registered."""
+        response = api_client.get(f"{FINGERPRINT_API_URL}{fingerprint_id}")
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
 
-    def check_log_status_periodically(self):
-        self.fetch_latest_log_status()
-        self.root.after(10000, self.check_log_status_periodically)  # Call again after 10 seconds
+    def warm_user_cache(self):
+        """Preload the user cache with every faculty and admin fingerprint ID, and render their greetings."""
+        names = set()
+        for url in (FACULTIES_URL, ADMIN_URL):
+            try:
+                response = api_client.get(url)
+                response.raise_for_status()
+                users = response.json()
+            except requests.RequestException as e:
+                print(f"Error warming user cache from {url}: {e}")
+                continue
+            for user in users:
+                fingerprint_ids = user.get('fingerprint_id') or []
+                if not isinstance(fingerprint_ids, list):
+                    fingerprint_ids = [fingerprint_ids]
+                for fingerprint_id in fingerprint_ids:
+                    if isinstance(fingerprint_id, dict):
+                        fingerprint_id = fingerprint_id.get('fingerprint_id')
+                    if fingerprint_id is not None:
+                        self.user_cache.put(fingerprint_id, {'name': user.get('name'), 'email': user.get('email')})
+                        names.add(user.get('name'))
+        print(f"User cache warmed: {self.user_cache.stats()}")
+        self.announcer.prerender_greetings(names)
 
     def get_user_details(self, fingerprint_id):
         try:
-            response = requests.get(f"{FINGERPRINT_API_URL}{fingerprint_id}")
-            response.raise_for_status()
-            data = response.json()
-            return data.get('name', None)
+            data = self.user_cache.get_or_load(fingerprint_id)
+            return data.get('name', None) if data else None
         except requests.RequestException as e:
             print("API Error", f"Failed to fetch data from API: {e}")
             return None
 
     def fetch_current_date_time(self):
-        try:
-            response = requests.get(CURRENT_DATE_TIME_URL)
-            response.raise_for_status()
-            data = response.json()
-            if 'day_of_week' in data and 'current_time' in data:
-                return data
-            else:
-                print("Error: Missing expected keys in the API response.")
-                return None
-        except requests.RequestException as e:
-            print(f"Error fetching current date and time from API: {e}")
-            return None
+        """Return the server day and time from the locally synced clock (local time if never synced)."""
+        status = self.server_clock.status()
+        if not status['synced']:
+            print("Warning: Server clock not synced yet, using local time.")
+        return self.server_clock.now_data()
 
     def update_current_date_time(self):
         """Fetch and update the current date and time in the label."""
@@ -638,197 +1030,28 @@ class AttendanceApp:
         # Update the current date and time every minute
         self.root.after(60000, self.update_current_date_time)
 
-    def get_schedule(self, fingerprint_id):
-        try:
-            current_time_data = self.fetch_current_date_time()
-            if not current_time_data:
-                print("Error: Could not fetch current date and time from API.")
-                return False
-
-            current_day = current_time_data.get('day_of_week')
-            current_time = current_time_data.get('current_time')
-
-            if not current_day or not current_time:
-                print("Error: Invalid response from current date-time API.")
-                return False
-
-            print(f"Current Day from API: {current_day}, Current Time from API: {current_time}")
-
-            response = requests.get(f"{LAB_SCHEDULE_FINGERPRINT_URL}{fingerprint_id}")
-            response.raise_for_status()
-            schedules = response.json()
-
-            for schedule in schedules:
-                schedule_day = schedule.get('day_of_the_week')
-                start_time = schedule.get('class_start')
-                end_time = schedule.get('class_end')
-
-                if schedule_day and start_time and end_time:
-                    print(f"Checking Schedule: Day: {schedule_day}, Start: {start_time}, End: {end_time}")
-
-                    if schedule_day == current_day:
-                        if start_time <= current_time <= end_time:
-                            print("Access allowed based on schedule.")
-                            return True
-
-            print("Access denied: No matching schedule found or not within allowed time.")
-            return False
-        except requests.RequestException as e:
-            print("Request Error", f"Failed to connect to API: {e}")
-            return False
-
-    def get_schedule_mock_up(self, fingerprint_id):
-        try:
-            current_time_data = self.fetch_current_date_time()
-            if not current_time_data:
-                print("Error: Could not fetch current date and time from API.")
-                return False
-
-            current_day = current_time_data.get('day_of_week')
-            current_time = current_time_data.get('current_time')
-            current_date = datetime.now().date()  # Fetch current date
-
-            if not current_day or not current_time:
-                print("Error: Invalid response from current date-time API.")
-                return False
-
-            print(f"Current Day from API: {current_day}, Current Time from API: {current_time}")
-
-            response = requests.get(f"{LAB_SCHEDULE_FINGERPRINT_URL}{fingerprint_id}")
-            response.raise_for_status()
-            schedules = response.json()
-
-            for schedule in schedules:
-                specific_date = schedule.get('specific_date')
-                start_time = schedule.get('class_start')
-                end_time = schedule.get('class_end')
-
-                if specific_date and start_time and end_time:
-                    # Convert specific_date string to a date object
-                    schedule_date = datetime.strptime(specific_date, '%Y-%m-%d').date()
-
-                    print(f"Checking Schedule: Date: {schedule_date}, Start: {start_time}, End: {end_time}")
-
-                    # Check if the schedule date matches the current date
-                    if schedule_date == current_date:
-                        # Check if the current time is within the class start and end time
-                        if start_time <= current_time <= end_time:
-                            print("Access allowed based on schedule.")
-                            return True
-
-            print("Access denied: No matching schedule found or not within allowed time.")
-            return False
-        except requests.RequestException as e:
-            print("Request Error", f"Failed to connect to API: {e}")
-            return False
-
-    def get_rfid_schedule(self, rfid_number):
-        try:
-            current_time_data = self.fetch_current_date_time()
-            if not current_time_data:
-                print("Error: Could not fetch current date and time from API.")
-                return False
-
-            current_day = current_time_data.get('day_of_week')
-            current_time = current_time_data.get('current_time')
-
-            if not current_day or not current_time:
-                print("Error: Invalid response from current date-time API.")
-                return False
-
-            print(f"Current Day from API: {current_day}, Current Time: {current_time}")
-
-            response = requests.get(f"{LAB_SCHEDULE_URL}{rfid_number}")
-            response.raise_for_status()
-            schedules = response.json()
-
-            for schedule in schedules:
-                schedule_day = schedule.get('day_of_the_week')
-                start_time = schedule.get('class_start')
-                end_time = schedule.get('class_end')
-                is_makeup_class = schedule.get('is_makeup_class', 0)
-                specific_date = schedule.get('specific_date', 'N/A')
-
-                if is_makeup_class == 0 and schedule_day and start_time and end_time:
-                    print(f"Checking Regular Schedule: Day: {schedule_day}, Start: {start_time}, End: {end_time}")
-                    if schedule_day.lower() == current_day.lower() and start_time <= current_time <= end_time:
-                        print("Access allowed based on regular schedule.")
-                        return True
-
-            print("Access denied: No matching regular schedule found or not within allowed time.")
-            return False
-        except requests.RequestException as e:
-            print(f"Error fetching or checking schedule: {e}")
-            return False
-
-    def get_rfid_schedule_mock_up(self, rfid_number):
-        try:
-            current_time_data = self.fetch_current_date_time()
-            if not current_time_data:
-                print("Error: Could not fetch current date and time from API.")
-                return False
-
-            current_time = current_time_data.get('current_time')
-            current_date = datetime.now().date()  # Fetch current date
-
-            if not current_time:
-                print("Error: Invalid response from current date-time API.")
-                return False
-
-            print(f"Current Date: {current_date}, Current Time: {current_time}")
+    def evaluate_schedule(self, kind, credential):
+        """Check regular and make-up schedules in one pass; kind is 'fingerprint' or 'rfid'.
 
-            response = requests.get(f"{LAB_SCHEDULE_URL}{rfid_number}")
-            response.raise_for_status()
-            schedules = response.json()
-
-            for schedule in schedules:
-                specific_date = schedule.get('specific_date')
-                start_time = schedule.get('class_start')
-                end_time = schedule.get('class_end')
-                is_makeup_class = schedule.get('is_makeup_class', 0)
-
-                if is_makeup_class == 1 and specific_date and start_time and end_time:
-                    # Convert specific_date string to a date object
-                    if specific_date != 'N/A':
-                        schedule_date = datetime.strptime(specific_date, '%Y-%m-%d').date()
-                        print(f"Checking Make-Up Schedule: Date: {schedule_date}, Start: {start_time}, End: {end_time}")
-
-                        # Check if the schedule date matches the current date
-                        if schedule_date == current_date:
-                            # Check if the current time is within the class start and end time
-                            if start_time <= current_time <= end_time:
-                                print("Access allowed based on make-up schedule.")
-                                return True
-
-            print("Access denied: No matching make-up schedule found or not within allowed time.")
-            return False
-        except requests.RequestException as e:
-            print(f"Error fetching or checking schedule: {e}")
-            return False
-
-    def check_if_makeup_class_rfid(self, rfid_number):
-        """
-        Check if the class associated with the given RFID number is a make-up class.
-        Returns True if any class is a make-up class; otherwise, returns False.
+        Answered from the local schedule store: only a credential's first tap makes a schedule request.
         """
-        try:
-            response = requests.get(f"{LAB_SCHEDULE_URL}{rfid_number}")
-            response.raise_for_status()
-            schedules = response.json()
-
-            for schedule in schedules:
-                # Check if 'is_makeup_class' is 1, indicating a make-up class
-                if schedule.get('is_makeup_class') == 1:
-                    return True
-            return False
-        except requests.RequestException as e:
-            print(f"Error checking if class is a make-up class: {e}")
-            return False
+        current_time_data = self.fetch_current_date_time()
+        decision = self.schedule_store.evaluate(kind, credential, current_time_data['day_of_week'],
+                                                current_time_data['current_date'], current_time_data['current_time'])
+        print(f"Schedule check for {kind} {credential} at {current_time_data['day_of_week']} "
+              f"{current_time_data['current_date']} {current_time_data['current_time']}: {decision.reason}")
+        if decision.slot:
+            print(f"Matched Schedule: Start: {decision.slot.get('class_start')}, End: {decision.slot.get('class_end')}")
+        return decision
 
     def check_time_in_record_fingerprint(self, fingerprint_id):
+        # An event still waiting in the journal is newer than anything the server knows about
+        pending = self.journal.pending_kind(f"fingerprint:{fingerprint_id}")
+        if pending:
+            return pending == 'time_in'
         try:
             url = f"{RECENT_LOGS_FINGERPRINT_URL2}?fingerprint_id={fingerprint_id}"
-            response = requests.get(url)
+            response = api_client.get(url)
             response.raise_for_status()
             logs = response.json()
             return any(log.get('time_in') and not log.get('time_out') for log in logs)
@@ -837,217 +1060,256 @@ class AttendanceApp:
             return False
 
     def record_time_in_fingerprint(self, fingerprint_id, user_name, role_id="2"):
-        try:
-            current_time_data = self.fetch_current_date_time()
-            if not current_time_data:
-                return
-            url = f"{TIME_IN_FINGERPRINT_URL}?fingerprint_id={fingerprint_id}&time_in={current_time_data['current_time']}&user_name={user_name}&role_id={role_id}"
-            response = requests.put(url)
-            response.raise_for_status()
-            print("Time-In recorded successfully.")
-            print("Success", "Time-In recorded successfully.")
-            print("Door unlocked!")
-        except requests.RequestException as e:
-            print("Error", f"Error recording Time-In: {e}")
+        current_time_data = self.fetch_current_date_time()
+        self.journal.record('time_in', f"fingerprint:{fingerprint_id}", TIME_IN_FINGERPRINT_URL, {
+            'fingerprint_id': fingerprint_id,
+            'time_in': current_time_data['current_time'],
+            'user_name': user_name,
+            'role_id': role_id,
+        })
+        print("Time-In recorded successfully.")
+        print("Door unlocked!")
 
     def record_time_out_fingerprint(self, fingerprint_id):
-        try:
-            current_time_data = self.fetch_current_date_time()
-            if not current_time_data:
-                return
-            url = f"{TIME_OUT_FINGERPRINT_URL}?fingerprint_id={fingerprint_id}&time_out={current_time_data['current_time']}"
-            response = requests.put(url)
-            response.raise_for_status()
-            print("Time-Out recorded successfully.")
-            print("Door locked!")
-        except requests.RequestException as e:
-            print(f"Error recording Time-Out: {e}")
-
-    def stop_fingerprint_scanning(self):
-        """Stop the fingerprint scanning thread to avoid conflicts when enrolling fingerprints."""
-        self.running = False  # Stop the scanning loop
-        if self.fingerprint_thread.is_alive():
-            self.fingerprint_thread.join()  # Ensure the thread has stopped
-        print("Fingerprint scanning stopped.")
-
-    def open_fingerprint_enrollment(self):
-        """Navigate to the Fingerprint Enrollment screen."""
-        self.stop_fingerprint_scanning()  # Stop fingerprint scanning to prevent conflicts
-        self.hide()  # Hide the current frame
-        self.fingerprint_enrollment = FingerprintEnrollment(self.root, self)
-        self.fingerprint_enrollment.show()  # Show the FingerprintEnrollment frame
+        current_time_data = self.fetch_current_date_time()
+        self.journal.record('time_out', f"fingerprint:{fingerprint_id}", TIME_OUT_FINGERPRINT_URL, {
+            'fingerprint_id': fingerprint_id,
+            'time_out': current_time_data['current_time'],
+        })
+        print("Time-Out recorded successfully.")
+        print("Door locked!")
 
     def stop_fingerprint_scanning(self):
-        """Stop the fingerprint scanning thread to avoid conflicts when enrolling fingerprints."""
-        self.running = False  # Stop the scanning loop
-        if self.fingerprint_thread.is_alive():
-            self.fingerprint_thread.join()  # Ensure the thread has stopped
+        """Tell the scanning thread to stop. No join: it exits at its next sensor command or pause."""
+        self.scan_stop.set()
         print("Fingerprint scanning stopped.")
 
     def start_fingerprint_scanning(self):
         """Start the fingerprint scanning thread to resume scanning after returning to Attendance."""
-        self.running = True  # Set the running flag to True
-        self.fingerprint_thread = threading.Thread(target=self.auto_scan_fingerprint)
+        self.scan_stop = threading.Event()  # A thread still finishing its last scan keeps its own, already set
+        self.fingerprint_thread = threading.Thread(target=self.auto_scan_fingerprint, args=(self.scan_stop,))
         self.fingerprint_thread.start()  # Start the fingerprint scanning thread
         print("Fingerprint scanning started.")
 
     def open_fingerprint_enrollment(self):
         """Navigate to the Fingerprint Enrollment screen."""
-        self.stop_fingerprint_scanning()  # Stop fingerprint scanning to prevent conflicts
+        if not self.finger:
+            messagebox.showerror("Error", "The fingerprint sensor is not connected.")
+            return
+        # Claiming fails the scan loop's queued and next commands at once, so the switch doesn't wait for it
+        self.sensor.claim('enrollment')
+        self.stop_fingerprint_scanning()
         self.hide()  # Hide the current frame
         self.fingerprint_enrollment = FingerprintEnrollment(self.root, self)
         self.fingerprint_enrollment.show()  # Show the FingerprintEnrollment frame
 
-    def auto_scan_fingerprint(self):
+    def auto_scan_fingerprint(self, stop):
+        """Scan thread: also tunes the link and falls back when packets get garbled, as whole sensor jobs."""
+        while self.running and self.finger and not stop.is_set():
+            try:
+                self.sensor.run(self.sensor_link.negotiate_if_needed, priority=MAINTENANCE, owner='scan')
+                self.scan_fingerprints(stop)
+                return
+            except SensorBusy:
+                self.tracer.finish('abandoned')
+                print("Fingerprint scanning stepped aside: the sensor is claimed.")
+                return
+            except SensorLinkError as e:  # Raised on the sensor thread: a bad or missing reply
+                print(f"Fingerprint sensor error: {e}")
+                self.tracer.finish('sensor_error')
+                try:
+                    self.sensor.run(self.sensor_link.report_error, priority=MAINTENANCE, owner='scan')
+                except SensorBusy:
+                    return
+                stop.wait(1)
+            except Exception as e:  # Lookup, schedule, journal or door trouble; not the sensor link's fault
+                print(f"Fingerprint scan failed: {e}")
+                self.tracer.finish('error')
+                stop.wait(1)
+
+    def scan_fingerprints(self, stop):
         failed_attempts = 0  # Initialize the counter for failed attempts
 
-        while self.running:
+        while self.running and not stop.is_set():
             if not self.finger:
                 return
 
+            # Refresh the slot bitmap while no finger is expected, behind any queued scan commands
+            self.sensor.run(self.slots.reconcile_if_due, priority=MAINTENANCE, owner='scan')
+            if self.hot_search.due():
+                self.refresh_hot_set()
+
             self.update_result("Waiting for fingerprint image...", color="green")
-            while self.finger.get_image() != adafruit_fingerprint.OK:
-                if not self.running:
-                    return
-                time.sleep(0.5)
+            result = self.capture.capture_template(1, should_continue=lambda: self.running and not stop.is_set())
+            if result is None:
+                return
+            self.tracer.mark('image_2_tz')
 
             print("Templating fingerprint...")
-            if self.finger.image_2_tz(1) != adafruit_fingerprint.OK:
+            if result != FingerprintStatus.OK:
                 print("Failed to template the fingerprint image.")
-                failed_attempts += 1
-                self.check_failed_attempts(failed_attempts)  # Check failed attempts and trigger the buzzer if needed
-                time.sleep(5)  # 5 seconds allowance before the next fingerprint attempt
+                self.tracer.finish('image_failed')
+                failed_attempts = self.check_failed_attempts(failed_attempts + 1)  # Trigger the buzzer if needed
+                stop.wait(5)  # 5 seconds allowance before the next fingerprint attempt
                 continue
 
             print("Searching for fingerprint match...")
-            if self.finger.finger_search() != adafruit_fingerprint.OK:
+            with self.tracer.span('finger_search'):
+                match = self.sensor.run(self.hot_search.search, priority=SCAN, owner='scan')
+            self.tracer.set(search=match.path)
+            if match.status != FingerprintStatus.OK:
+                self.tracer.finish('no_match')
                 self.update_result("No matching fingerprint found.", color="red")
-                failed_attempts += 1
-                self.check_failed_attempts(failed_attempts)  # Check failed attempts and trigger the buzzer if needed
-                time.sleep(5)  # 5 seconds allowance before the next fingerprint attempt
+                failed_attempts = self.check_failed_attempts(failed_attempts + 1)  # Trigger the buzzer if needed
+                stop.wait(5)  # 5 seconds allowance before the next fingerprint attempt
                 continue
 
             # Reset failed attempts if successful
             failed_attempts = 0
+            self.matches_metric.inc()
 
-            print(f"Fingerprint matched with ID: {self.finger.finger_id}, confidence: {self.finger.confidence}")
+            fingerprint_id = match.finger_id
+            print(f"Fingerprint matched with ID: {fingerprint_id}, confidence: {match.confidence} ({match.path} search)")
+            self.tracer.set(credential=f"fingerprint:{fingerprint_id}", confidence=match.confidence)
 
             # Fetch user details using API
-            name = self.get_user_details(self.finger.finger_id)
+            with self.tracer.span('user_lookup'):
+                name = self.get_user_details(fingerprint_id)
 
             if name:
                 print(f"Fingerprint belongs to {name}. Checking access schedule...")
 
-                # Determine whether to use the mock-up schedule check or the regular one
-                is_makeup_class = self.check_if_makeup_class(self.finger.finger_id)  # Replace with your logic to check
+                # Regular and make-up schedules are checked together from the local store
+                with self.tracer.span('schedule_check'):
+                    decision = self.evaluate_schedule('fingerprint', fingerprint_id)
 
-                if is_makeup_class:
-                    # Use the mock-up schedule check
-                    schedule_check = self.get_schedule_mock_up(self.finger.finger_id)
-                else:
-                    # Use the regular schedule check
-                    schedule_check = self.get_schedule(self.finger.finger_id)
-
-                if schedule_check:  # Check if the current time is within the allowed schedule
+                if decision.allowed:  # Check if the current time is within the allowed schedule
                     # Fetch current time for comparison
                     current_time_data = self.fetch_current_date_time()
                     if not current_time_data:
+                        self.tracer.finish('no_clock')
                         return
                     current_time = datetime.strptime(current_time_data['current_time'], "%H:%M")
 
                     # Check if the user has no time-in record
-                    if not self.check_time_in_record_fingerprint(self.finger.finger_id):
-                        self.record_time_in_fingerprint(self.finger.finger_id, name)
-                        self.unlock_door()
-                        self.is_manual_unlock = True  # Set flag to indicate manual unlock
-                        self.last_time_in[self.finger.finger_id] = current_time  # Store the time-in time
+                    with self.tracer.span('session_check'):
+                        timed_in = self.check_time_in_record_fingerprint(fingerprint_id)
+                    if not timed_in:
+                        with self.tracer.span('time_in_record'):
+                            self.record_time_in_fingerprint(fingerprint_id, name)
+                        with self.tracer.span('door_actuation'):
+                            self.unlock_door(source=name)
+                        self.tracer.finish('unlocked')
+                        self.last_time_in[fingerprint_id] = current_time  # Store the time-in time
+                        self.buzzer.play('accept')
+                        self.announcer.say('welcome', name=name)
                         self.update_result(f"Welcome, {name}! Door unlocked.", color="green")
                     else:
-                        self.record_time_out_fingerprint(self.finger.finger_id)
-                        self.lock_door()
-                        self.is_manual_unlock = False  # Reset flag as door is locked again
-                        self.record_all_time_out()  # Record time-out for all entries without time-out
+                        with self.tracer.span('time_out_record'):
+                            self.record_time_out_fingerprint(fingerprint_id)
+                        with self.tracer.span('door_actuation'):
+                            self.lock_door(source=name)
+                        self.tracer.finish('locked')
+                        # Record time-out for all entries without time-out, without keeping the faculty waiting
+                        self.dispatcher.submit(self.record_all_time_out)
+                        self.buzzer.play('accept')
+                        self.announcer.say('goodbye', name=name)
                         self.update_result(f"Goodbye, {name}! Door locked.", color="green")
                 else:
+                    self.tracer.finish('denied')
+                    self.buzzer.play('reject')
+                    self.announcer.say('access_denied')
                     self.update_result("Access denied: Outside of allowed schedule.", color="red")
             else:
+                self.tracer.finish('unknown_user')
+                self.buzzer.play('reject')
+                self.announcer.say('no_match')
                 self.update_result("No matching fingerprint found in the database.", color="red")
 
             # Allow 5 seconds before the next fingerprint scan
-            time.sleep(5)
-
-    def check_if_makeup_class(self, fingerprint_id):
-        # Replace with your logic to determine if this is a make-up class or not
-        # Example: Fetch schedule and check the 'is_makeup_class' field
-        try:
-            response = requests.get(f"{LAB_SCHEDULE_FINGERPRINT_URL}{fingerprint_id}")
-            response.raise_for_status()
-            schedules = response.json()
-
-            for schedule in schedules:
-                if schedule.get('is_makeup_class') == 1:
-                    return True
-            return False
-        except requests.RequestException as e:
-            print("Request Error", f"Failed to check for make-up class: {e}")
-            return False
+            stop.wait(5)
+
+    def refresh_hot_set(self):
+        """Search first the slots of faculty with a class at this door around now."""
+        now = self.server_clock.now_data()
+        credentials = self.schedule_store.active_credentials('fingerprint', now['day_of_week'], now['current_date'],
+                                                             now['current_time'], margin=HOT_SET_MARGIN_MINUTES)
+        self.hot_search.set_hot_slots(int(credential) for credential in credentials if credential.isdigit())
+
+    def on_fingerprint_event(self, event, timestamp):
+        """Called by the capture engine, on the scan thread, when a finger lands on the sensor."""
+        if event == 'finger_present':
+            # The trace starts at the estimated finger-down time, so image capture includes the polling delay
+            self.tracer.start('fingerprint', started_at=timestamp)
+            self.tracer.mark('image_capture')
+            self.update_result("Reading fingerprint...", color="green")
 
     def check_failed_attempts(self, failed_attempts):
+        """Sound the alarm after three consecutive failures; returns the updated failure count."""
         if failed_attempts >= 3:
             self.update_result("Three or more consecutive failed attempts detected. Activating buzzer for 10 seconds.", color="red")
             self.trigger_buzzer()
-            failed_attempts = 0
+            return 0
+        self.buzzer.play('reject')
+        return failed_attempts
 
     def trigger_buzzer(self):
-        for _ in range(50):  # 5 seconds with 0.1-second intervals
-            GPIO.output(BUZZER_PIN, GPIO.HIGH)
-            time.sleep(0.1)
-            GPIO.output(BUZZER_PIN, GPIO.LOW)
-            time.sleep(0.1)
+        self.buzzer.play('alarm')  # Returns immediately; the scan loop keeps running while it sounds
+        self.door.handle('alarm', source='failed attempts')
 
     def record_all_time_out(self):
+        """Close every open session in one batch; failed UIDs are handed to the journal for retry."""
         try:
-            response = requests.get(RECENT_LOGS_URL)
-            response.raise_for_status()
-            logs = response.json()
+            self.recent_logs_feed.refresh()
+        except requests.RequestException as e:
+            print(f"Error refreshing logs before default time-out, using the local copy: {e}")
+        logs = self.recent_logs_feed.snapshot()
 
-            for log in logs:
-                uid = log.get('UID')
-                if log.get('time_in') and not log.get('time_out') and uid:
-                    default_time_out = "00:00"
-                    url = f"{TIME_OUT_URL}?rfid_number={uid}&time_out={default_time_out}"
-                    response = requests.put(url)
-                    response.raise_for_status()
-                    print(f"Time-Out recorded for UID {uid} at {default_time_out}.")
+        default_time_out = "00:00"
+        open_uids = [log.get('UID') for log in logs if log.get('time_in') and not log.get('time_out') and log.get('UID')]
+        results = self.session_closer.close_all(open_uids, default_time_out)
 
-            self.refresh_logs_table()
+        for uid, error in results.items():
+            if error is None:
+                print(f"Time-Out recorded for UID {uid} at {default_time_out}.")
+            else:
+                print(f"Error updating default time-out for UID {uid}, queued for retry: {error}")
+                self.journal.record('time_out', f"rfid:{uid}", TIME_OUT_URL,
+                                    {'rfid_number': uid, 'time_out': default_time_out})
 
-        except requests.RequestException as e:
-            print(f"Error updating default time-out records: {e}")
+        self.refresh_logs_table()
+        return results
 
     def refresh_logs_table(self):
-        self.root.after(100, self.fetch_recent_logs)
+        self.fetch_recent_logs()
 
     def fetch_recent_logs(self):
-        try:
-            response = requests.get(RECENT_LOGS_URL)
-            response.raise_for_status()
-            logs = response.json()
-            for i in self.logs_tree.get_children():
-                self.logs_tree.delete(i)
-            for log in logs:
-                self.logs_tree.insert("", "end", values=(
-                    log.get('date', 'N/A'),
-                    log.get('user_name', 'N/A'),
-                    log.get('seat_id', 'N/A'),
-                    log.get('user_number', 'N/A'),
-                    log.get('year', 'N/A'),
-                    log.get('block_name', 'N/A'),
-                    log.get('time_in', 'N/A'),
-                    log.get('time_out', 'N/A')
-                ))
-        except requests.RequestException as e:
-            self.update_result(f"Error fetching recent logs: {e}", color="red")
+        """Download recent logs on a worker and fill the table on the Tk thread. Safe from any thread."""
+        self.dispatcher.submit(self.load_recent_logs, on_done=self.populate_logs_table,
+                               on_error=lambda e: self.update_result(f"Error fetching recent logs: {e}", color="red"))
+
+    def load_recent_logs(self):
+        """Refresh the local recent-logs copy; returns the logs, or None if nothing changed."""
+        if self.recent_logs_feed.refresh():
+            return self.recent_logs_feed.snapshot()
+        return None
+
+    def populate_logs_table(self, logs):
+        """Apply the latest logs to the table, touching only rows that changed."""
+        if logs is not None:
+            self.logs_model.apply(logs)
+
+    def log_row_values(self, log):
+        return (
+            log.get('date', 'N/A'),
+            log.get('user_name', 'N/A'),
+            log.get('seat_id', 'N/A'),
+            log.get('user_number', 'N/A'),
+            log.get('year', 'N/A'),
+            log.get('block_name', 'N/A'),
+            log.get('time_in', 'N/A'),
+            log.get('time_out', 'N/A')
+        )
 
     def read_nfc_loop(self):
         while self.running:
@@ -1055,7 +1317,9 @@ class AttendanceApp:
                 tag = self.clf.connect(rdwr={'on-connect': lambda tag: False})
                 if tag:
                     uid = tag.identifier.hex()
+                    self.tracer.start('card', credential=f"rfid:{uid}")
                     self.fetch_user_info(uid)
+                    self.tracer.finish()
                     time.sleep(1)
             except Exception as e:
                 print(f"Error: {e}")
@@ -1063,27 +1327,16 @@ class AttendanceApp:
 
     def fetch_user_info(self, uid):
         try:
-            url = f'{USER_INFO_URL}?id_card_id={uid}'
-            response = requests.get(url)
-            response.raise_for_status()
-            data = response.json()
-
-            self.student_number_entry.delete(0, tk.END)
-            self.student_number_entry.insert(0, data.get('user_number', 'None'))
-
-            self.name_entry.delete(0, tk.END)
-            self.name_entry.insert(0, data.get('user_name', 'None'))
-
-            self.year_entry.delete(0, tk.END)
-            self.year_entry.insert(0, data.get('year', 'None'))
-
-            self.section_entry.delete(0, tk.END)
-            self.section_entry.insert(0, data.get('block', 'None'))
-
-            self.error_label.config(text="")
+            with self.tracer.span('user_lookup'):
+                data = self.card_directory.lookup(uid)
+            if data is None:
+                self.tracer.set_outcome('unknown_card')
+                self.dispatcher.call_soon(self.clear_data)
+                self.announcer.say('card_not_registered')
+                self.update_result("Card is not registered, Please contact the administrator.", color="red")
+                return
 
-            # Clear entries after 3 seconds
-            self.root.after(3000, self.clear_entries)
+            self.dispatcher.call_soon(self.show_user_info, data)
 
             current_time_data = self.fetch_current_date_time()
             if not current_time_data:
@@ -1091,21 +1344,44 @@ class AttendanceApp:
 
             current_time = datetime.strptime(current_time_data['current_time'], "%H:%M")
 
-            if self.check_time_in_record(uid):
-                self.record_time_out(uid)
+            # One schedule decision per tap, shared by the time-in and time-out paths
+            with self.tracer.span('schedule_check'):
+                decision = self.evaluate_schedule('rfid', uid)
+
+            with self.tracer.span('session_check'):
+                timed_in = self.check_time_in_record(uid)
+            if timed_in:
+                self.record_time_out(uid, decision)
             else:
-                self.record_time_in(uid, data.get('user_name', 'None'), data.get('year', 'None'))
+                self.record_time_in(uid, data.get('user_name', 'None'), data.get('year', 'None'), decision)
                 self.last_time_in[uid] = current_time
 
         except requests.HTTPError as http_err:
-            if response.status_code == 404:
-                self.clear_data()
-                self.update_result("Card is not registered, Please contact the administrator.", color="red")
-            else:
-                self.update_result(f"HTTP error occurred: {http_err}", color="red")
+            self.tracer.set_outcome('error')
+            self.update_result(f"HTTP error occurred: {http_err}", color="red")
         except requests.RequestException as e:
+            self.tracer.set_outcome('error')
             self.update_result(f"Error fetching user info: {e}", color="red")
 
+    def show_user_info(self, data):
+        """Fill the student entries; runs on the Tk thread."""
+        self.student_number_entry.delete(0, tk.END)
+        self.student_number_entry.insert(0, data.get('user_number', 'None'))
+
+        self.name_entry.delete(0, tk.END)
+        self.name_entry.insert(0, data.get('user_name', 'None'))
+
+        self.year_entry.delete(0, tk.END)
+        self.year_entry.insert(0, data.get('year', 'None'))
+
+        self.section_entry.delete(0, tk.END)
+        self.section_entry.insert(0, data.get('block', 'None'))
+
+        self.error_label.config(text="")
+
+        # Clear entries after 3 seconds
+        self.root.after(3000, self.clear_entries)
+
     def clear_entries(self):
         """Clear the entries for Student Number, Name, Year, and Section."""
         self.student_number_entry.delete(0, tk.END)
@@ -1114,9 +1390,12 @@ class AttendanceApp:
         self.section_entry.delete(0, tk.END)
 
     def check_time_in_record(self, rfid_number):
+        pending = self.journal.pending_kind(f"rfid:{rfid_number}")
+        if pending:
+            return pending == 'time_in'
         try:
             url = f'{RECENT_LOGS_URL2}?rfid_number={rfid_number}'
-            response = requests.get(url)
+            response = api_client.get(url)
             response.raise_for_status()
             logs = response.json()
             return any(log.get('time_in') and not log.get('time_out') for log in logs)
@@ -1124,62 +1403,57 @@ class AttendanceApp:
             self.update_result(f"Error checking Time-In record: {e}", color="red")
             return False
 
-    def record_time_in(self, rfid_number, user_name, year):
-        # Check if the class is a make-up class or a regular class
-        is_makeup_class = self.check_if_makeup_class_rfid(rfid_number)
+    def record_time_in(self, rfid_number, user_name, year, decision=None):
+        if decision is None:
+            decision = self.evaluate_schedule('rfid', rfid_number)
 
-        if is_makeup_class:
-            schedule_check = self.get_rfid_schedule_mock_up(rfid_number)
-        else:
-            schedule_check = self.get_rfid_schedule(rfid_number)
-
-        if not schedule_check:
+        if not decision.allowed:
+            self.tracer.set_outcome('denied')
+            self.announcer.say('access_denied')
             self.update_result("Access denied: Not within scheduled time.", color="red")
             return
 
-        try:
-            current_time_data = self.fetch_current_date_time()
-            if not current_time_data:
-                return
-            url = f"{TIME_IN_URL}?rfid_number={rfid_number}&time_in={current_time_data['current_time']}&year={year}&user_name={user_name}&role_id=3"
-            response = requests.put(url)
-            response.raise_for_status()
-
-            print("Time-In recorded successfully.")
-            self.update_result("Time-In recorded successfully.", color="green")
-            self.fetch_recent_logs()
-        except requests.RequestException as e:
-            self.update_result(f"Error recording Time-In: {e}", color="red")
-
-    def record_time_out(self, rfid_number):
-        # Check if the class is a make-up class or a regular class
-        is_makeup_class = self.check_if_makeup_class_rfid(rfid_number)
-
-        if is_makeup_class:
-            schedule_check = self.get_rfid_schedule_mock_up(rfid_number)
-        else:
-            schedule_check = self.get_rfid_schedule(rfid_number)
-
-        if not schedule_check:
+        current_time_data = self.fetch_current_date_time()
+        with self.tracer.span('time_in_record'):
+            self.journal.record('time_in', f"rfid:{rfid_number}", TIME_IN_URL, {
+                'rfid_number': rfid_number,
+                'time_in': current_time_data['current_time'],
+                'year': year,
+                'user_name': user_name,
+                'role_id': 3,
+            })
+        self.tracer.set_outcome('time_in')
+
+        print("Time-In recorded successfully.")
+        self.announcer.say('time_in')
+        self.update_result("Time-In recorded successfully.", color="green")
+
+    def record_time_out(self, rfid_number, decision=None):
+        if decision is None:
+            decision = self.evaluate_schedule('rfid', rfid_number)
+
+        if not decision.allowed:
+            self.tracer.set_outcome('denied')
+            self.announcer.say('access_denied')
             self.update_result("Access denied: Not within scheduled time.", color="red")
             return
 
-        try:
-            current_time_data = self.fetch_current_date_time()
-            if not current_time_data:
-                return
-            if not self.check_time_in_record(rfid_number):
-                self.update_result("No Time-In record found for this RFID. Cannot record Time-Out.", color="red")
-                return
+        current_time_data = self.fetch_current_date_time()
+        with self.tracer.span('session_check'):
+            timed_in = self.check_time_in_record(rfid_number)
+        if not timed_in:
+            self.update_result("No Time-In record found for this RFID. Cannot record Time-Out.", color="red")
+            return
 
-            url = f"{TIME_OUT_URL}?rfid_number={rfid_number}&time_out={current_time_data['current_time']}"
-            response = requests.put(url)
-            response.raise_for_status()
-            print("Time-Out recorded successfully.")
-            self.update_result("Time-Out recorded successfully.", color="green")
-            self.fetch_recent_logs()
-        except requests.RequestException as e:
-            self.update_result(f"Error recording Time-Out: {e}", color="red")
+        with self.tracer.span('time_out_record'):
+            self.journal.record('time_out', f"rfid:{rfid_number}", TIME_OUT_URL, {
+                'rfid_number': rfid_number,
+                'time_out': current_time_data['current_time'],
+            })
+        self.tracer.set_outcome('time_out')
+        print("Time-Out recorded successfully.")
+        self.announcer.say('time_out')
+        self.update_result("Time-Out recorded successfully.", color="green")
 
     def clear_data(self):
         self.student_number_entry.delete(0, tk.END)
@@ -1189,7 +1463,10 @@ class AttendanceApp:
         self.error_label.config(text="")
 
     def update_result(self, message, color="green"):
-        """Update the result label with a message and specified color."""
+        """Update the result label with a message and specified color. Safe to call from any thread."""
+        self.dispatcher.call_soon(self.show_result, message, color)
+
+    def show_result(self, message, color):
         self.error_label.config(text=message, fg=color)  # Set the text and color
         self.root.after(3000, self.clear_result)  # Schedule to clear the message after 3 seconds
 
@@ -1197,21 +1474,71 @@ class AttendanceApp:
         self.error_label.config(text="")  # Clear the message
 
     def on_closing(self):
+        self.stop_services()
+        print(f"Logs table refresh cost: {self.logs_model.stats()}")
+        self.root.destroy()
+
+    def stop_services(self):
+        """Stop the readers and background services, print their stats and lock the door."""
         self.running = False
+        if self.metrics_server:
+            self.metrics_server.stop()
+        self.door_channel.stop()
+        # Readers first: a tap or scan still in progress journals its attendance record before the journal closes
         if self.nfc_thread.is_alive():
             self.nfc_thread.join()
+        self.scan_stop.set()
         if self.fingerprint_thread.is_alive():
             self.fingerprint_thread.join()
+        if self.sensor:
+            self.sensor.close()
         if self.clf is not None:
             self.clf.close()
-        self.root.destroy()
-
-
-# Create the main window
-root = tk.Tk()
-app = AttendanceApp(root)
-
-center_window(root, 1200, 800)
-
-# Run the application
-root.mainloop()
+        print(f"Buzzer stats: {self.buzzer.stats()}")
+        self.buzzer.stop()
+        print(f"Door controller stats: {self.door.stats()}")
+        print(f"Announcement latency (synthesised vs cached): {self.announcer.stats()}")
+        self.announcer.close()
+        self.door.shutdown()
+        print(f"Door command channel: {self.door_channel.stats()}")
+        self.server_clock.stop()
+        self.schedule_store.close()
+        self.journal.close()
+        self.user_cache.close()
+        self.card_directory.close()
+        print(f"Card directory stats: {self.card_directory.stats()}")
+        print(f"User cache stats: {self.user_cache.stats()}")
+        if self.capture:
+            print(f"Fingerprint capture stats: {self.capture.stats()}")
+            print(f"Fingerprint slot allocator: {self.slots.stats()}")
+            print(f"Fingerprint sensor link: {self.sensor_link.stats()}")
+            print(f"Fingerprint sensor queue: {self.sensor.stats()}")
+            print(f"Fingerprint search: {self.hot_search.stats()}")
+        print(f"Scan stage latency: {self.tracer.stats()}")
+        print(f"Attendance journal stats: {self.journal.stats()}")
+        print(f"Server clock status: {self.server_clock.status()}")
+        print(f"UI main loop latency: {self.dispatcher.stats()}")
+        print(f"Recent logs sync: {self.recent_logs_feed.stats()}")
+        print(f"Door status sync: {self.log_status_feed.stats()}")
+        self.dispatcher.shutdown()
+        self.session_closer.shutdown()
+        print(f"API connection pool stats: {api_client.pool_stats()}")
+        api_client.close()
+
+
+def main():
+    # PROLOCK_HAL=sim runs the kiosk against simulated hardware
+    hal = create_backend()
+
+    # Create the main window
+    root = tk.Tk()
+    app = AttendanceApp(root, hal)
+
+    center_window(root, 1200, 800)
+
+    # Run the application
+    root.mainloop()
+
+
+if __name__ == '__main__':
+    main()
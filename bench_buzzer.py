@@ -0,0 +1,96 @@
+"""Compare the old blocking buzzer loop with BuzzerScheduler on a fake GPIO backend.
+
+Measures how long the caller (the fingerprint scan thread) is held up by an alarm and how
+accurately the scheduler hits its edges. Run with: python bench_buzzer.py [--scale 0.1]
+"""
+import argparse
+import json
+import threading
+import time
+
+from prolock_buzzer import PATTERNS, BuzzerScheduler
+
+BUZZER_PIN = 27
+
+
+class FakeGPIO:
+    """Records every output call with a timestamp instead of driving a pin."""
+    HIGH = 1
+    LOW = 0
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.edges = []
+
+    def output(self, pin, level):
+        with self.lock:
+            self.edges.append((time.monotonic(), pin, level))
+
+
+def blocking_alarm(gpio, interval):
+    """The loop trigger_buzzer used to run on the scan thread."""
+    for _ in range(50):
+        gpio.output(BUZZER_PIN, gpio.HIGH)
+        time.sleep(interval)
+        gpio.output(BUZZER_PIN, gpio.LOW)
+        time.sleep(interval)
+
+
+def scaled_patterns(scale):
+    return {name: [(level, seconds * scale) for level, seconds in steps] for name, steps in PATTERNS.items()}
+
+
+def bench_blocking(scale):
+    gpio = FakeGPIO()
+    start = time.perf_counter()
+    blocking_alarm(gpio, 0.1 * scale)
+    return {'caller_blocked_ms': 1000 * (time.perf_counter() - start), 'edges': len(gpio.edges)}
+
+
+def bench_scheduler(scale):
+    gpio = FakeGPIO()
+    buzzer = BuzzerScheduler(gpio, BUZZER_PIN, patterns=scaled_patterns(scale))
+    start = time.perf_counter()
+    buzzer.play('alarm')
+    blocked = time.perf_counter() - start
+
+    # While the alarm plays the scan thread is free; a lower priority beep is dropped, not queued
+    accepted_during_alarm = buzzer.play('accept')
+    while buzzer.playing():
+        time.sleep(0.001)
+    played_for = time.perf_counter() - start
+
+    # A new alarm can be cut short immediately
+    buzzer.play('alarm')
+    cancel_start = time.perf_counter()
+    buzzer.cancel()
+    while buzzer.playing():
+        time.sleep(0.0005)
+    cancel_latency = time.perf_counter() - cancel_start
+
+    stats = buzzer.stats()
+    buzzer.stop()
+    return {
+        'caller_blocked_ms': 1000 * blocked,
+        'alarm_duration_ms': 1000 * played_for,
+        'accept_during_alarm': accepted_during_alarm,
+        'cancel_ms': 1000 * cancel_latency,
+        'edges': len(gpio.edges),
+        'pin_left_low': gpio.edges[-1][2] == FakeGPIO.LOW,
+        'scheduler': stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', type=float, default=1.0, help='Multiply pattern timings (0.1 = ten times faster)')
+    args = parser.parse_args()
+    print(json.dumps({
+        'scale': args.scale,
+        'blocking': bench_blocking(args.scale),
+        'scheduler': bench_scheduler(args.scale),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Compare fingerprint match latency with and without the hot-set search stage.
+
+The simulated sensor holds --enrolled templates. --hot-slots of them, spread over the
+library the way enrollment order leaves them, form the hot set, and --hot-share of the
+touches belong to those people. The same touches are searched twice: once with the hot
+stage, once with only the full library search.
+
+    python bench_hot_search.py [--touches 50] [--enrolled 300] [--hot-slots 6] [--hot-share 0.8]
+"""
+import argparse
+import json
+import random
+
+from prolock_hal import FingerprintStatus, create_backend
+from prolock_search import HotSetSearch
+
+
+def run(search, finger, touches):
+    misses = 0
+    for slot in touches:
+        finger.present_finger('match', slot=slot)
+        finger.get_image()
+        finger.image_2_tz(1)
+        result = search.search()
+        misses += result.status != FingerprintStatus.OK or result.finger_id != slot
+    stats = search.stats()
+    stats['wrong_or_missed'] = misses
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--touches', type=int, default=50)
+    parser.add_argument('--enrolled', type=int, default=300, help="Templates on the simulated sensor")
+    parser.add_argument('--capacity', type=int, default=1000, help="Sensor library size")
+    parser.add_argument('--hot-slots', type=int, default=6, help="Slots in the hot set")
+    parser.add_argument('--hot-share', type=float, default=0.8, help="Share of touches by hot-set people")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_hot_search.json', help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    enrolled = list(range(1, args.enrolled + 1))
+    hot = sorted(rng.sample(enrolled, args.hot_slots))
+    cold = [slot for slot in enrolled if slot not in hot]
+    touches = [rng.choice(hot) if rng.random() < args.hot_share else rng.choice(cold) for _ in range(args.touches)]
+
+    backend = create_backend('sim', seed=args.seed, fingerprint_options={
+        'enrolled': enrolled, 'capacity': args.capacity, 'get_image_latency': 0.001, 'image_2_tz_latency': 0.001})
+    finger = backend.open_fingerprint()
+
+    two_stage = HotSetSearch(backend, finger)
+    two_stage.set_hot_slots(hot)
+    full_only = HotSetSearch(backend, finger)
+    report = {
+        'touches': args.touches, 'enrolled': args.enrolled, 'capacity': args.capacity,
+        'hot_slots': hot, 'hot_share': args.hot_share,
+        'two_stage': run(two_stage, finger, touches),
+        'full_only': run(full_only, finger, touches),
+    }
+    for name in ('two_stage', 'full_only'):
+        stats = report[name]
+        print(f"{name}: hot hits {stats['hot_hits']}, full searches {stats['full_searches']}, "
+              f"hot match p50 {stats.get('hot_match_p50_ms')} ms, full match p50 {stats.get('full_match_p50_ms')} ms")
+    with open(args.output, 'w', encoding='utf-8') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""Time fingerprint sensor round trips at each UART baud rate and data packet size.
+
+For every baud rate, get_image, image_2_tz, finger_search and read_sysparam are timed
+over --rounds calls (no finger is needed: the sensor still answers each command); for
+every packet size, so is a template upload (load_model + get_fpdata), if the sensor
+holds a template. The sensor is returned to its stored settings afterwards.
+
+Run on the kiosk with the app stopped, or against the simulator:
+    PROLOCK_HAL=sim python bench_sensor_link.py [--rounds 20] [--baud-rates 57600 115200]
+"""
+import argparse
+import json
+import time
+
+from prolock_hal import DEFAULT_BAUDRATE, FingerprintStatus, create_backend
+from prolock_sensor_link import BAUD_RATES, DEFAULT_PACKET_SIZE, PACKET_SIZES, SensorLink
+
+COMMANDS = ('get_image', 'image_2_tz', 'finger_search', 'read_sysparam')
+
+
+def percentiles(values):
+    values = sorted(values)
+    if not values:
+        return None
+
+    def at(fraction):
+        return round(1000 * values[min(len(values) - 1, int(len(values) * fraction))], 3)
+
+    return {'p50_ms': at(0.50), 'p95_ms': at(0.95), 'max_ms': round(1000 * values[-1], 3)}
+
+
+def time_calls(call, rounds):
+    """Time rounds calls of call(); returns (percentiles, errors)."""
+    times = []
+    errors = 0
+    for _ in range(rounds):
+        start = time.perf_counter()
+        try:
+            call()
+        except RuntimeError:
+            errors += 1
+            continue
+        times.append(time.perf_counter() - start)
+    return percentiles(times), errors
+
+
+def bench_commands(finger, rounds):
+    results = {}
+    for name in COMMANDS:
+        stats, errors = time_calls(getattr(finger, name), rounds)
+        results[name] = dict(stats or {}, errors=errors)
+    return results
+
+
+def bench_upload(finger, slot, rounds):
+    def upload():
+        if finger.load_model(slot, 1) != FingerprintStatus.OK:
+            raise RuntimeError("load_model failed")
+        finger.get_fpdata("char", 1)
+
+    stats, errors = time_calls(upload, rounds)
+    if stats:
+        stats['bytes_per_s'] = round(len(finger.get_fpdata("char", 1)) / (stats['p50_ms'] / 1000))
+    return dict(stats or {}, errors=errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rounds', type=int, default=20, help="Calls timed per command and setting")
+    parser.add_argument('--baud-rates', type=int, nargs='+', default=[DEFAULT_BAUDRATE, 76800, 96000, 115200],
+                        choices=sorted(set(BAUD_RATES + (DEFAULT_BAUDRATE,))), metavar='BAUD')
+    parser.add_argument('--packet-sizes', type=int, nargs='+', default=sorted(PACKET_SIZES), choices=PACKET_SIZES)
+    parser.add_argument('--output', default='bench_sensor_link.json', help="Where to write the JSON results")
+    args = parser.parse_args()
+
+    link = SensorLink(create_backend())
+    finger = link.open()
+    if finger is None:
+        raise SystemExit("The fingerprint sensor is not connected.")
+    original = dict(link.settings)
+    template_slot = finger.templates[0] if link.has_template() else None
+
+    results = []
+    try:
+        for baudrate in args.baud_rates:
+            if not link.set_baudrate(baudrate) or not link.probe(count=2, transfer=False):
+                results.append({'baudrate': baudrate, 'error': "sensor did not answer at this rate"})
+                link.recover()
+                continue
+            entry = {'baudrate': baudrate, 'commands': bench_commands(finger, args.rounds), 'uploads': {}}
+            if template_slot is not None:
+                for size in args.packet_sizes:
+                    if link.set_packet_size(size):
+                        entry['uploads'][size] = bench_upload(finger, template_slot, args.rounds)
+            results.append(entry)
+            print(f"{baudrate} baud: " + ", ".join(f"{name} {stats.get('p50_ms')} ms"
+                                                  for name, stats in entry['commands'].items()))
+    finally:
+        # Leave the sensor as the kiosk expects to find it
+        if template_slot is not None:
+            link.set_packet_size(original['packet_size'] or DEFAULT_PACKET_SIZE)
+        if link.settings['baudrate'] != original['baudrate']:
+            link.set_baudrate(original['baudrate'])
+        link.settings = original
+
+    report = {'rounds': args.rounds, 'template_slot': template_slot, 'results': results}
+    with open(args.output, 'w', encoding='utf-8') as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
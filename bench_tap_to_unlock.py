@@ -0,0 +1,362 @@
+"""End-to-end tap-to-unlock benchmark against a local mock of the ProLock API.
+
+Runs the real AttendanceApp services and reader threads on simulated hardware (prolock_hal)
+with a headless stand-in for the Tk main loop, drives card taps and fingerprint scans, and
+times each one from the sensor event to the local decision, the door transition and the
+server acknowledging the time-in/time-out. Remote open/close commands are then pushed
+over the door event stream and timed to delivery. Results are written as JSON for regression
+comparison. Run with: python bench_tap_to_unlock.py [--class-size 30] [--latency-ms 80]
+"""
+import argparse
+import contextlib
+import heapq
+import importlib
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+from prolock_hal import SimBackend
+from prolock_mockapi import Behaviour, MockProLockApi
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class HeadlessRoot:
+    """Runs root.after() callbacks in order on one thread, standing in for the Tk main loop."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.timers = []
+        self.sequence = itertools.count()
+        self.running = True
+        self.thread = threading.Thread(target=self.mainloop, daemon=True)
+        self.thread.start()
+
+    def after(self, ms, fn, *args):
+        with self.condition:
+            heapq.heappush(self.timers, (time.monotonic() + ms / 1000, next(self.sequence), fn, args))
+            self.condition.notify()
+
+    def mainloop(self):
+        while True:
+            with self.condition:
+                while self.running and (not self.timers or self.timers[0][0] > time.monotonic()):
+                    self.condition.wait(self.timers[0][0] - time.monotonic() if self.timers else None)
+                if not self.running:
+                    return
+                _, _, fn, args = heapq.heappop(self.timers)
+            fn(*args)
+
+    def destroy(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+
+
+class TapRecorder:
+    """Collects monotonic timestamps for each tap or scan from hooks in the app."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = []
+        self.open = {}  # credential -> its latest record
+        self.finger_down = None
+        self.current_finger = None
+        self.rejections = []
+
+    def start(self, phase, credential, sensor_at):
+        record = {'phase': phase, 'credential': credential, 'sensor': sensor_at}
+        with self.lock:
+            self.records.append(record)
+            self.open[credential] = record
+        return record
+
+    def mark(self, credential, name, at=None):
+        with self.lock:
+            record = self.open.get(credential)
+            if record is not None and name not in record:
+                record[name] = time.monotonic() if at is None else at
+
+    def acked(self, event):
+        self.mark(event['credential'], 'acked')
+
+    def finger_event(self, event, timestamp):
+        if event == 'finger_present':
+            self.finger_down = timestamp
+
+    def door_changed(self, old_state, new_state, event, source):
+        if event in ('hold_open', 'release') and self.current_finger:
+            self.mark(self.current_finger, 'door')
+
+    def result(self, message, color):
+        if color == 'red':
+            with self.lock:
+                self.rejections.append(message)
+
+    def phase_records(self, phase):
+        with self.lock:
+            return [dict(record) for record in self.records if record['phase'] == phase]
+
+    def wait_for(self, phase, fields, count, timeout):
+        """Wait until count records of phase have every field, or timeout. Returns True if they did."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            records = self.phase_records(phase)
+            if len(records) >= count and all(all(field in record for field in fields) for record in records):
+                return True
+            time.sleep(0.01)
+        return False
+
+
+def make_headless_app(module, recorder):
+    """Subclass AttendanceApp so its services and readers run without any Tk widgets."""
+
+    class HeadlessApp(module.AttendanceApp):
+        def __init__(self, root, hal):
+            self.root = root
+            self.phase = None
+            self.dispatcher = module.UiDispatcher(root)
+            self.start_services(hal)
+            on_sent = self.journal.on_sent
+            self.journal.on_sent = lambda event: (recorder.acked(event), on_sent(event))
+            self.door.subscribe(recorder.door_changed)
+            self.start_readers()
+            if self.capture:
+                self.capture.subscribe(recorder.finger_event)
+
+        def fetch_user_info(self, uid):
+            credential = f"rfid:{uid}"
+            tapped_at = self.clf.delivered[-1][0] if self.clf.delivered else time.monotonic()
+            recorder.start(self.phase, credential, tapped_at)
+            super().fetch_user_info(uid)
+            recorder.mark(credential, 'decided')
+
+        def record_time_in_fingerprint(self, fingerprint_id, user_name, role_id="2"):
+            self.start_fingerprint(fingerprint_id)
+            super().record_time_in_fingerprint(fingerprint_id, user_name, role_id)
+            recorder.mark(f"fingerprint:{fingerprint_id}", 'decided')
+
+        def record_time_out_fingerprint(self, fingerprint_id):
+            self.start_fingerprint(fingerprint_id)
+            super().record_time_out_fingerprint(fingerprint_id)
+            recorder.mark(f"fingerprint:{fingerprint_id}", 'decided')
+
+        def start_fingerprint(self, fingerprint_id):
+            credential = f"fingerprint:{fingerprint_id}"
+            recorder.start(self.phase, credential, recorder.finger_down or time.monotonic())
+            recorder.current_finger = credential
+
+        def show_result(self, message, color):
+            recorder.result(message, color)
+
+        def show_user_info(self, data):
+            pass
+
+        def clear_data(self):
+            pass
+
+        def populate_logs_table(self, logs):
+            pass
+
+    return HeadlessApp
+
+
+def percentiles(values):
+    if not values:
+        return {'count': 0}
+    values = sorted(values)
+
+    def at(fraction):
+        return round(1000 * values[min(len(values) - 1, int(len(values) * fraction))], 3)
+
+    return {'count': len(values), 'p50_ms': at(0.50), 'p95_ms': at(0.95), 'p99_ms': at(0.99),
+            'max_ms': round(1000 * values[-1], 3)}
+
+
+def summarize(recorder, phase, requests_before, requests_after, completed):
+    records = recorder.phase_records(phase)
+    summary = {'taps': len(records), 'completed': completed}
+    for name in ('decided', 'door', 'acked'):
+        latencies = [record[name] - record['sensor'] for record in records if name in record]
+        if latencies:
+            summary[f'sensor_to_{name}'] = percentiles(latencies)
+    routes = {route: requests_after.get(route, 0) - requests_before.get(route, 0) for route in requests_after}
+    routes = {route: count for route, count in routes.items() if count}
+    summary['requests'] = routes
+    summary['requests_per_tap'] = round(sum(routes.values()) / len(records), 2) if records else None
+    decided = [record['decided'] for record in records if 'decided' in record]
+    if len(decided) > 1:
+        span = max(decided) - min(record['sensor'] for record in records)
+        summary['throughput_per_s'] = round(len(decided) / span, 3) if span > 0 else None
+    return summary
+
+
+def run_card_phase(app, mock, recorder, phase, uids, spacing, timeout):
+    app.phase = phase
+    before = mock.request_counts()
+    for index, uid in enumerate(uids):
+        app.clf.tap(uid, delay=spacing if spacing and index else 0.0)
+        if spacing is None:
+            recorder.wait_for(phase, ('decided', 'acked'), index + 1, timeout)
+    completed = recorder.wait_for(phase, ('decided', 'acked'), len(uids), timeout + len(uids) * 1.5)
+    return summarize(recorder, phase, before, mock.request_counts(), completed)
+
+
+def run_fingerprint_phase(app, mock, recorder, scans, timeout):
+    phase = 'faculty_fingerprint'
+    app.phase = phase
+    before = mock.request_counts()
+    for index in range(scans):
+        app.sensor.finger.present_finger('match')
+        recorder.wait_for(phase, ('decided', 'door', 'acked'), index + 1, timeout)
+    completed = recorder.wait_for(phase, ('decided', 'door', 'acked'), scans, timeout)
+    return summarize(recorder, phase, before, mock.request_counts(), completed)
+
+
+def run_remote_commands(app, mock, count, timeout):
+    """Push alternating open/close commands over the door event stream; returns the channel's stats."""
+    deadline = time.monotonic() + timeout
+    while app.door_channel.mode != 'stream' and time.monotonic() < deadline:
+        time.sleep(0.05)
+    for index in range(count):
+        delivered = app.door_channel.commands
+        status = 'open' if app.door_channel.last_status != 'open' else 'close'
+        mock.send_door_command(status)
+        deadline = time.monotonic() + timeout
+        while app.door_channel.commands == delivered and time.monotonic() < deadline:
+            time.sleep(0.01)
+    stats = app.door_channel.stats()
+    stats['sent'] = count
+    return stats
+
+
+def scrape_metrics(app):
+    """Fetch the kiosk's /metrics page once; returns its size and how long the scrape took."""
+    if app.metrics_server is None:
+        return None
+    start = time.monotonic()
+    with urllib.request.urlopen(app.metrics_server.url, timeout=5) as response:
+        body = response.read().decode('utf-8')
+    samples = [line for line in body.splitlines() if line and not line.startswith('#')]
+    return {'ms': round(1000 * (time.monotonic() - start), 3), 'samples': len(samples), 'bytes': len(body)}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(results, baseline_path):
+    """Print the change in p50/p95 latency per phase against an earlier results file."""
+    with open(baseline_path, encoding='utf-8') as baseline_file:
+        baseline = json.load(baseline_file)
+    for phase, summary in results['phases'].items():
+        for metric, values in summary.items():
+            old = baseline.get('phases', {}).get(phase, {}).get(metric)
+            if not isinstance(values, dict) or not isinstance(old, dict) or 'p50_ms' not in values:
+                continue
+            for key in ('p50_ms', 'p95_ms'):
+                if old.get(key):
+                    change = 100.0 * (values[key] - old[key]) / old[key]
+                    print(f"{phase} {metric} {key}: {old[key]:.1f} -> {values[key]:.1f} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--class-size', type=int, default=30, help='Students in the class bursts')
+    parser.add_argument('--single-taps', type=int, default=5, help='Students who arrive one at a time first')
+    parser.add_argument('--burst-spacing', type=float, default=0.05, help='Seconds between taps in a burst')
+    parser.add_argument('--fingerprint-scans', type=int, default=4, help='Faculty fingerprint scans')
+    parser.add_argument('--remote-commands', type=int, default=4, help='Remote open/close commands pushed')
+    parser.add_argument('--latency-ms', type=float, default=50.0, help='Mock API latency per request')
+    parser.add_argument('--jitter-ms', type=float, default=20.0, help='Uniform jitter added to the latency')
+    parser.add_argument('--failure-rate', type=float, default=0.0, help='Fraction of requests answered with 503')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=20.0, help='Seconds to wait for one tap to complete')
+    parser.add_argument('--output', default='bench_tap_to_unlock.json')
+    parser.add_argument('--baseline', help='Earlier results file to compare against')
+    parser.add_argument('--verbose', action='store_true', help="Show the kiosk's own log output")
+    args = parser.parse_args()
+
+    output_path = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+    mock = MockProLockApi(faculty_count=5, student_count=args.class_size, seed=args.seed,
+                          default=Behaviour(latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                                            failure_rate=args.failure_rate)).start()
+    os.environ['PROLOCK_API_URL'] = mock.url
+    os.environ['PROLOCK_METRICS_HOST'] = '127.0.0.1'
+    os.environ['PROLOCK_METRICS_PORT'] = '0'  # Any free port, so a kiosk already running here doesn't clash
+    sys.path.insert(0, REPO_DIR)
+
+    workdir = tempfile.mkdtemp(prefix='prolock-bench-')
+    os.chdir(workdir)  # Journal, caches and the schedule database are created in the working directory
+    app_log = open(os.path.join(workdir, 'kiosk.log'), 'w', encoding='utf-8')
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(app_log)
+
+    recorder = TapRecorder()
+    hal = SimBackend(seed=args.seed, fingerprint_options={'enrolled': mock.fingerprint_ids(), 'outcomes': []},
+                     nfc_options={'taps': [], 'idle_timeout': 0.2})
+    uids = mock.student_uids()
+    single, rest = uids[:args.single_taps], uids[args.single_taps:]
+
+    with quiet:
+        kiosk = importlib.import_module('Prolock_Latest')
+        root = HeadlessRoot()
+        app = make_headless_app(kiosk, recorder)(root, hal)
+        deadline = time.monotonic() + args.timeout
+        while app.card_directory.last_bulk_sync is None and time.monotonic() < deadline:
+            time.sleep(0.05)  # Let the card directory finish its first bulk sync
+
+        phases = {
+            'card_single': run_card_phase(app, mock, recorder, 'card_single', single, None, args.timeout),
+            'class_burst_arrival': run_card_phase(app, mock, recorder, 'class_burst_arrival', rest,
+                                                  args.burst_spacing, args.timeout),
+            'class_burst_departure': run_card_phase(app, mock, recorder, 'class_burst_departure', uids,
+                                                    args.burst_spacing, args.timeout),
+            'faculty_fingerprint': run_fingerprint_phase(app, mock, recorder, args.fingerprint_scans,
+                                                         args.timeout),
+        }
+        components = {
+            'door_channel': run_remote_commands(app, mock, args.remote_commands, args.timeout),
+            'journal': app.journal.stats(),
+            'door': app.door.stats(),
+            'ui_loop': app.dispatcher.stats(),
+            'card_directory': app.card_directory.stats(),
+            'connection_pool': kiosk.api_client.pool_stats(),
+            'stages': app.tracer.stats(),
+            'metrics_scrape': scrape_metrics(app),
+        }
+        app.stop_services()
+        root.destroy()
+    mock.stop()
+
+    results = {
+        'benchmark': 'tap_to_unlock',
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'git_commit': git_commit()},
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline', 'verbose')},
+        'phases': phases,
+        'rejections': recorder.rejections,
+        'components': components,
+    }
+    with open(output_path, 'w', encoding='utf-8') as output_file:
+        json.dump(results, output_file, indent=2, default=str)
+    print(json.dumps(phases, indent=2))
+    print(f"Results written to {output_path} (kiosk log: {app_log.name})")
+    if baseline_path:
+        compare(results, baseline_path)
+
+
+if __name__ == '__main__':
+    main()
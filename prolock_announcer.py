@@ -0,0 +1,180 @@
+import hashlib
+import itertools
+import os
+import queue
+import subprocess
+import threading
+import time
+from collections import deque
+
+# Fixed announcements, rendered once when the announcer starts
+PHRASES = {
+    'door_unlocked': "Door unlocked",
+    'door_locked': "Door locked",
+    'access_denied': "Access denied",
+    'card_not_registered': "Card not registered",
+    'no_match': "Fingerprint not recognized",
+    'time_in': "Time in recorded",
+    'time_out': "Time out recorded",
+}
+
+# Per-user announcements; known names are rendered when the user list is synced
+GREETINGS = {
+    'welcome': "Welcome, {name}",
+    'goodbye': "Goodbye, {name}",
+}
+
+PLAY = 0  # Queue priorities: playback always goes before background rendering
+RENDER = 1
+
+
+class Announcer:
+    """Speaks announcements from a cache of pre-rendered WAV files without blocking the caller.
+
+    say() only queues the phrase. One worker thread owns the pyttsx3 engine (it is not
+    thread-safe) and the audio player: a cached phrase is played with player_command,
+    a miss is spoken live and then rendered for next time. prerender() fills the cache in
+    the background at a lower priority than playback.
+    """
+
+    def __init__(self, engine, cache_dir, player_command=('aplay', '-q'), max_pending=3):
+        self.engine = engine
+        self.cache_dir = cache_dir
+        self.player_command = list(player_command) if player_command else None
+        self.max_pending = max_pending  # Announcements beyond this are dropped; late speech is worse than none
+        self.jobs = queue.PriorityQueue()
+        self.sequence = itertools.count()  # Keeps FIFO order within one priority
+        self.lock = threading.Lock()
+        self.pending_plays = 0
+        self.rendering = set()
+        self.counters = {'cached': 0, 'live': 0, 'dropped': 0, 'rendered': 0, 'render_failures': 0}
+        self.latencies = {'cached': deque(maxlen=200), 'live': deque(maxlen=200)}  # say() to audio start
+        self.render_times = deque(maxlen=200)
+        self.utterance_started = None
+        os.makedirs(cache_dir, exist_ok=True)
+        if self.engine is not None:
+            self.engine.connect('started-utterance', self.on_utterance_started)
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def text_for(self, key, **fields):
+        if key in PHRASES:
+            return PHRASES[key]
+        if key in GREETINGS:
+            return GREETINGS[key].format(**fields)
+        return key  # Free text
+
+    def path_for(self, text):
+        digest = hashlib.sha1(text.strip().lower().encode('utf-8')).hexdigest()[:20]
+        return os.path.join(self.cache_dir, f"{digest}.wav")
+
+    def say(self, key, **fields):
+        """Queue an announcement (a PHRASES/GREETINGS key or free text). Returns False if it was dropped."""
+        text = self.text_for(key, **fields)
+        with self.lock:
+            if self.pending_plays >= self.max_pending:
+                self.counters['dropped'] += 1
+                return False
+            self.pending_plays += 1
+        self.jobs.put((PLAY, next(self.sequence), text, time.monotonic()))
+        return True
+
+    def prerender(self, texts):
+        """Render every text that is not cached yet, in the background. Returns how many were queued."""
+        queued = 0
+        for text in texts:
+            with self.lock:
+                if text in self.rendering or os.path.exists(self.path_for(text)):
+                    continue
+                self.rendering.add(text)
+            self.jobs.put((RENDER, next(self.sequence), text, time.monotonic()))
+            queued += 1
+        return queued
+
+    def prerender_phrases(self):
+        return self.prerender(PHRASES.values())
+
+    def prerender_greetings(self, names):
+        return self.prerender(template.format(name=name) for name in names if name
+                              for template in GREETINGS.values())
+
+    def run(self):
+        while True:
+            kind, _, text, queued_at = self.jobs.get()
+            if text is None:
+                return
+            try:
+                if kind == PLAY:
+                    with self.lock:
+                        self.pending_plays -= 1
+                    self.play(text, queued_at)
+                else:
+                    self.render(text)
+            except Exception as e:
+                print(f"Announcement '{text}' failed: {e}")
+
+    def play(self, text, queued_at):
+        path = self.path_for(text)
+        if self.player_command and os.path.exists(path):
+            try:
+                player = subprocess.Popen(self.player_command + [path])
+                self.record('cached', time.monotonic() - queued_at)
+                player.wait()
+                return
+            except FileNotFoundError:
+                print(f"Audio player {self.player_command[0]} not found; using live speech.")
+                self.player_command = None
+
+        if self.engine is None:
+            print(f"Announcement (no speech engine): {text}")
+            return
+        self.utterance_started = None
+        self.engine.say(text)
+        self.engine.runAndWait()
+        started = self.utterance_started or time.monotonic()
+        self.record('live', started - queued_at)
+        if self.player_command:
+            self.prerender([text])  # Cache misses are rendered so the next time is instant
+
+    def render(self, text):
+        try:
+            if self.engine is None:
+                return
+            path = self.path_for(text)
+            temp_path = path + '.tmp.wav'
+            start = time.monotonic()
+            self.engine.save_to_file(text, temp_path)
+            self.engine.runAndWait()
+            if not os.path.exists(temp_path) or os.path.getsize(temp_path) == 0:
+                with self.lock:
+                    self.counters['render_failures'] += 1
+                return
+            os.replace(temp_path, path)
+            with self.lock:
+                self.counters['rendered'] += 1
+                self.render_times.append(time.monotonic() - start)
+        finally:
+            with self.lock:
+                self.rendering.discard(text)
+
+    def on_utterance_started(self, name):
+        self.utterance_started = time.monotonic()
+
+    def record(self, source, latency):
+        with self.lock:
+            self.counters[source] += 1
+            self.latencies[source].append(latency)
+
+    def stats(self):
+        """Return hit counts and median latency (ms) from say() to audio start, cached vs live."""
+        with self.lock:
+            stats = dict(self.counters)
+            latencies = {source: sorted(values) for source, values in self.latencies.items()}
+            render_times = sorted(self.render_times)
+        for source, values in latencies.items():
+            stats[f'{source}_p50_ms'] = 1000 * values[len(values) // 2] if values else None
+        stats['render_p50_ms'] = 1000 * render_times[len(render_times) // 2] if render_times else None
+        return stats
+
+    def close(self):
+        self.jobs.put((PLAY - 1, next(self.sequence), None, 0.0))
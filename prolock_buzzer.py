@@ -0,0 +1,130 @@
+import threading
+import time
+from collections import deque
+
+# Named patterns as (level, seconds) steps; level 1 drives the buzzer pin high
+PATTERNS = {
+    'accept': [(1, 0.08)],
+    'reject': [(1, 0.15), (0, 0.1), (1, 0.15)],
+    'alarm': [(1, 0.1), (0, 0.1)] * 50,  # 10 seconds, same cadence as the old blocking loop
+}
+
+# Higher priority patterns interrupt lower ones; a lower priority request is dropped while they play
+PRIORITIES = {
+    'accept': 0,
+    'reject': 1,
+    'alarm': 2,
+}
+
+
+class BuzzerScheduler:
+    """Plays buzzer patterns on a GPIO pin from its own thread so callers never wait on them.
+
+    play() returns immediately. A pattern with equal or higher priority replaces the one
+    playing; a lower priority pattern is ignored until the current one finishes. cancel()
+    stops playback and leaves the pin low. Each edge is timed against the pattern's start,
+    so sleep overshoot does not accumulate over a long alarm.
+    """
+
+    def __init__(self, gpio, pin, patterns=None, priorities=None):
+        self.gpio = gpio
+        self.pin = pin
+        self.patterns = dict(PATTERNS if patterns is None else patterns)
+        self.priorities = dict(PRIORITIES if priorities is None else priorities)
+        self.condition = threading.Condition()
+        self.current = None  # (name, priority, steps, started_at)
+        self.generation = 0  # Bumped on every play/cancel so the player notices the change
+        self.running = True
+        self.played = 0
+        self.preempted = 0
+        self.dropped = 0
+        self.activations = {}  # Pattern name -> times it started playing
+        self.edge_errors = deque(maxlen=500)  # Seconds each edge fired after it was due
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def play(self, name, priority=None):
+        """Start pattern name in the background. Returns False if a higher priority pattern is playing."""
+        steps = self.patterns[name]
+        if priority is None:
+            priority = self.priorities.get(name, 0)
+        with self.condition:
+            if self.current is not None:
+                if priority < self.current[1]:
+                    self.dropped += 1
+                    return False
+                self.preempted += 1
+            self.current = (name, priority, steps, time.monotonic())
+            self.generation += 1
+            self.played += 1
+            self.activations[name] = self.activations.get(name, 0) + 1
+            self.condition.notify()
+        return True
+
+    def cancel(self, name=None):
+        """Stop the pattern playing (only if it is name, when given). Returns True if one was stopped."""
+        with self.condition:
+            if self.current is None or (name is not None and self.current[0] != name):
+                return False
+            self.current = None
+            self.generation += 1
+            self.condition.notify()
+        return True
+
+    def playing(self):
+        with self.condition:
+            return self.current[0] if self.current is not None else None
+
+    def output(self, level):
+        self.gpio.output(self.pin, self.gpio.HIGH if level else self.gpio.LOW)
+
+    def run(self):
+        while True:
+            with self.condition:
+                while self.running and self.current is None:
+                    self.condition.wait()
+                if not self.running:
+                    break
+                generation = self.generation
+                name, priority, steps, started_at = self.current
+            self.play_steps(generation, steps, started_at)
+            self.output(0)
+            with self.condition:
+                if self.generation == generation:
+                    self.current = None  # Finished normally
+        self.output(0)
+
+    def play_steps(self, generation, steps, started_at):
+        due = started_at
+        for level, seconds in steps:
+            self.edge_errors.append(max(time.monotonic() - due, 0.0))
+            self.output(level)
+            due += seconds
+            with self.condition:
+                while self.running and self.generation == generation:
+                    remaining = due - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                if not self.running or self.generation != generation:
+                    return False
+        return True
+
+    def stats(self):
+        with self.condition:
+            errors = sorted(self.edge_errors)
+            stats = {'played': self.played, 'preempted': self.preempted, 'dropped': self.dropped,
+                     'playing': self.current[0] if self.current is not None else None,
+                     'activations': dict(self.activations)}
+        if errors:
+            stats['edge_error_p50_ms'] = 1000 * errors[len(errors) // 2]
+            stats['edge_error_max_ms'] = 1000 * errors[-1]
+        return stats
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.current = None
+            self.generation += 1
+            self.condition.notify()
+        self.thread.join(timeout=1)
@@ -0,0 +1,274 @@
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+
+# Stored in place of a value when the loader reported "not found" (negative caching)
+NOT_FOUND = {'__not_found__': True}
+
+
+class TTLCache:
+    """Bounded LRU cache with time-to-live, stale-while-revalidate and optional JSON persistence.
+
+    get_or_load() returns fresh entries directly, returns stale entries immediately while a
+    background thread re-fetches them, and only calls the loader inline on a miss. A loader
+    that returns None means "does not exist"; that answer is cached for negative_ttl seconds.
+    """
+
+    def __init__(self, loader, maxsize=512, ttl=3600, stale_ttl=86400, negative_ttl=60, path=None,
+                 name='cache'):
+        self.loader = loader
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl  # How long past ttl an entry may still be served while it is refreshed
+        self.negative_ttl = negative_ttl
+        self.path = path
+        self.name = name
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # key -> (value, stored_at wall time)
+        self.counters = {'hits': 0, 'misses': 0, 'stale': 0, 'negative_hits': 0, 'evictions': 0,
+                         'refreshes': 0, 'refresh_failures': 0}
+        self.refresh_queue = queue.Queue()
+        self.refreshing = set()
+        self.dirty = False
+        self.thread = threading.Thread(target=self.refresh_loop, daemon=True)
+        self.thread.start()
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as cache_file:
+                stored = json.load(cache_file)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable {self.name} file: {e}")
+            return
+        with self.lock:
+            for key, value, stored_at in stored:
+                self.entries[key] = (value, stored_at)
+            self.trim()
+
+    def save(self):
+        """Write the cache to disk if it changed since the last save."""
+        if not self.path:
+            return
+        with self.lock:
+            if not self.dirty:
+                return
+            stored = [[key, value, stored_at] for key, (value, stored_at) in self.entries.items()]
+            self.dirty = False
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as cache_file:
+            json.dump(stored, cache_file, separators=(',', ':'))
+        os.replace(temp_path, self.path)
+
+    def trim(self):
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    def put(self, key, value):
+        """Store a value (None caches a "not found" answer)."""
+        key = str(key)
+        with self.lock:
+            self.entries[key] = (NOT_FOUND if value is None else value, time.time())
+            self.entries.move_to_end(key)
+            self.trim()
+            self.dirty = True
+
+    def invalidate(self, key):
+        with self.lock:
+            if self.entries.pop(str(key), None) is not None:
+                self.dirty = True
+
+    def retain(self, keys):
+        """Drop every cached value whose key is not in keys, keeping "not found" entries. Returns the count."""
+        keys = {str(key) for key in keys}
+        with self.lock:
+            dropped = [key for key, (value, _) in self.entries.items() if key not in keys and value != NOT_FOUND]
+            for key in dropped:
+                del self.entries[key]
+            if dropped:
+                self.dirty = True
+        return len(dropped)
+
+    def lookup(self, key):
+        """Return (state, value) without loading; state is 'hit', 'stale', 'negative' or 'miss'."""
+        key = str(key)
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return 'miss', None
+            value, stored_at = entry
+            age = now - stored_at
+            if value == NOT_FOUND:
+                if age < self.negative_ttl:
+                    self.entries.move_to_end(key)
+                    return 'negative', None
+                return 'miss', None
+            if age < self.ttl:
+                self.entries.move_to_end(key)
+                return 'hit', value
+            if age < self.ttl + self.stale_ttl:
+                self.entries.move_to_end(key)
+                return 'stale', value
+            return 'miss', None
+
+    def get_or_load(self, key):
+        """Return the cached value for key, loading it on a miss. Loader exceptions propagate on a miss."""
+        key = str(key)  # Keys are strings so they survive the JSON round trip; the loader sees them that way too
+        state, value = self.lookup(key)
+        with self.lock:
+            self.counters[{'hit': 'hits', 'stale': 'stale', 'negative': 'negative_hits',
+                           'miss': 'misses'}[state]] += 1
+        if state in ('hit', 'negative'):
+            return value
+        if state == 'stale':
+            self.schedule_refresh(key)
+            return value
+
+        value = self.loader(key)
+        self.put(key, value)
+        return value
+
+    def schedule_refresh(self, key):
+        key = str(key)
+        with self.lock:
+            if key in self.refreshing:
+                return
+            self.refreshing.add(key)
+        self.refresh_queue.put(key)
+
+    def refresh_loop(self):
+        while True:
+            try:
+                key = self.refresh_queue.get(timeout=60)
+            except queue.Empty:
+                self.save()  # Persist periodically while idle
+                continue
+            if key is None:
+                return
+            try:
+                self.put(key, self.loader(key))
+                with self.lock:
+                    self.counters['refreshes'] += 1
+            except Exception as e:
+                # Keep serving the stale value; the next lookup will try again
+                with self.lock:
+                    self.counters['refresh_failures'] += 1
+                print(f"Background refresh of {self.name} entry {key} failed: {e}")
+            finally:
+                with self.lock:
+                    self.refreshing.discard(key)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats['size'] = len(self.entries)
+        lookups = stats['hits'] + stats['stale'] + stats['negative_hits'] + stats['misses']
+        stats['hit_rate'] = (lookups - stats['misses']) / lookups if lookups else 0.0
+        return stats
+
+    def close(self):
+        self.refresh_queue.put(None)
+        self.save()
+
+
+class CredentialDirectory:
+    """Local directory of RFID card UIDs, answering "who owns this card" without a request.
+
+    The directory is filled in bulk from bulk_url when the server provides it, and per card
+    from lookup_url otherwise. Unregistered cards are remembered for negative_ttl seconds so
+    repeated taps of an unknown card don't each hit the API.
+    """
+
+    def __init__(self, client, lookup_url, bulk_url=None, path=None, sync_interval=1800, negative_ttl=300):
+        self.client = client
+        self.lookup_url = lookup_url
+        self.bulk_url = bulk_url
+        self.sync_interval = sync_interval
+        self.last_bulk_sync = None
+        self.cache = TTLCache(self.load_card, maxsize=5000, ttl=sync_interval * 2, stale_ttl=30 * 86400,
+                              negative_ttl=negative_ttl, path=path, name='card directory')
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def normalize(self, uid):
+        return str(uid).strip().lower()
+
+    def load_card(self, uid):
+        """Fetch one card's owner; None when the server answers 404 (card not registered)."""
+        response = self.client.get(self.lookup_url, params={'id_card_id': uid})
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def lookup(self, uid):
+        """Return the user record for a card UID, or None if the card is not registered."""
+        return self.cache.get_or_load(self.normalize(uid))
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.sync_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def sync_loop(self):
+        while self.bulk_url and not self.stop_event.is_set():
+            self.sync_all()
+            self.stop_event.wait(self.sync_interval)
+
+    def sync_all(self):
+        """Download every registered card in one request, dropping unlisted ones. Returns the number stored."""
+        try:
+            response = self.client.get(self.bulk_url)
+            if response.status_code in (404, 405):
+                print("Bulk card list not available on this server; using per-card lookups.")
+                self.bulk_url = None
+                return 0
+            response.raise_for_status()
+            users = response.json()
+        except (requests.RequestException, ValueError) as e:
+            print(f"Error syncing card directory: {e}")
+            return 0
+
+        seen = set()
+        for user in users:
+            uid = user.get('id_card_id')
+            if not uid:
+                continue
+            seen.add(self.normalize(uid))
+            # Keep only the fields the kiosk displays, in the shape of the by-id-card endpoint
+            self.cache.put(self.normalize(uid), {
+                'user_number': user.get('user_number'),
+                'user_name': user.get('user_name') or user.get('name'),
+                'year': user.get('year'),
+                'block': user.get('block') or user.get('block_name'),
+            })
+        # The list is complete, so a card missing from it has been deregistered and must stop opening the door
+        removed = self.cache.retain(seen)
+        if removed:
+            print(f"Removed {removed} deregistered card(s) from the card directory.")
+        self.last_bulk_sync = time.time()
+        self.cache.save()
+        return len(seen)
+
+    def stats(self):
+        stats = self.cache.stats()
+        stats['last_bulk_sync_age'] = time.time() - self.last_bulk_sync if self.last_bulk_sync else None
+        return stats
+
+    def close(self):
+        self.stop()
+        self.cache.close()
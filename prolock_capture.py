@@ -0,0 +1,123 @@
+import threading
+import time
+from collections import deque
+
+from prolock_hal import FingerprintStatus
+
+
+class FingerprintCapture:
+    """Waits for a finger on the sensor without busy-waiting and reports how fast it got a template.
+
+    If the sensor's touch/wake line is wired to a GPIO pin, the wait blocks on that edge and
+    uses no CPU. Otherwise get_image() is polled at idle_interval, dropping to fast_interval
+    for fast_window seconds after any contact so the second touch of an enrollment, or a
+    retry after a bad image, is picked up almost immediately.
+    """
+
+    def __init__(self, finger, gpio=None, touch_pin=None, idle_interval=0.15, fast_interval=0.01,
+                 fast_window=3.0):
+        self.finger = finger
+        self.gpio = gpio
+        self.touch_pin = touch_pin
+        self.idle_interval = idle_interval
+        self.fast_interval = fast_interval
+        self.fast_window = fast_window
+        self.last_contact = 0.0
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=200)  # Seconds from finger down to template ready
+        self.wait_wall_time = 0.0
+        self.wait_cpu_time = 0.0
+        self.captures = 0
+
+        if self.gpio is not None and self.touch_pin is not None:
+            self.gpio.setup(self.touch_pin, self.gpio.IN, pull_up_down=self.gpio.PUD_UP)
+
+    def subscribe(self, callback):
+        """Register callback(event, timestamp) for 'finger_present' and 'template_ready' events."""
+        self.subscribers.append(callback)
+
+    def publish(self, event, timestamp):
+        for callback in self.subscribers:
+            try:
+                callback(event, timestamp)
+            except Exception as e:
+                print(f"Fingerprint event handler failed: {e}")
+
+    def poll_interval(self):
+        if time.monotonic() - self.last_contact < self.fast_window:
+            return self.fast_interval
+        return self.idle_interval
+
+    def wait_for_touch(self, timeout):
+        """Block on the touch line; returns True if a touch edge was seen."""
+        if self.gpio.input(self.touch_pin) == self.gpio.LOW:
+            return True
+        return self.gpio.wait_for_edge(self.touch_pin, self.gpio.FALLING, timeout=int(timeout * 1000)) is not None
+
+    def wait_for_image(self, should_continue=lambda: True):
+        """Wait until get_image() succeeds. Returns the estimated finger-down time, or None if stopped."""
+        wall_start = time.monotonic()
+        cpu_start = time.thread_time()
+        finger_down = None
+        try:
+            while should_continue():
+                if self.touch_pin is not None and self.gpio is not None and finger_down is None:
+                    if not self.wait_for_touch(0.5):
+                        continue
+                    finger_down = time.monotonic()
+
+                interval = self.poll_interval()
+                result = self.finger.get_image()
+                if result == FingerprintStatus.OK:
+                    now = time.monotonic()
+                    if finger_down is None:
+                        # Polling: the finger arrived on average half an interval before we saw it
+                        finger_down = now - interval / 2
+                    self.last_contact = now
+                    self.publish('finger_present', finger_down)
+                    return finger_down
+                if result != FingerprintStatus.NOFINGER:
+                    # Partial contact or a smudged read: a finger is there, so poll fast
+                    self.last_contact = time.monotonic()
+                    continue
+                if finger_down is not None and self.touch_pin is not None:
+                    finger_down = None  # Touch line fired but the finger was lifted again
+                time.sleep(interval)
+            return None
+        finally:
+            with self.lock:
+                self.wait_wall_time += time.monotonic() - wall_start
+                self.wait_cpu_time += time.thread_time() - cpu_start
+
+    def capture_template(self, slot=1, should_continue=lambda: True):
+        """Wait for a finger and convert the image into the given char buffer.
+
+        Returns the image_2_tz status code, or None if should_continue() turned False first.
+        """
+        finger_down = self.wait_for_image(should_continue)
+        if finger_down is None:
+            return None
+        result = self.finger.image_2_tz(slot)
+        if result == FingerprintStatus.OK:
+            ready = time.monotonic()
+            with self.lock:
+                self.captures += 1
+                self.latencies.append(ready - finger_down)
+            self.publish('template_ready', ready)
+        return result
+
+    def stats(self):
+        """Return finger-down-to-template latency and the CPU share used while waiting for a finger."""
+        with self.lock:
+            latencies = sorted(self.latencies)
+            wall = self.wait_wall_time
+            cpu = self.wait_cpu_time
+            captures = self.captures
+        return {
+            'captures': captures,
+            'mode': 'touch' if self.touch_pin is not None and self.gpio is not None else 'adaptive-poll',
+            'latency_avg': sum(latencies) / len(latencies) if latencies else 0.0,
+            'latency_p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0,
+            'wait_cpu_percent': 100.0 * cpu / wall if wall else 0.0,
+        }
@@ -0,0 +1,164 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import requests
+
+# Drift assumed for a Raspberry Pi crystal when no better estimate is available (parts per million)
+DEFAULT_DRIFT_BOUND_PPM = 100
+MAX_DRIFT_PPM = 500
+
+
+class ServerClock:
+    """Local copy of the server's clock, synced periodically from the current-date-time endpoint.
+
+    Between syncs the server time is extrapolated from time.monotonic(), so answering
+    "what day/time is it on the server" never touches the network.
+    """
+
+    def __init__(self, client, url, sync_interval=300, retry_interval=30, stale_after=3600):
+        self.client = client
+        self.url = url
+        self.sync_interval = sync_interval
+        self.retry_interval = retry_interval
+        self.stale_after = stale_after
+        self.lock = threading.Lock()
+        self.base_time = None  # Server datetime at base_mono
+        self.base_mono = None
+        self.base_error = None  # Seconds of uncertainty at base_mono
+        self.drift_ppm = 0.0
+        self.last_sync_mono = None
+        self.last_rtt = None
+        self.sync_count = 0
+        self.failed_syncs = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Sync once in the background and keep re-syncing every sync_interval seconds."""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.sync_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+
+    def sync_loop(self):
+        while not self.stop_event.is_set():
+            interval = self.sync_interval if self.sync() else self.retry_interval
+            self.stop_event.wait(interval)
+
+    def parse_response(self, data):
+        """Return (server datetime, resolution in seconds) from the API payload."""
+        time_text = data.get('current_time')
+        if not time_text:
+            raise ValueError("Missing current_time in the API response.")
+        if time_text.count(':') == 2:
+            parsed_time = datetime.strptime(time_text, "%H:%M:%S").time()
+            resolution = 1.0
+        else:
+            parsed_time = datetime.strptime(time_text, "%H:%M").time()
+            resolution = 60.0
+
+        date_text = data.get('current_date') or data.get('date')
+        parsed_date = datetime.strptime(date_text, "%Y-%m-%d").date() if date_text else datetime.now().date()
+        return datetime.combine(parsed_date, parsed_time), resolution
+
+    def sync(self):
+        """Fetch the server time once and fold it into the local estimate. Returns True on success."""
+        try:
+            sent = time.monotonic()
+            response = self.client.get(self.url)
+            received = time.monotonic()
+            response.raise_for_status()
+            server_time, resolution = self.parse_response(response.json())
+        except (requests.RequestException, ValueError) as e:
+            with self.lock:
+                self.failed_syncs += 1
+            print(f"Error syncing server clock: {e}")
+            return False
+
+        rtt = received - sent
+        midpoint = sent + rtt / 2
+        # The true server time at midpoint lies somewhere in [low, high]
+        low = server_time - timedelta(seconds=rtt / 2)
+        high = server_time + timedelta(seconds=resolution + rtt / 2)
+
+        with self.lock:
+            if self.base_time is None:
+                # No history yet: trust the local wall clock if it agrees with the server
+                predicted = datetime.now() - timedelta(seconds=time.monotonic() - midpoint)
+                predicted_error = None
+            else:
+                predicted = self.extrapolate(midpoint)
+                predicted_error = self.error_at(midpoint)
+
+            if predicted_error is not None:
+                # Narrow the window using what we already knew
+                low = max(low, predicted - timedelta(seconds=predicted_error))
+                high = min(high, predicted + timedelta(seconds=predicted_error))
+                if low > high:
+                    # Estimate and server disagree, start over from the server's answer
+                    low = server_time - timedelta(seconds=rtt / 2)
+                    high = server_time + timedelta(seconds=resolution + rtt / 2)
+
+            if low <= predicted <= high:
+                estimate = predicted
+            else:
+                estimate = low + (high - low) / 2
+            if self.base_mono is not None and midpoint - self.base_mono >= 600:
+                # predicted already includes drift_ppm, so this is the error left in it; correct by a fraction
+                observed_ppm = (estimate - predicted).total_seconds() / (midpoint - self.base_mono) * 1e6
+                self.drift_ppm = max(-MAX_DRIFT_PPM, min(MAX_DRIFT_PPM, self.drift_ppm + 0.2 * observed_ppm))
+
+            self.base_time = estimate
+            self.base_mono = midpoint
+            self.base_error = max((estimate - low).total_seconds(), (high - estimate).total_seconds())
+            self.last_sync_mono = received
+            self.last_rtt = rtt
+            self.sync_count += 1
+        return True
+
+    def extrapolate(self, mono):
+        elapsed = mono - self.base_mono
+        return self.base_time + timedelta(seconds=elapsed * (1 + self.drift_ppm / 1e6))
+
+    def error_at(self, mono):
+        elapsed = abs(mono - self.base_mono)
+        return self.base_error + elapsed * DEFAULT_DRIFT_BOUND_PPM / 1e6
+
+    def now(self):
+        """Return the estimated server datetime, or the local clock if the server was never reached."""
+        with self.lock:
+            if self.base_time is None:
+                return datetime.now()
+            return self.extrapolate(time.monotonic())
+
+    def now_data(self):
+        """Return the current server time in the same shape as the current-date-time API response."""
+        current = self.now()
+        return {
+            'day_of_week': current.strftime("%A"),
+            'current_time': current.strftime("%H:%M"),
+            'current_date': current.strftime("%Y-%m-%d"),
+        }
+
+    def status(self):
+        """Return sync age, estimated error and drift for display or logging."""
+        with self.lock:
+            if self.base_time is None:
+                return {'synced': False, 'source': 'local', 'sync_count': 0, 'failed_syncs': self.failed_syncs}
+            mono = time.monotonic()
+            age = mono - self.last_sync_mono
+            return {
+                'synced': True,
+                'source': 'stale' if age > self.stale_after else 'server',
+                'last_sync_age': age,
+                'estimated_error': self.error_at(mono),
+                'last_rtt': self.last_rtt,
+                'drift_ppm': self.drift_ppm,
+                'sync_count': self.sync_count,
+                'failed_syncs': self.failed_syncs,
+            }
@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+class SessionCloser:
+    """Records time-out for many open sessions at once.
+
+    close_all() first tries one PUT to bulk_url carrying every RFID number. If the server
+    has no bulk endpoint (404/405) it remembers that and sends the individual time-out
+    PUTs in parallel over a small pool instead. Either way it returns a per-UID result so
+    failures can be retried.
+    """
+
+    def __init__(self, client, bulk_url, single_url, workers=4):
+        self.client = client
+        self.bulk_url = bulk_url
+        self.single_url = single_url
+        self.bulk_supported = bulk_url is not None
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prolock-closeout')
+
+    def close_all(self, rfid_numbers, time_out):
+        """Close every session; returns {rfid_number: None on success or an error message}."""
+        rfid_numbers = list(dict.fromkeys(rfid_numbers))  # Drop duplicates, keep order
+        if not rfid_numbers:
+            return {}
+        if self.bulk_supported:
+            results = self.close_bulk(rfid_numbers, time_out)
+            if results is not None:
+                return results
+        return dict(zip(rfid_numbers, self.executor.map(lambda uid: self.close_one(uid, time_out), rfid_numbers)))
+
+    def close_bulk(self, rfid_numbers, time_out):
+        """One batched request; None means the bulk endpoint is unavailable and the caller should fall back."""
+        try:
+            response = self.client.put(self.bulk_url, json={'rfid_numbers': rfid_numbers, 'time_out': time_out})
+        except requests.RequestException as e:
+            return {uid: str(e) for uid in rfid_numbers}
+        if response.status_code in (404, 405):
+            print("Bulk time-out endpoint not available; sending individual time-outs.")
+            self.bulk_supported = False
+            return None
+        if not response.ok:
+            return {uid: f"HTTP {response.status_code}" for uid in rfid_numbers}
+
+        results = {uid: None for uid in rfid_numbers}
+        try:
+            # Optional per-item detail: {"results": [{"rfid_number": ..., "ok": false, "error": ...}]}
+            for item in response.json().get('results', []):
+                if not item.get('ok', True):
+                    results[item.get('rfid_number')] = item.get('error') or 'rejected'
+        except (ValueError, AttributeError):
+            pass  # An empty or non-JSON 2xx body means everything was accepted
+        return results
+
+    def close_one(self, rfid_number, time_out):
+        try:
+            response = self.client.put(self.single_url, params={'rfid_number': rfid_number, 'time_out': time_out})
+            response.raise_for_status()
+            return None
+        except requests.RequestException as e:
+            return str(e)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
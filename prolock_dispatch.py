@@ -0,0 +1,100 @@
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class UiDispatcher:
+    """Runs blocking work on a thread pool and marshals every widget update onto the Tk main loop.
+
+    Tk widgets may only be touched from the thread running mainloop(). Worker threads call
+    call_soon() to queue a function; the queue is drained from root.after() on the main
+    thread. A heartbeat measures how late the main loop services its timers, which is the
+    latency a user sees when the UI is blocked.
+    """
+
+    def __init__(self, root, workers=4, pump_interval=20, heartbeat_interval=100):
+        self.root = root
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prolock-io')
+        self.calls = queue.SimpleQueue()
+        self.pump_interval = pump_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.lock = threading.Lock()
+        self.lateness = deque(maxlen=600)  # Seconds each heartbeat fired after it was due
+        self.slowest_call = (0.0, None)  # (seconds, function name) of the longest main-thread callback
+        self.running = True
+        self.next_heartbeat = time.monotonic() + heartbeat_interval / 1000
+        self.root.after(self.pump_interval, self.pump)
+        self.root.after(self.heartbeat_interval, self.heartbeat)
+
+    def call_soon(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) to run on the Tk main thread. Safe to call from any thread."""
+        self.calls.put((fn, args, kwargs))
+
+    def submit(self, fn, *args, on_done=None, on_error=None):
+        """Run fn(*args) on a worker; on_done(result) or on_error(exception) then run on the main thread."""
+        future = self.executor.submit(fn, *args)
+
+        def finished(done_future):
+            error = done_future.exception()
+            if error is not None:
+                if on_error:
+                    self.call_soon(on_error, error)
+                else:
+                    print(f"Background task {getattr(fn, '__name__', fn)} failed: {error}")
+            elif on_done:
+                self.call_soon(on_done, done_future.result())
+
+        future.add_done_callback(finished)
+        return future
+
+    def pump(self):
+        """Run every queued call on the main thread, then reschedule."""
+        while True:
+            try:
+                fn, args, kwargs = self.calls.get_nowait()
+            except queue.Empty:
+                break
+            start = time.monotonic()
+            try:
+                fn(*args, **kwargs)
+            except Exception as e:
+                print(f"UI callback {getattr(fn, '__name__', fn)} failed: {e}")
+            elapsed = time.monotonic() - start
+            if elapsed > self.slowest_call[0]:
+                self.slowest_call = (elapsed, getattr(fn, '__name__', repr(fn)))
+        if self.running:
+            self.root.after(self.pump_interval, self.pump)
+
+    def heartbeat(self):
+        now = time.monotonic()
+        with self.lock:
+            self.lateness.append(max(now - self.next_heartbeat, 0.0))
+        self.next_heartbeat = now + self.heartbeat_interval / 1000
+        if self.running:
+            self.root.after(self.heartbeat_interval, self.heartbeat)
+
+    def stats(self):
+        """Return main loop lateness percentiles (ms) and the slowest main-thread callback."""
+        with self.lock:
+            lateness = sorted(self.lateness)
+        if not lateness:
+            return {'samples': 0}
+
+        def percentile(fraction):
+            return 1000 * lateness[min(len(lateness) - 1, int(len(lateness) * fraction))]
+
+        return {
+            'samples': len(lateness),
+            'lateness_p50_ms': percentile(0.50),
+            'lateness_p99_ms': percentile(0.99),
+            'lateness_max_ms': 1000 * lateness[-1],
+            'slowest_callback_ms': 1000 * self.slowest_call[0],
+            'slowest_callback': self.slowest_call[1],
+            'queued_calls': self.calls.qsize(),
+        }
+
+    def shutdown(self):
+        self.running = False
+        self.executor.shutdown(wait=False)
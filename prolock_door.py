@@ -0,0 +1,150 @@
+import threading
+import time
+from collections import deque
+
+LOCKED = 'locked'
+UNLOCKED_CREDENTIAL = 'unlocked_credential'  # Momentary unlock by a card or fingerprint; relocks on a timer
+UNLOCKED_REMOTE = 'unlocked_remote'  # Opened from the web dashboard
+HELD_OPEN = 'held_open'  # A faculty session is in progress; remote commands are ignored until release
+ALARM = 'alarm'  # Repeated failed attempts; stays locked until cleared or the alarm times out
+
+# (state, event) -> next state. Pairs that are not listed are ignored and counted.
+TRANSITIONS = {
+    (LOCKED, 'credential_unlock'): UNLOCKED_CREDENTIAL,
+    (LOCKED, 'hold_open'): HELD_OPEN,
+    (LOCKED, 'remote_open'): UNLOCKED_REMOTE,
+    (LOCKED, 'alarm'): ALARM,
+
+    (UNLOCKED_CREDENTIAL, 'credential_unlock'): UNLOCKED_CREDENTIAL,
+    (UNLOCKED_CREDENTIAL, 'hold_open'): HELD_OPEN,
+    (UNLOCKED_CREDENTIAL, 'remote_open'): UNLOCKED_REMOTE,
+    (UNLOCKED_CREDENTIAL, 'remote_close'): LOCKED,
+    (UNLOCKED_CREDENTIAL, 'release'): LOCKED,
+    (UNLOCKED_CREDENTIAL, 'relock'): LOCKED,
+
+    (UNLOCKED_REMOTE, 'hold_open'): HELD_OPEN,
+    (UNLOCKED_REMOTE, 'remote_open'): UNLOCKED_REMOTE,
+    (UNLOCKED_REMOTE, 'remote_close'): LOCKED,
+    (UNLOCKED_REMOTE, 'release'): LOCKED,
+    (UNLOCKED_REMOTE, 'relock'): LOCKED,
+
+    (HELD_OPEN, 'hold_open'): HELD_OPEN,
+    (HELD_OPEN, 'release'): LOCKED,
+    (HELD_OPEN, 'relock'): LOCKED,
+
+    (ALARM, 'alarm'): ALARM,
+    (ALARM, 'credential_unlock'): UNLOCKED_CREDENTIAL,
+    (ALARM, 'hold_open'): HELD_OPEN,
+    (ALARM, 'remote_open'): UNLOCKED_REMOTE,
+    (ALARM, 'clear'): LOCKED,
+    (ALARM, 'relock'): LOCKED,
+}
+
+
+class DoorController:
+    """Owns the solenoid and moves it through an explicit state machine.
+
+    Every thread (fingerprint scan, NFC, remote door channel) calls handle(); transitions
+    are serialized by one lock and drive the pin before handle() returns. States that
+    should not last forever start a relock timer, and every transition is kept in a
+    bounded log with its latency from request to pin change.
+    """
+
+    def __init__(self, gpio, pin, credential_relock=5, remote_relock=None, held_open_limit=None,
+                 alarm_hold=10, locked_level=1, log_size=200):
+        self.gpio = gpio
+        self.pin = pin
+        self.locked_level = locked_level  # The solenoid locks when the pin is driven to this level
+        self.timeouts = {
+            UNLOCKED_CREDENTIAL: credential_relock,
+            UNLOCKED_REMOTE: remote_relock,
+            HELD_OPEN: held_open_limit,
+            ALARM: alarm_hold,
+        }
+        self.lock = threading.RLock()
+        self.state = None
+        self.timer = None
+        self.generation = 0  # Lets a timer that fired after a newer transition recognise itself as stale
+        self.subscribers = []
+        self.log = deque(maxlen=log_size)  # (wall time, from, to, event, source, latency seconds)
+        self.ignored = 0
+        self.set_state(LOCKED, 'start', None, time.monotonic())
+
+    def subscribe(self, callback):
+        """Register callback(old_state, new_state, event, source), called after each transition."""
+        self.subscribers.append(callback)
+
+    def handle(self, event, source=None, requested_at=None):
+        """Apply event; returns the state afterwards. requested_at (monotonic) backdates the latency."""
+        if requested_at is None:
+            requested_at = time.monotonic()
+        with self.lock:
+            next_state = TRANSITIONS.get((self.state, event))
+            if next_state is None:
+                self.ignored += 1
+                print(f"Door: ignoring {event} while {self.state}.")
+                return self.state
+            old_state = self.state
+            self.set_state(next_state, event, source, requested_at)
+        for callback in self.subscribers:
+            try:
+                callback(old_state, next_state, event, source)
+            except Exception as e:
+                print(f"Door transition handler failed: {e}")
+        return next_state
+
+    def set_state(self, state, event, source, requested_at):
+        old_state = self.state
+        self.state = state
+        self.generation += 1
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+
+        locked = state in (LOCKED, ALARM)
+        self.gpio.output(self.pin, self.locked_level if locked else 1 - self.locked_level)
+        latency = time.monotonic() - requested_at
+        self.log.append((time.time(), old_state, state, event, source, latency))
+        if old_state != state:
+            print(f"Door {'locked' if locked else 'unlocked'} ({old_state} -> {state} on {event}).")
+
+        timeout = self.timeouts.get(state)
+        if timeout is not None:
+            self.timer = threading.Timer(timeout, self.expire, args=(self.generation,))
+            self.timer.daemon = True
+            self.timer.start()
+
+    def expire(self, generation):
+        with self.lock:  # Held across handle() so no other transition can slip in after the check
+            if generation != self.generation:
+                return  # Another transition happened after this timer was started
+            self.handle('relock', source='timer')
+
+    def is_locked(self):
+        with self.lock:
+            return self.state in (LOCKED, ALARM)
+
+    def transitions(self, limit=None):
+        """Return the transition log, oldest first."""
+        with self.lock:
+            log = list(self.log)
+        return log[-limit:] if limit else log
+
+    def stats(self):
+        with self.lock:
+            latencies = sorted(entry[5] for entry in self.log)
+            stats = {'state': self.state, 'transitions': len(self.log), 'ignored': self.ignored}
+        if latencies:
+            stats['latency_p50_ms'] = 1000 * latencies[len(latencies) // 2]
+            stats['latency_p99_ms'] = 1000 * latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+            stats['latency_max_ms'] = 1000 * latencies[-1]
+        return stats
+
+    def shutdown(self):
+        """Cancel any pending relock timer and leave the door locked."""
+        with self.lock:
+            if self.state != LOCKED:
+                self.set_state(LOCKED, 'shutdown', None, time.monotonic())
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
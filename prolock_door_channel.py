@@ -0,0 +1,157 @@
+import json
+import threading
+import time
+
+import requests
+
+
+class DoorCommandChannel:
+    """Delivers remote open/close commands to the door as soon as the server issues them.
+
+    The channel subscribes to a Server-Sent Events stream (text/event-stream) whose events
+    carry JSON like {"status": "open"}. If the stream is unavailable it falls back to
+    adaptive polling through poll(): every second right after a change, backing off to
+    max_poll_interval while nothing happens, and tries the stream again every
+    stream_retry_interval seconds. The idle ceiling drops to conditional_poll_interval only
+    while conditional() reports that polls are answered with a 304 when nothing changed;
+    against a server without ETag/Last-Modified every poll is a full download.
+    """
+
+    def __init__(self, client, stream_url, poll, on_command, min_poll_interval=1.0, max_poll_interval=30.0,
+                 conditional=None, conditional_poll_interval=3.0, stream_retry_interval=300, read_timeout=45):
+        self.client = client
+        self.stream_url = stream_url
+        self.poll = poll  # () -> latest status string or None; may raise RequestException
+        self.on_command = on_command  # (status) -> None, called from the channel thread
+        self.min_poll_interval = min_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.conditional = conditional  # () -> True once poll() is known to cost a 304 when unchanged
+        self.conditional_poll_interval = conditional_poll_interval
+        self.stream_retry_interval = stream_retry_interval
+        self.read_timeout = read_timeout  # The server should send a heartbeat comment more often than this
+        self.mode = 'starting'
+        self.last_status = None
+        self.commands = 0
+        self.polls = 0
+        self.stream_failures = 0
+        self.delivery_latencies = []  # Seconds from the server's sent_at to delivery, when provided
+        self.stop_event = threading.Event()
+        self.response = None
+        self.thread = None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        response = self.response
+        if response is not None:
+            response.close()  # Unblocks a stream read in progress
+
+    def run(self):
+        while not self.stop_event.is_set():
+            if self.stream_url and self.listen():
+                # Stream ended cleanly (e.g. server restart); reconnect after a short pause
+                self.stop_event.wait(self.min_poll_interval)
+                continue
+            self.poll_until(time.monotonic() + self.stream_retry_interval if self.stream_url else float('inf'))
+
+    def deliver(self, status, sent_at=None):
+        if sent_at is not None:
+            self.delivery_latencies = (self.delivery_latencies + [max(time.time() - sent_at, 0.0)])[-100:]
+        if status == self.last_status:
+            return False
+        self.last_status = status
+        self.commands += 1
+        try:
+            self.on_command(status)
+        except Exception as e:
+            print(f"Door command handler failed: {e}")
+        return True
+
+    def listen(self):
+        """Follow the event stream until it closes. Returns False if it failed and polling should take over."""
+        try:
+            self.response = self.client.get(self.stream_url, stream=True, headers={'Accept': 'text/event-stream'},
+                                            timeout=(5, self.read_timeout))
+            if self.response.status_code in (404, 405, 501):
+                print(f"Door event stream not available on this server; polling, and trying the stream "
+                      f"again in {self.stream_retry_interval} s.")
+                return False
+            self.response.raise_for_status()
+            self.mode = 'stream'
+            self.poll_once()  # Pick up whatever changed while we were not subscribed
+            data_lines = []
+            # chunk_size=1 so each event is handled as soon as its bytes arrive instead of when a buffer fills
+            for line in self.response.iter_lines(chunk_size=1, decode_unicode=True):
+                if self.stop_event.is_set():
+                    return True
+                if line is None:
+                    continue
+                if line == '':
+                    if data_lines:
+                        self.handle_event('\n'.join(data_lines))
+                        data_lines = []
+                elif line.startswith('data:'):
+                    data_lines.append(line[5:].lstrip())
+                # Lines starting with ':' are heartbeats; 'event:'/'id:' fields are not needed here
+            return True
+        except (requests.RequestException, ValueError) as e:
+            if not self.stop_event.is_set():
+                self.stream_failures += 1
+                print(f"Door event stream failed: {e}")
+            return False
+        finally:
+            if self.response is not None:
+                self.response.close()
+                self.response = None
+
+    def handle_event(self, data):
+        try:
+            event = json.loads(data)
+        except ValueError:
+            return
+        status = event.get('status')
+        if status in ('open', 'close'):
+            self.deliver(status, event.get('sent_at'))
+
+    def poll_once(self):
+        """Poll the current status once and deliver it. Returns True if it changed."""
+        self.polls += 1
+        try:
+            status = self.poll()
+        except requests.RequestException as e:
+            print(f"Error polling door status: {e}")
+            return False
+        return status in ('open', 'close') and self.deliver(status)
+
+    def poll_until(self, deadline):
+        self.mode = 'poll'
+        interval = self.min_poll_interval
+        while not self.stop_event.is_set() and time.monotonic() < deadline:
+            if self.poll_once():
+                interval = self.min_poll_interval  # Something is happening; stay responsive
+            else:
+                interval = min(interval * 2, self.idle_poll_interval())
+            self.stop_event.wait(interval)
+
+    def idle_poll_interval(self):
+        if self.conditional and self.conditional():
+            return min(self.conditional_poll_interval, self.max_poll_interval)
+        return self.max_poll_interval
+
+    def stats(self):
+        latencies = sorted(self.delivery_latencies)
+        return {
+            'mode': self.mode,
+            'last_status': self.last_status,
+            'commands': self.commands,
+            'polls': self.polls,
+            'idle_poll_interval': self.idle_poll_interval(),
+            'stream_failures': self.stream_failures,
+            'delivery_p50': latencies[len(latencies) // 2] if latencies else None,
+        }
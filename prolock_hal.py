@@ -0,0 +1,487 @@
+import os
+import random
+import struct
+import threading
+import time
+from collections import deque
+
+
+DEFAULT_BAUDRATE = 57600  # The R30x factory setting
+
+
+class FingerprintStatus:
+    """Status codes returned by the R30x/AS608 sensor (the values adafruit_fingerprint uses)."""
+    OK = 0x00
+    PACKETRECIEVEERR = 0x01
+    NOFINGER = 0x02
+    IMAGEFAIL = 0x03
+    IMAGEMESS = 0x06
+    FEATUREFAIL = 0x07
+    NOMATCH = 0x08
+    NOTFOUND = 0x09
+    ENROLLMISMATCH = 0x0A
+    BADLOCATION = 0x0B
+    DBREADFAIL = 0x0C
+    UPLOADFEATUREFAIL = 0x0D
+    PACKETRESPONSEFAIL = 0x0E
+    UPLOADFAIL = 0x0F
+    DELETEFAIL = 0x10
+    DBCLEARFAIL = 0x11
+    PASSFAIL = 0x13
+    INVALIDIMAGE = 0x15
+    FLASHERR = 0x18
+    INVALIDREG = 0x1A
+    ADDRCODE = 0x20
+    PASSVERIFY = 0x21
+
+
+class RealBackend:
+    """The kiosk's hardware: RPi.GPIO, an R30x sensor on a USB serial adapter and a USB NFC reader.
+
+    Hardware libraries are imported only when this backend is created, so the rest of the
+    application can be imported and run on machines without them.
+    """
+
+    name = 'real'
+
+    def __init__(self, serial_port='/dev/ttyUSB0', baudrate=DEFAULT_BAUDRATE, nfc_path='usb'):
+        import RPi.GPIO
+        self.gpio = RPi.GPIO
+        self.serial_port = serial_port
+        self.baudrate = baudrate
+        self.nfc_path = nfc_path
+
+    def setup_outputs(self, pins):
+        self.gpio.setmode(self.gpio.BCM)
+        for pin in pins:
+            self.gpio.setup(pin, self.gpio.OUT)
+
+    def open_fingerprint(self, baudrate=None):
+        """Return an Adafruit_Fingerprint on the serial port, or None if the port can't be opened
+        or the sensor doesn't answer at baudrate (default: the backend's baudrate)."""
+        import serial
+        import adafruit_fingerprint
+        try:
+            uart = serial.Serial(self.serial_port, baudrate=baudrate or self.baudrate, timeout=1)
+        except serial.SerialException as e:
+            print("Serial Error", f"Failed to connect to serial port: {e}")
+            return None
+        try:
+            return adafruit_fingerprint.Adafruit_Fingerprint(uart)  # Handshakes with the sensor
+        except RuntimeError as e:
+            print(f"No fingerprint sensor answered at {uart.baudrate} baud: {e}")
+            uart.close()
+            return None
+
+    def set_link_baudrate(self, finger, baudrate):
+        """Switch the host side of the UART after the sensor was told to change its baud rate."""
+        finger._uart.baudrate = baudrate  # adafruit_fingerprint has no public accessor for its port
+
+    def search_range(self, finger, start, count):
+        """Search char buffer 1 against library slots start..start+count-1; sets finger_id and confidence.
+
+        adafruit_fingerprint's finger_search() always covers the whole library, so this sends
+        the same Search command (0x04) with a narrower page range.
+        """
+        finger._send_packet([0x04, 0x01, start >> 8, start & 0xFF, count >> 8, count & 0xFF])
+        reply = finger._get_packet(16)
+        finger.finger_id, finger.confidence = struct.unpack('>HH', bytes(reply[1:5]))
+        return reply[0]
+
+    def open_nfc(self):
+        """Return an nfc.ContactlessFrontend, or None if no reader is connected."""
+        import nfc
+        try:
+            return nfc.ContactlessFrontend(self.nfc_path)
+        except Exception as e:
+            print("NFC Error", f"Failed to initialize NFC reader: {e}")
+            return None
+
+
+class SimGPIO:
+    """Stand-in for RPi.GPIO that records every output with a timestamp."""
+    BCM = 11
+    BOARD = 10
+    OUT = 0
+    IN = 1
+    LOW = 0
+    HIGH = 1
+    PUD_UP = 22
+    PUD_DOWN = 21
+    FALLING = 32
+    RISING = 31
+
+    def __init__(self, max_records=10000):
+        self.lock = threading.Lock()
+        self.mode = None
+        self.directions = {}
+        self.levels = {}
+        self.outputs = deque(maxlen=max_records)  # (monotonic time, pin, level)
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setup(self, pin, direction, pull_up_down=None, initial=None):
+        with self.lock:
+            self.directions[pin] = direction
+            if direction == self.IN:
+                self.levels[pin] = self.HIGH if pull_up_down == self.PUD_UP else self.LOW
+            else:
+                self.levels[pin] = self.LOW if initial is None else initial
+
+    def output(self, pin, level):
+        with self.lock:
+            self.levels[pin] = level
+            self.outputs.append((time.monotonic(), pin, level))
+
+    def input(self, pin):
+        with self.lock:
+            return self.levels.get(pin, self.LOW)
+
+    def wait_for_edge(self, pin, edge, timeout=None):
+        # No simulated input ever changes; behave like a wait that timed out
+        time.sleep((timeout or 1000) / 1000)
+        return None
+
+    def cleanup(self):
+        with self.lock:
+            self.directions.clear()
+
+
+class SimFingerprintSensor:
+    """Deterministic model of an R30x sensor driven by a seeded random generator.
+
+    A finger arrives on average every finger_interval seconds. Each touch can be templated
+    unless it falls in image_fail_rate, and a usable print matches one of the enrolled
+    slots with probability match_rate; a search finds it only if its range covers that
+    slot, and takes longer the more slots it covers. Every command sleeps for its
+    configured latency, so timing-sensitive code sees realistic delays. outcomes, when
+    given, replaces the random draw with a fixed sequence of 'match', 'nomatch' or
+    'imagefail'. Template uploads and downloads take as long as their packets would on a
+    UART at baudrate.
+
+    The link is modelled too: commands time out while host_baudrate differs from the
+    sensor's baudrate, and above max_stable_baudrate (or with data packets larger than
+    max_stable_packet_size) a share of commands fail with garbled packets.
+    """
+
+    def __init__(self, seed=0, enrolled=range(1, 21), capacity=1000, finger_interval=2.0, match_rate=0.9,
+                 image_fail_rate=0.05, outcomes=None, get_image_latency=0.05, image_2_tz_latency=0.25,
+                 search_latency=0.35, store_latency=0.1, baudrate=DEFAULT_BAUDRATE, data_packet_size=128,
+                 template_size=512, max_stable_baudrate=None, max_stable_packet_size=None, link_error_rate=0.2,
+                 timeout=1.0):
+        self.rng = random.Random(seed)
+        self.template_size = template_size
+        self.library = {slot: self.make_template(slot) for slot in enrolled}
+        self.library_size = capacity
+        self.baudrate = baudrate  # Sensor side, kept in its flash
+        self.host_baudrate = baudrate  # What the host's serial port is set to
+        self.data_packet_size = data_packet_size  # Bytes
+        self.max_stable_baudrate = max_stable_baudrate
+        self.max_stable_packet_size = max_stable_packet_size
+        self.link_error_rate = link_error_rate
+        self.timeout = timeout
+        self.finger_interval = finger_interval
+        self.match_rate = match_rate
+        self.image_fail_rate = image_fail_rate
+        self.outcomes = iter(outcomes) if outcomes is not None else None
+        self.latency = {
+            'get_image': get_image_latency,
+            'image_2_tz': image_2_tz_latency,
+            'finger_search': search_latency,
+            'store_model': store_latency,
+        }
+        self.lock = threading.Lock()  # A real sensor answers one command at a time
+        self.next_touch = time.monotonic() + self.rng.expovariate(1 / finger_interval)
+        self.current = None  # Outcome of the finger on the sensor
+        self.touch_slot = None  # Enrolled slot the finger on the sensor belongs to, drawn at its first search
+        self.next_slot = None  # Slot for the next touch, from present_finger()
+        self.buffers = {}
+        self.finger_id = None
+        self.confidence = None
+        self.templates = []
+        self.template_count = None
+        self.commands = {}
+
+    def command(self, name, latency=None):
+        self.commands[name] = self.commands.get(name, 0) + 1
+        if self.host_baudrate != self.baudrate:
+            time.sleep(self.timeout)
+            raise RuntimeError("Failed to read data from sensor")
+        if self.max_stable_baudrate and self.baudrate > self.max_stable_baudrate and \
+                self.rng.random() < self.link_error_rate:
+            raise RuntimeError("Incorrect packet data")
+        # Processing time, plus a 12 byte command and a 12 byte acknowledgement on the wire
+        time.sleep((self.latency.get(name, 0.02) if latency is None else latency) + 24 * 10 / self.baudrate)
+
+    def make_template(self, slot):
+        return random.Random(slot).randbytes(self.template_size)
+
+    def transfer(self, size):
+        """Sleep for the time size bytes of data packets take on the wire (11 bytes framing each, 8N1)."""
+        packets = -(-size // self.data_packet_size)
+        time.sleep((size + 11 * packets) * 10 / self.baudrate)
+        if self.max_stable_packet_size and self.data_packet_size > self.max_stable_packet_size and \
+                self.rng.random() < self.link_error_rate:
+            raise RuntimeError("Incorrect packet data")
+
+    def draw_outcome(self):
+        if self.outcomes is not None:
+            return next(self.outcomes, None)
+        if self.rng.random() < self.image_fail_rate:
+            return 'imagefail'
+        return 'match' if self.rng.random() < self.match_rate else 'nomatch'
+
+    def present_finger(self, outcome='match', slot=None):
+        """Put a finger on the sensor now, with the given outcome; slot picks whose finger it is."""
+        with self.lock:
+            self.next_touch = time.monotonic()
+            self.outcomes = iter([outcome])
+            self.next_slot = slot
+
+    def get_image(self):
+        with self.lock:
+            self.command('get_image')
+            if time.monotonic() < self.next_touch:
+                return FingerprintStatus.NOFINGER
+            outcome = self.draw_outcome()
+            if outcome is None:
+                self.next_touch = float('inf')  # Scripted run is over
+                return FingerprintStatus.NOFINGER
+            self.next_touch = time.monotonic() + self.rng.expovariate(1 / self.finger_interval)
+            self.current = outcome  # An 'imagefail' touch reads, but image_2_tz can't extract features
+            self.touch_slot, self.next_slot = self.next_slot, None
+            return FingerprintStatus.OK
+
+    def image_2_tz(self, slot=1):
+        with self.lock:
+            self.command('image_2_tz')
+            if self.current not in ('match', 'nomatch'):
+                return FingerprintStatus.IMAGEMESS
+            self.buffers[slot] = self.current
+            return FingerprintStatus.OK
+
+    def finger_search(self):
+        return self.search_range(0, self.library_size, name='finger_search')
+
+    def search_range(self, start, count, name='search_range'):
+        """Search char buffer 1 against slots start..start+count-1, in time proportional to count."""
+        with self.lock:
+            full = self.latency['finger_search']
+            self.command(name, latency=min(full, 0.02) + max(0.0, full - 0.02) * min(count, self.library_size)
+                         / self.library_size)
+            if self.buffers.get(1) == 'match' and self.library:
+                if self.touch_slot is None:
+                    self.touch_slot = self.rng.choice(sorted(self.library))
+                if start <= self.touch_slot < start + count and self.touch_slot in self.library:
+                    self.finger_id = self.touch_slot
+                    self.confidence = self.rng.randint(50, 250)
+                    return FingerprintStatus.OK
+            self.finger_id = None
+            self.confidence = 0
+            return FingerprintStatus.NOTFOUND
+
+    def create_model(self):
+        with self.lock:
+            self.command('create_model')
+            if 1 not in self.buffers or 2 not in self.buffers:
+                return FingerprintStatus.ENROLLMISMATCH
+            return FingerprintStatus.OK
+
+    def store_model(self, location, slot=1):
+        with self.lock:
+            self.command('store_model')
+            if not 0 <= location < self.library_size:
+                return FingerprintStatus.BADLOCATION
+            template = self.buffers.get(slot)
+            self.library[location] = template if isinstance(template, bytes) else self.make_template(location)
+            return FingerprintStatus.OK
+
+    def load_model(self, location, slot=1):
+        with self.lock:
+            self.command('load_model')
+            if location not in self.library:
+                return FingerprintStatus.DBREADFAIL
+            self.buffers[slot] = self.library[location]
+            return FingerprintStatus.OK
+
+    def get_fpdata(self, sensorbuffer="char", slotid=1):
+        with self.lock:
+            self.command('get_fpdata')
+            template = self.buffers.get(slotid)
+            if not isinstance(template, bytes):
+                template = self.make_template(0)  # A live capture; its features aren't modelled
+            self.transfer(len(template))
+            return list(template)
+
+    def send_fpdata(self, data, sensorbuffer="char", slotid=1):
+        with self.lock:
+            self.command('send_fpdata')
+            self.transfer(len(data))
+            self.buffers[slotid] = bytes(data)
+            return True
+
+    def delete_model(self, location):
+        with self.lock:
+            self.command('delete_model')
+            self.library.pop(location, None)
+            return FingerprintStatus.OK
+
+    def read_sysparam(self):
+        with self.lock:
+            self.command('read_sysparam')
+            return FingerprintStatus.OK
+
+    def set_sysparam(self, param_num, param_val):
+        """Parameter 4 is the baud rate as a multiple of 9600 (1-12), 6 the packet size code (0-3 for 32-256 bytes)."""
+        with self.lock:
+            self.command('set_sysparam')
+            if param_num == 4 and 1 <= param_val <= 12:
+                self.baudrate = 9600 * param_val  # Takes effect after the acknowledgement
+            elif param_num == 6 and 0 <= param_val <= 3:
+                self.data_packet_size = 32 << param_val
+            elif param_num != 5:
+                raise RuntimeError("Command failed.")
+            return FingerprintStatus.OK
+
+    def read_templates(self):
+        with self.lock:
+            self.command('read_templates')
+            self.templates = sorted(self.library)
+            return FingerprintStatus.OK
+
+    def count_templates(self):
+        with self.lock:
+            self.command('count_templates')
+            self.template_count = len(self.library)
+            return FingerprintStatus.OK
+
+
+class SimTag:
+    def __init__(self, uid_hex):
+        self.identifier = bytes.fromhex(uid_hex)
+
+
+class SimNfcReader:
+    """Replays taps like nfc.ContactlessFrontend.connect().
+
+    taps is a sequence of (delay seconds, uid hex) played in order, and tap() adds more
+    while running. Without a script, a card from cards is tapped on average every
+    tap_interval seconds. connect() returns None after idle_timeout seconds with no tap
+    so the reading loop can check for shutdown.
+    """
+
+    def __init__(self, seed=0, taps=None, cards=('04a1b2c3d4', '04e5f60718', '0429384756'), tap_interval=3.0,
+                 idle_timeout=1.0):
+        self.rng = random.Random(seed)
+        self.script = deque(taps or [])
+        self.random_taps = taps is None
+        self.cards = list(cards)
+        self.tap_interval = tap_interval
+        self.idle_timeout = idle_timeout
+        self.condition = threading.Condition()
+        self.pending = None  # (due monotonic time, uid)
+        self.closed = False
+        self.delivered = deque(maxlen=10000)  # (monotonic time, uid) of every tap handed out
+
+    def tap(self, uid, delay=0.0):
+        """Queue a tap of card uid, delay seconds after the previous one is read."""
+        with self.condition:
+            self.random_taps = False
+            self.script.append((delay, uid))
+            self.condition.notify_all()
+
+    def schedule_next(self):
+        if self.script:
+            delay, uid = self.script.popleft()
+        elif self.random_taps:
+            delay, uid = self.rng.expovariate(1 / self.tap_interval), self.rng.choice(self.cards)
+        else:
+            return None
+        return time.monotonic() + delay, uid
+
+    def connect(self, rdwr=None, **options):
+        deadline = time.monotonic() + self.idle_timeout
+        with self.condition:
+            while not self.closed:
+                if self.pending is None:
+                    self.pending = self.schedule_next()
+                now = time.monotonic()
+                if self.pending is not None and self.pending[0] <= now:
+                    break
+                if now >= deadline:
+                    return None
+                wake = deadline if self.pending is None else min(deadline, self.pending[0])
+                self.condition.wait(wake - now)
+            if self.closed:
+                return None
+            uid = self.pending[1]
+            self.pending = None
+            self.delivered.append((time.monotonic(), uid))
+        tag = SimTag(uid)
+        on_connect = (rdwr or {}).get('on-connect')
+        if on_connect:
+            on_connect(tag)
+        return tag
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class SimBackend:
+    """Simulated GPIO, fingerprint sensor and NFC reader for running the kiosk off the Pi."""
+
+    name = 'sim'
+
+    def __init__(self, seed=0, fingerprint_options=None, nfc_options=None):
+        self.gpio = SimGPIO()
+        self.seed = seed
+        self.fingerprint_options = fingerprint_options or {}
+        self.nfc_options = nfc_options or {}
+        self.finger = None
+        self.nfc = None
+
+    def setup_outputs(self, pins):
+        self.gpio.setmode(self.gpio.BCM)
+        for pin in pins:
+            self.gpio.setup(pin, self.gpio.OUT)
+
+    def open_fingerprint(self, baudrate=None):
+        """Connect to the simulated sensor (created once, so its settings survive a reopen)."""
+        if self.finger is None:
+            self.finger = SimFingerprintSensor(seed=self.seed, **self.fingerprint_options)
+        self.finger.host_baudrate = baudrate or DEFAULT_BAUDRATE
+        try:
+            self.finger.read_sysparam()
+        except RuntimeError as e:
+            print(f"No fingerprint sensor answered at {self.finger.host_baudrate} baud: {e}")
+            return None
+        return self.finger
+
+    def set_link_baudrate(self, finger, baudrate):
+        finger.host_baudrate = baudrate
+
+    def search_range(self, finger, start, count):
+        return finger.search_range(start, count)
+
+    def open_nfc(self):
+        self.nfc = SimNfcReader(seed=self.seed + 1, **self.nfc_options)
+        return self.nfc
+
+
+BACKENDS = {
+    'real': RealBackend,
+    'sim': SimBackend,
+}
+
+
+def create_backend(name=None, **options):
+    """Create the backend named by name or the PROLOCK_HAL environment variable (default 'real')."""
+    name = name or os.environ.get('PROLOCK_HAL', 'real')
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown hardware backend {name!r}; expected one of {', '.join(BACKENDS)}")
+    if name == 'sim' and 'seed' not in options:
+        options['seed'] = int(os.environ.get('PROLOCK_SIM_SEED', '0'))
+    return BACKENDS[name](**options)
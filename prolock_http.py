@@ -0,0 +1,202 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+# Responses that are worth retrying because the server (or a proxy in front of it) was only briefly unavailable
+RETRY_STATUS_CODES = (502, 503, 504)
+
+
+class EndpointPolicy:
+    """Timeout and retry settings for one API endpoint."""
+
+    def __init__(self, timeout=5.0, retries=1, backoff=0.2, retry_budget=10, retry_writes=False):
+        self.timeout = timeout  # Seconds, or a (connect, read) tuple as accepted by requests
+        self.retries = retries  # Extra attempts allowed for a single call
+        self.backoff = backoff  # Base delay between attempts, doubled each time
+        self.retry_budget = retry_budget  # Retries allowed per endpoint per minute across all calls
+        self.retry_writes = retry_writes  # PUT/POST are only retried when the endpoint is safe to repeat
+
+
+class PoolStats:
+    """Thread-safe counters showing how well connections are being reused."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.responses = 0
+        self.new_connections = 0
+        self.handshake_time = 0.0
+        self.retries = 0
+        self.failures = 0
+        self.endpoints = {}
+
+    def record_connect(self, seconds):
+        with self.lock:
+            self.new_connections += 1
+            self.handshake_time += seconds
+
+    def record_request(self, endpoint, seconds, ok, answered=True):
+        with self.lock:
+            self.requests += 1
+            if answered:
+                self.responses += 1
+            if not ok:
+                self.failures += 1
+            entry = self.endpoints.setdefault(endpoint, {"requests": 0, "failures": 0, "total_time": 0.0})
+            entry["requests"] += 1
+            entry["total_time"] += seconds
+            if not ok:
+                entry["failures"] += 1
+
+    def record_retry(self):
+        with self.lock:
+            self.retries += 1
+
+    def snapshot(self):
+        """Return a plain dict copy of the counters."""
+        with self.lock:
+            new_connections = self.new_connections
+            return {
+                "requests": self.requests,
+                "new_connections": new_connections,
+                "reused_connections": max(self.responses - new_connections, 0),
+                "handshake_time_total": self.handshake_time,
+                "handshake_time_avg": self.handshake_time / new_connections if new_connections else 0.0,
+                "retries": self.retries,
+                "failures": self.failures,
+                "endpoints": {name: dict(entry) for name, entry in self.endpoints.items()},
+            }
+
+
+def _timed_connection(connection_cls, stats):
+    """Subclass a urllib3 connection so the TCP + TLS setup time is recorded."""
+
+    class TimedConnection(connection_cls):
+        def connect(self):
+            start = time.monotonic()
+            super().connect()
+            stats.record_connect(time.monotonic() - start)
+
+    return TimedConnection
+
+
+class PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose pools report every new connection to a PoolStats object."""
+
+    def __init__(self, stats, **kwargs):
+        self.stats = stats  # Must be set before HTTPAdapter.__init__ builds the pool manager
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+
+        class TimedHTTPConnectionPool(HTTPConnectionPool):
+            ConnectionCls = _timed_connection(HTTPConnection, self.stats)
+
+        class TimedHTTPSConnectionPool(HTTPSConnectionPool):
+            ConnectionCls = _timed_connection(HTTPSConnection, self.stats)
+
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": TimedHTTPConnectionPool,
+            "https": TimedHTTPSConnectionPool,
+        }
+
+
+class ProLockClient:
+    """Shared keep-alive HTTP client used for every ProLock API call.
+
+    Calls behave like requests.get/requests.put: they return the Response and raise
+    requests.RequestException subclasses, so existing error handling keeps working.
+    """
+
+    def __init__(self, policies=None, default_policy=None, pool_maxsize=8):
+        self.policies = dict(policies or {})
+        self.default_policy = default_policy or EndpointPolicy()
+        self.stats = PoolStats()
+        self.session = requests.Session()
+        adapter = PooledAdapter(self.stats, pool_connections=2, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.budget_lock = threading.Lock()
+        self.retry_log = {}  # endpoint -> monotonic timestamps of recent retries
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        """Register callback(endpoint, seconds, ok), called on the calling thread after every attempt."""
+        self.subscribers.append(callback)
+
+    def record(self, endpoint, seconds, ok, answered=True):
+        self.stats.record_request(endpoint, seconds, ok, answered=answered)
+        for callback in self.subscribers:
+            callback(endpoint, seconds, ok)
+
+    def set_policy(self, url_prefix, policy):
+        self.policies[url_prefix] = policy
+
+    def policy_for(self, url):
+        """Return (endpoint, policy) for the longest registered prefix of url."""
+        best = None
+        for prefix in self.policies:
+            if url.startswith(prefix) and (best is None or len(prefix) > len(best)):
+                best = prefix
+        if best is None:
+            return url.split("?", 1)[0], self.default_policy
+        return best, self.policies[best]
+
+    def take_retry(self, endpoint, policy):
+        """Consume one retry from the endpoint's per-minute budget; False when it is used up."""
+        now = time.monotonic()
+        with self.budget_lock:
+            recent = [stamp for stamp in self.retry_log.get(endpoint, []) if now - stamp < 60]
+            if len(recent) >= policy.retry_budget:
+                self.retry_log[endpoint] = recent
+                return False
+            recent.append(now)
+            self.retry_log[endpoint] = recent
+            return True
+
+    def request(self, method, url, **kwargs):
+        endpoint, policy = self.policy_for(url)
+        kwargs.setdefault("timeout", policy.timeout)
+        may_retry = method == "GET" or policy.retry_writes
+        attempt = 0
+
+        while True:
+            start = time.monotonic()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self.record(endpoint, time.monotonic() - start, False, answered=False)
+                if not (may_retry and attempt < policy.retries and self.take_retry(endpoint, policy)):
+                    raise
+            else:
+                ok = response.status_code < 500
+                self.record(endpoint, time.monotonic() - start, ok)
+                if response.status_code not in RETRY_STATUS_CODES or not (
+                        may_retry and attempt < policy.retries and self.take_retry(endpoint, policy)):
+                    return response
+                response.close()
+
+            self.stats.record_retry()
+            time.sleep(policy.backoff * (2 ** attempt))
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request("PUT", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def pool_stats(self):
+        """Return connection reuse, new connection and handshake time statistics."""
+        return self.stats.snapshot()
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,253 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+
+import requests
+
+# Client errors that will never succeed on retry; the event is dropped from the queue and logged
+PERMANENT_STATUS_CODES = (400, 404, 409, 422)
+
+
+class JournalClosed(RuntimeError):
+    """record() was called after close()."""
+
+
+class AttendanceJournal:
+    """Append-only, fsync'd queue of time-in/time-out writes with a background sender.
+
+    record() returns as soon as the event is on disk, so the door decision never waits on
+    the network. The sender drains events in order to the API, tagging each request with
+    an Idempotency-Key so a retry after a lost response cannot create a duplicate log.
+    An event that fails max_attempts times (5xx, read timeout) is parked so the events
+    behind it can drain; parked events stay in the journal and are retried while the queue
+    is idle. Connection failures are the link's fault, not the event's, and are not counted.
+    """
+
+    def __init__(self, client, path='prolock_journal.log', batch_size=20, min_backoff=1.0, max_backoff=60.0,
+                 max_attempts=5):
+        self.client = client
+        self.path = path
+        self.batch_size = batch_size
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self.lock = threading.Lock()
+        self.pending = OrderedDict()  # event id -> event, oldest first
+        self.parked = OrderedDict()  # event id -> event that failed max_attempts times
+        self.attempts = {}  # event id -> failed deliveries so far
+        self.parked_count = 0
+        self.sent_count = 0
+        self.dropped_count = 0
+        self.failed_attempts = 0
+        self.last_error = None
+        self.sent_times = deque(maxlen=500)  # Monotonic timestamps of recent deliveries, for the drain rate
+        self.on_sent = None  # Optional callback(event) after an event reaches the server
+        self.wake_event = threading.Event()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.load()
+        self.file = open(self.path, 'a', encoding='utf-8')
+
+    def load(self):
+        """Rebuild the pending queue from the journal file after a restart."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, encoding='utf-8') as journal:
+            for line in journal:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Torn last line from a power cut
+                if entry.get('op') == 'event':
+                    self.pending[entry['id']] = entry
+                elif entry.get('op') in ('ack', 'drop'):
+                    self.pending.pop(entry.get('id'), None)
+                    self.parked.pop(entry.get('id'), None)
+                elif entry.get('op') == 'park' and entry.get('id') in self.pending:
+                    self.parked[entry['id']] = self.pending.pop(entry['id'])
+        self.compact()
+
+    def append(self, entries):
+        """Write journal lines and fsync them before returning."""
+        for entry in entries:
+            self.file.write(json.dumps(entry) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def compact(self):
+        """Rewrite the journal with only the pending and parked events."""
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as journal:
+            for entry in self.pending.values():
+                journal.write(json.dumps(entry) + '\n')
+            for entry in self.parked.values():
+                journal.write(json.dumps(entry) + '\n')
+                journal.write(json.dumps({'op': 'park', 'id': entry['id']}) + '\n')
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(temp_path, self.path)
+
+    def record(self, kind, credential, url, params):
+        """Durably queue one API write and wake the sender. Returns the event id."""
+        event = {
+            'op': 'event',
+            'id': uuid.uuid4().hex,
+            'kind': kind,
+            'credential': str(credential),
+            'url': url,
+            'params': params,
+            'created': time.time(),
+        }
+        with self.lock:
+            if self.file.closed:
+                raise JournalClosed(f"Attendance journal is closed; {kind} for {credential} was not recorded")
+            self.append([event])
+            self.pending[event['id']] = event
+        self.wake_event.set()
+        return event['id']
+
+    def pending_kind(self, credential):
+        """Return the kind of the newest undelivered event for a credential, or None."""
+        credential = str(credential)
+        with self.lock:
+            events = [event for event in list(self.pending.values()) + list(self.parked.values())
+                      if event['credential'] == credential]
+        return max(events, key=lambda event: event['created'])['kind'] if events else None
+
+    def start(self):
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.drain_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+
+    def drain_loop(self):
+        backoff = self.min_backoff
+        while not self.stop_event.is_set():
+            if self.drain_batch():
+                backoff = self.min_backoff
+                with self.lock:
+                    has_more = bool(self.pending)
+                if has_more:
+                    continue
+                # Idle: give parked events another try every max_backoff seconds
+                if not self.wake_event.wait(self.max_backoff if self.parked else None):
+                    self.requeue_parked()
+            else:
+                # Network or server trouble: wait longer each time, but wake early for shutdown
+                self.stop_event.wait(backoff)
+                backoff = min(backoff * 2, self.max_backoff)
+            self.wake_event.clear()
+
+    def drain_batch(self):
+        """Send up to batch_size events in order. Returns False if delivery has to back off."""
+        with self.lock:
+            batch = list(self.pending.values())[:self.batch_size]
+        if not batch:
+            return True
+
+        done = []
+        healthy = True
+        for event in batch:
+            try:
+                response = self.client.put(event['url'], params=event['params'],
+                                           headers={'Idempotency-Key': event['id']})
+            except requests.ConnectionError as e:
+                self.last_error = str(e)  # Link down: every event would fail the same way
+                healthy = False
+                break
+            except requests.RequestException as e:
+                error = str(e)
+            else:
+                if response.ok:
+                    done.append({'op': 'ack', 'id': event['id']})
+                    continue
+                if response.status_code in PERMANENT_STATUS_CODES:
+                    print(f"Dropping {event['kind']} for {event['credential']}: HTTP {response.status_code}")
+                    done.append({'op': 'drop', 'id': event['id'], 'status': response.status_code})
+                    continue
+                error = f"HTTP {response.status_code}"
+
+            self.last_error = error
+            attempts = self.attempts.get(event['id'], 0) + 1
+            self.attempts[event['id']] = attempts
+            if attempts < self.max_attempts:
+                healthy = False
+                break
+            print(f"Parking {event['kind']} for {event['credential']} after {attempts} failed attempts: {error}")
+            done.append({'op': 'park', 'id': event['id']})
+
+        if not healthy:
+            self.failed_attempts += 1
+
+        delivered = []
+        if done:
+            with self.lock:
+                if self.file.closed:
+                    return healthy  # Shutting down; the events are re-sent after restart
+                self.append(done)
+                now = time.monotonic()
+                for entry in done:
+                    event = self.pending.pop(entry['id'], None)
+                    if entry['op'] == 'park':
+                        if event:
+                            self.parked[entry['id']] = event
+                            self.parked_count += 1
+                        continue
+                    self.attempts.pop(entry['id'], None)
+                    if entry['op'] == 'ack':
+                        self.sent_count += 1
+                        self.sent_times.append(now)
+                        if event:
+                            delivered.append(event)
+                    else:
+                        self.dropped_count += 1
+                if not self.pending:
+                    self.file.close()
+                    self.compact()
+                    self.file = open(self.path, 'a', encoding='utf-8')
+
+        if delivered and self.on_sent:
+            for event in delivered:
+                self.on_sent(event)
+        return healthy
+
+    def requeue_parked(self):
+        """Move parked events to the back of the queue; one more failure parks them again."""
+        with self.lock:
+            for event_id, event in self.parked.items():
+                self.pending[event_id] = event
+                self.attempts[event_id] = self.max_attempts - 1
+            self.parked.clear()
+
+    def stats(self):
+        """Return queue depth, oldest pending age, recent drain rate and the parked events."""
+        with self.lock:
+            oldest = next(iter(self.pending.values()), None)
+            parked = [f"{event['kind']} {event['credential']}" for event in self.parked.values()]
+            now = time.monotonic()
+            recent = [stamp for stamp in self.sent_times if now - stamp <= 60]
+            return {
+                'depth': len(self.pending),
+                'oldest_pending_age': time.time() - oldest['created'] if oldest else 0.0,
+                'drain_rate_per_min': len(recent),
+                'sent': self.sent_count,
+                'dropped': self.dropped_count,
+                'failed_attempts': self.failed_attempts,
+                'parked': len(parked),
+                'parked_events': parked,
+                'parked_total': self.parked_count,
+                'last_error': self.last_error,
+            }
+
+    def close(self):
+        self.stop()
+        with self.lock:
+            self.file.close()
@@ -0,0 +1,216 @@
+import threading
+import time
+from collections import deque
+
+
+class LogsTableModel:
+    """Keeps a ttk.Treeview in step with a list of log records by applying only the differences.
+
+    Rows are keyed by the log's id, so a refresh inserts new logs, updates logs whose values
+    changed (e.g. a time-out was filled in) and removes logs that dropped off the list,
+    instead of deleting and re-inserting every row. With max_rows set only the first
+    max_rows logs are kept in the widget.
+    """
+
+    def __init__(self, tree, row_values, max_rows=None):
+        self.tree = tree
+        self.row_values = row_values  # log dict -> tuple of column values
+        self.max_rows = max_rows
+        self.rows = {}  # iid -> values currently shown
+        self.order = []  # iids in display order
+        self.samples = deque(maxlen=100)  # (rows, inserted, updated, removed, seconds) per apply()
+
+    def key_for(self, log):
+        if log.get('id') is not None:
+            return str(log['id'])
+        # Older API responses have no id; fall back to the fields that identify a session
+        return '|'.join(str(log.get(field, '')) for field in ('date', 'UID', 'user_number', 'time_in'))
+
+    def apply(self, logs):
+        """Update the tree to show logs. Returns (inserted, updated, removed) counts."""
+        start = time.perf_counter()
+        if self.max_rows is not None:
+            logs = logs[:self.max_rows]
+
+        desired = []
+        values = {}
+        for log in logs:
+            iid = self.key_for(log)
+            while iid in values:
+                iid += '+'  # Duplicate key in one payload: keep both rows
+            desired.append(iid)
+            values[iid] = tuple(self.row_values(log))
+
+        removed = [iid for iid in self.order if iid not in values]
+        if removed:
+            self.tree.delete(*removed)
+        for iid in removed:
+            del self.rows[iid]
+
+        inserted = updated = 0
+        for index, iid in enumerate(desired):
+            if iid not in self.rows:
+                self.tree.insert("", index, iid=iid, values=values[iid])
+                inserted += 1
+            elif self.rows[iid] != values[iid]:
+                self.tree.item(iid, values=values[iid])
+                updated += 1
+            self.rows[iid] = values[iid]
+
+        if list(self.tree.get_children()) != desired:
+            # Existing rows changed order on the server; move only what is out of place
+            for index, iid in enumerate(desired):
+                if self.tree.index(iid) != index:
+                    self.tree.move(iid, "", index)
+        self.order = desired
+
+        self.samples.append((len(desired), inserted, updated, len(removed), time.perf_counter() - start))
+        return inserted, updated, len(removed)
+
+    def stats(self):
+        """Return recent refresh costs so they can be compared against the row count."""
+        if not self.samples:
+            return {'refreshes': 0}
+        rows, inserted, updated, removed, seconds = self.samples[-1]
+        total_rows = sum(sample[0] for sample in self.samples)
+        total_seconds = sum(sample[4] for sample in self.samples)
+        return {
+            'refreshes': len(self.samples),
+            'last_rows': rows,
+            'last_changes': inserted + updated + removed,
+            'last_ms': 1000 * seconds,
+            'avg_ms': 1000 * total_seconds / len(self.samples),
+            'avg_us_per_row': 1e6 * total_seconds / total_rows if total_rows else 0.0,
+            'history': [(sample[0], sample[1] + sample[2] + sample[3], round(1000 * sample[4], 3))
+                        for sample in self.samples],
+        }
+
+
+class LogFeed:
+    """Local copy of one log endpoint, refreshed with conditional and incremental requests.
+
+    Every request carries If-None-Match / If-Modified-Since from the previous answer, so an
+    unchanged list costs a 304 with no body. If the server answers with an object holding
+    a 'cursor', later requests send it back as ?since=<cursor> and the returned logs are
+    merged into the local copy by id instead of replacing it. A merged copy is trimmed to
+    max_logs, or else to the length of the last full list, so it stays the server's window
+    instead of growing for as long as the kiosk runs.
+    """
+
+    def __init__(self, client, url, name, newest_first=True, max_logs=None):
+        self.client = client
+        self.url = url
+        self.name = name
+        self.newest_first = newest_first  # recent-logs lists newest first, /logs is chronological
+        self.lock = threading.Lock()
+        self.max_logs = max_logs
+        self.window = None  # Length of the last full list, the server's page size
+        self.logs = []
+        self.etag = None
+        self.last_modified = None
+        self.cursor = None
+        self.synced = False
+        self.not_modified = 0  # 304 answers so far; proves the server honours conditional requests
+        self.samples = deque(maxlen=100)  # (status, bytes, parse seconds) per refresh
+        self.bytes_total = 0
+
+    def refresh(self):
+        """Bring the local copy up to date. Returns True if the logs changed. Raises RequestException."""
+        headers = {}
+        params = {}
+        if self.synced:
+            if self.etag:
+                headers['If-None-Match'] = self.etag
+            if self.last_modified:
+                headers['If-Modified-Since'] = self.last_modified
+            if self.cursor is not None:
+                params['since'] = self.cursor
+
+        response = self.client.get(self.url, headers=headers, params=params)
+        if response.status_code == 304:
+            with self.lock:
+                self.not_modified += 1
+            self.record(304, 0, 0.0)
+            return False
+        response.raise_for_status()
+
+        size = int(response.headers.get('Content-Length') or len(response.content))
+        start = time.perf_counter()
+        payload = response.json()
+        parse_time = time.perf_counter() - start
+        self.record(response.status_code, size, parse_time)
+
+        with self.lock:
+            self.etag = response.headers.get('ETag')
+            self.last_modified = response.headers.get('Last-Modified')
+            if isinstance(payload, dict) and 'cursor' in payload:
+                changes = payload.get('logs', [])
+                if self.synced and self.cursor is not None:
+                    changed = self.merge(changes)
+                else:
+                    changed = changes != self.logs
+                    self.logs = list(changes)
+                    self.window = len(self.logs)
+                self.cursor = payload['cursor']
+            else:
+                logs = payload.get('logs', []) if isinstance(payload, dict) else payload
+                changed = logs != self.logs
+                self.logs = list(logs)
+            self.synced = True
+        return changed
+
+    def merge(self, changes):
+        """Merge changed logs into the local copy by id, keeping the feed's order."""
+        if not changes:
+            return False
+        by_id = {log.get('id'): index for index, log in enumerate(self.logs)}
+        fresh = []
+        for log in changes:
+            index = by_id.get(log.get('id'))
+            if index is None:
+                fresh.append(log)
+            else:
+                self.logs[index] = log
+        self.logs = fresh + self.logs if self.newest_first else self.logs + fresh
+        limit = self.max_logs or self.window
+        if limit and len(self.logs) > limit:
+            # Drop the oldest; the keyed table diff removes their rows
+            self.logs = self.logs[:limit] if self.newest_first else self.logs[-limit:]
+        return True
+
+    def record(self, status, size, parse_time):
+        with self.lock:
+            self.bytes_total += size
+            self.samples.append((status, size, parse_time))
+
+    def conditional(self):
+        """True once the server has answered a conditional request with a 304 and still sends validators."""
+        with self.lock:
+            return self.not_modified > 0 and bool(self.etag or self.last_modified)
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.logs)
+
+    def latest(self):
+        """Return the newest log, or None."""
+        with self.lock:
+            if not self.logs:
+                return None
+            return self.logs[0] if self.newest_first else self.logs[-1]
+
+    def stats(self):
+        with self.lock:
+            samples = list(self.samples)
+            total = self.bytes_total
+        if not samples:
+            return {'refreshes': 0}
+        return {
+            'refreshes': len(samples),
+            'not_modified': sum(1 for sample in samples if sample[0] == 304),
+            'last_bytes': samples[-1][1],
+            'avg_bytes': sum(sample[1] for sample in samples) / len(samples),
+            'avg_parse_ms': 1000 * sum(sample[2] for sample in samples) / len(samples),
+            'bytes_total': total,
+            'incremental': self.cursor is not None,
+        }
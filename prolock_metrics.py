@@ -0,0 +1,229 @@
+import bisect
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Seconds; covers a cached lookup (sub-millisecond) up to a request that hits its read timeout
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(names, values, extra=''):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def format_value(value):
+    if value is None:
+        return 'NaN'
+    if isinstance(value, bool):
+        return '1' if value else '0'
+    if isinstance(value, float) and math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class ShardedMetric:
+    """Base for metrics that hot paths update without a lock.
+
+    Every thread writes only to its own shard (a thread-local dict), so an update is a
+    plain dict operation with no contention. A scrape adds the shards together; the lock
+    is only taken when a thread touches the metric for the first time.
+    """
+
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.local = threading.local()
+        self.shards = []
+        self.shards_lock = threading.Lock()
+
+    def shard(self):
+        try:
+            return self.local.values
+        except AttributeError:
+            values = {}
+            with self.shards_lock:
+                self.shards.append(values)
+            self.local.values = values
+            return values
+
+    def snapshots(self):
+        with self.shards_lock:
+            shards = list(self.shards)
+        return [dict(shard) for shard in shards]  # dict() copies under the GIL, so a writer can't tear it
+
+
+class Counter(ShardedMetric):
+    kind = 'counter'
+
+    def inc(self, amount=1, labels=()):
+        values = self.shard()
+        values[labels] = values.get(labels, 0) + amount
+
+    def values(self):
+        totals = {}
+        for shard in self.snapshots():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def expose(self):
+        return [f"{self.name}{format_labels(self.label_names, labels)} {format_value(value)}"
+                for labels, value in sorted(self.values().items())]
+
+
+class Histogram(ShardedMetric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, labels=()):
+        values = self.shard()
+        entry = values.get(labels)
+        if entry is None:
+            entry = values[labels] = [0] * (len(self.buckets) + 1) + [0.0]  # Bucket counts, +Inf, then the sum
+        entry[bisect.bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def expose(self):
+        totals = {}
+        for shard in self.snapshots():
+            for labels, entry in shard.items():
+                entry = list(entry)
+                total = totals.setdefault(labels, [0] * len(entry))
+                for index, value in enumerate(entry):
+                    total[index] += value
+        lines = []
+        for labels, entry in sorted(totals.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), entry[:-1]):
+                cumulative += count
+                le = 'le="+Inf"' if math.isinf(bound) else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.label_names, labels)} {format_value(entry[-1])}")
+            lines.append(f"{self.name}_count{format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class Collected:
+    """A gauge or counter whose values are read from a callback at scrape time.
+
+    The callback returns a number, or a dict of label value tuples to numbers. Component
+    stats that are already kept elsewhere (queue depth, cache hit rate) cost nothing
+    until someone scrapes.
+    """
+
+    def __init__(self, name, help, kind, callback, labels=()):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.callback = callback
+        self.label_names = tuple(labels)
+
+    def expose(self):
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        return [f"{self.name}{format_labels(self.label_names, labels)} {format_value(value)}"
+                for labels, value in sorted(values.items()) if value is not None]
+
+
+class MetricsRegistry:
+    """Named counters, histograms and callback metrics, rendered in the Prometheus text format."""
+
+    def __init__(self, prefix='prolock_'):
+        self.prefix = prefix
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def register(self, metric):
+        with self.lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(self.prefix + name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(self.prefix + name, help, labels, buckets))
+
+    def gauge(self, name, help, callback, labels=()):
+        return self.register(Collected(self.prefix + name, help, 'gauge', callback, labels))
+
+    def counter_callback(self, name, help, callback, labels=()):
+        return self.register(Collected(self.prefix + name, help, 'counter', callback, labels))
+
+    def expose(self):
+        """Return every metric in the text exposition format. A failing callback skips only its metric."""
+        with self.lock:
+            metrics = list(self.metrics.values())
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.expose()
+            except Exception as e:
+                print(f"Metric {metric.name} failed: {e}")
+                continue
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """Serves a registry at GET /metrics on a small threaded HTTP server."""
+
+    def __init__(self, registry, host='127.0.0.1', port=9108):
+        self.registry = registry
+        self.server = ThreadingHTTPServer((host, port), self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def handler_class(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.expose().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,323 @@
+import json
+import queue
+import random
+import re
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+WEEKDAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+
+# (method, path pattern under /api, route name) for every endpoint the kiosk calls
+ROUTES = [
+    ('GET', r'/current-date-time', 'current_date_time'),
+    ('GET', r'/getuserbyfingerprint/(?P<id>[^/]+)', 'user_by_fingerprint'),
+    ('GET', r'/lab-schedules/fingerprint/(?P<id>[^/]+)', 'schedule_fingerprint'),
+    ('GET', r'/student/lab-schedule/rfid/(?P<id>[^/]+)', 'schedule_rfid'),
+    ('GET', r'/user-information/by-id-card', 'user_by_card'),
+    ('GET', r'/users/role/3', 'students'),
+    ('GET', r'/users/role/2', 'faculties'),
+    ('GET', r'/admin/role/1', 'admins'),
+    ('GET', r'/recent-logs', 'recent_logs'),
+    ('GET', r'/recent-logs/by-uid', 'recent_logs_by_uid'),
+    ('GET', r'/recent-logs/by-fingerid', 'recent_logs_by_fingerprint'),
+    ('GET', r'/logs', 'logs'),
+    ('GET', r'/door/events', 'door_events'),
+    ('PUT', r'/logs/time-in', 'time_in'),
+    ('PUT', r'/logs/time-out', 'time_out'),
+    ('PUT', r'/logs/time-out/bulk', 'time_out_bulk'),
+    ('PUT', r'/logs/time-in/fingerprint', 'time_in_fingerprint'),
+    ('PUT', r'/logs/time-out/fingerprint', 'time_out_fingerprint'),
+    ('PUT', r'/users/update-fingerprint', 'update_fingerprint'),
+]
+
+
+class Behaviour:
+    """Injected server behaviour for one route: fixed latency, uniform jitter and a failure rate."""
+
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, failure_status=503):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+
+
+class MockProLockApi:
+    """In-process stand-in for the ProLock Laravel API, for benchmarks and simulated runs.
+
+    Serves every endpoint in the kiosk's URL table from in-memory users, schedules and
+    logs, with per-route latency, jitter and failure injection. Writes honour the
+    Idempotency-Key header. Every user is scheduled all day, every day, so access
+    decisions always take the allowed path. /door/events is a Server-Sent Events stream
+    that carries the commands given to send_door_command(), with a heartbeat comment
+    every heartbeat_interval seconds.
+    """
+
+    def __init__(self, faculty_count=5, student_count=40, host='127.0.0.1', port=0, seed=0,
+                 default=None, routes=None, heartbeat_interval=15):
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.default = default or Behaviour()
+        self.behaviours = dict(routes or {})
+        self.faculty = [{'name': f"Faculty {index}", 'email': f"faculty{index}@example.edu",
+                         'fingerprint_id': [index]} for index in range(1, faculty_count + 1)]
+        self.students = [{'id_card_id': f"04{index:08x}", 'user_number': f"2024-{index:05d}",
+                          'user_name': f"Student {index}", 'year': str(1 + index % 4), 'block': "A"}
+                         for index in range(1, student_count + 1)]
+        self.logs = []  # Chronological
+        self.idempotency_keys = set()
+        self.heartbeat_interval = heartbeat_interval
+        self.door_streams = []  # One queue.SimpleQueue of pending events per connected stream
+        self.stopping = threading.Event()
+        self.counts = {}
+        self.server = ThreadingHTTPServer((host, port), self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api"
+
+    def student_uids(self):
+        return [student['id_card_id'] for student in self.students]
+
+    def fingerprint_ids(self):
+        return [faculty['fingerprint_id'][0] for faculty in self.faculty]
+
+    def set_behaviour(self, route=None, **options):
+        """Change latency/jitter/failure injection for one route, or the default when route is None."""
+        with self.lock:
+            if route is None:
+                self.default = Behaviour(**options)
+            else:
+                self.behaviours[route] = Behaviour(**options)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stopping.set()
+        with self.lock:
+            for stream in self.door_streams:
+                stream.put(None)  # Ends the stream
+        self.server.shutdown()
+        self.server.server_close()
+
+    def send_door_command(self, status):
+        """Push a remote open/close command to every connected door event stream. Returns the stream count."""
+        event = {'status': status, 'sent_at': time.time()}
+        with self.lock:
+            for stream in self.door_streams:
+                stream.put(event)
+            return len(self.door_streams)
+
+    def request_counts(self):
+        with self.lock:
+            return dict(self.counts)
+
+    def handler_class(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'  # Keep-alive, like the real server behind its proxy
+
+            def do_GET(self):
+                api.dispatch(self, 'GET')
+
+            def do_PUT(self):
+                api.dispatch(self, 'PUT')
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def dispatch(self, handler, method):
+        parsed = urlparse(handler.path)
+        path = parsed.path[len('/api'):] if parsed.path.startswith('/api') else parsed.path
+        query = {key: values[-1] for key, values in parse_qs(parsed.query).items()}
+        length = int(handler.headers.get('Content-Length') or 0)
+        body = handler.rfile.read(length) if length else b''
+
+        for route_method, pattern, name in ROUTES:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                break
+        else:
+            return self.respond(handler, 404, {'message': 'Not found'})
+
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+            behaviour = self.behaviours.get(name, self.default)
+            delay = max(behaviour.latency + self.rng.uniform(-behaviour.jitter, behaviour.jitter), 0.0)
+            failed = self.rng.random() < behaviour.failure_rate
+        if delay:
+            time.sleep(delay)
+        if failed:
+            return self.respond(handler, behaviour.failure_status, {'message': 'Injected failure'})
+
+        if name == 'door_events':
+            return self.stream_door_events(handler)
+
+        key = handler.headers.get('Idempotency-Key')
+        if method == 'PUT' and key:
+            with self.lock:
+                if key in self.idempotency_keys:
+                    return self.respond(handler, 200, {'message': 'Already applied'})
+                self.idempotency_keys.add(key)
+
+        payload = json.loads(body) if body else None
+        status, data = getattr(self, f'route_{name}')(match.groupdict(), query, payload)
+        self.respond(handler, status, data)
+
+    def respond(self, handler, status, data):
+        body = json.dumps(data).encode('utf-8')
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    # Route handlers, route_<name>: (path groups, query, JSON body) -> (status, response data)
+
+    def route_current_date_time(self, groups, query, payload):
+        now = datetime.now()
+        return 200, {'current_time': now.strftime("%H:%M:%S"), 'current_date': now.strftime("%Y-%m-%d"),
+                     'day_of_week': now.strftime("%A")}
+
+    def find_faculty(self, fingerprint_id):
+        for faculty in self.faculty:
+            if str(fingerprint_id) in [str(value) for value in faculty['fingerprint_id']]:
+                return faculty
+        return None
+
+    def find_student(self, uid):
+        for student in self.students:
+            if student['id_card_id'] == str(uid).lower():
+                return student
+        return None
+
+    def all_day_schedule(self):
+        return [{'day_of_the_week': day, 'class_start': "00:00", 'class_end': "23:59", 'is_makeup_class': 0,
+                 'specific_date': None} for day in WEEKDAYS]
+
+    def route_user_by_fingerprint(self, groups, query, payload):
+        faculty = self.find_faculty(groups['id'])
+        if faculty is None:
+            return 404, {'message': 'User not found'}
+        return 200, {'name': faculty['name'], 'email': faculty['email']}
+
+    def route_schedule_fingerprint(self, groups, query, payload):
+        return 200, self.all_day_schedule() if self.find_faculty(groups['id']) else []
+
+    def route_schedule_rfid(self, groups, query, payload):
+        return 200, self.all_day_schedule() if self.find_student(groups['id']) else []
+
+    def route_user_by_card(self, groups, query, payload):
+        student = self.find_student(query.get('id_card_id', ''))
+        if student is None:
+            return 404, {'message': 'Card not registered'}
+        return 200, {key: student[key] for key in ('user_number', 'user_name', 'year', 'block')}
+
+    def route_students(self, groups, query, payload):
+        return 200, self.students
+
+    def route_faculties(self, groups, query, payload):
+        return 200, self.faculty
+
+    def route_admins(self, groups, query, payload):
+        return 200, []
+
+    def route_recent_logs(self, groups, query, payload):
+        with self.lock:
+            return 200, list(reversed(self.logs[-50:]))
+
+    def route_recent_logs_by_uid(self, groups, query, payload):
+        uid = query.get('rfid_number')
+        with self.lock:
+            return 200, [log for log in self.logs if log.get('UID') == uid][-5:]
+
+    def route_recent_logs_by_fingerprint(self, groups, query, payload):
+        fingerprint_id = str(query.get('fingerprint_id'))
+        with self.lock:
+            return 200, [log for log in self.logs if str(log.get('fingerprint_id')) == fingerprint_id][-5:]
+
+    def route_logs(self, groups, query, payload):
+        with self.lock:
+            return 200, list(self.logs)
+
+    def stream_door_events(self, handler):
+        """Hold the request open as an event stream until the client disconnects or the server stops."""
+        stream = queue.SimpleQueue()
+        with self.lock:
+            self.door_streams.append(stream)
+        handler.close_connection = True  # No Content-Length: the body ends when the connection does
+        try:
+            handler.send_response(200)
+            handler.send_header('Content-Type', 'text/event-stream')
+            handler.send_header('Cache-Control', 'no-cache')
+            handler.end_headers()
+            handler.wfile.write(b': connected\n\n')
+            handler.wfile.flush()
+            while not self.stopping.is_set():
+                try:
+                    event = stream.get(timeout=self.heartbeat_interval)
+                except queue.Empty:
+                    handler.wfile.write(b': heartbeat\n\n')
+                else:
+                    if event is None:
+                        return
+                    handler.wfile.write(f"data: {json.dumps(event)}\n\n".encode('utf-8'))
+                handler.wfile.flush()
+        except OSError:
+            pass  # The kiosk went away
+        finally:
+            with self.lock:
+                self.door_streams.remove(stream)
+
+    def open_log(self, **fields):
+        with self.lock:
+            log = {'id': len(self.logs) + 1, 'date': datetime.now().strftime("%Y-%m-%d"), 'time_out': None,
+                   'status': 'close', **fields}
+            self.logs.append(log)
+        return 200, {'message': 'Time-In recorded', 'id': log['id']}
+
+    def close_log(self, field, value, time_out):
+        with self.lock:
+            for log in reversed(self.logs):
+                if str(log.get(field)) == str(value) and not log.get('time_out'):
+                    log['time_out'] = time_out
+                    return 200, {'message': 'Time-Out recorded'}
+        return 404, {'message': 'No open Time-In record'}
+
+    def route_time_in(self, groups, query, payload):
+        student = self.find_student(query.get('rfid_number', '')) or {}
+        return self.open_log(UID=query.get('rfid_number'), user_name=query.get('user_name'),
+                             user_number=student.get('user_number'), year=query.get('year'),
+                             block_name=student.get('block'), time_in=query.get('time_in'))
+
+    def route_time_out(self, groups, query, payload):
+        return self.close_log('UID', query.get('rfid_number'), query.get('time_out'))
+
+    def route_time_out_bulk(self, groups, query, payload):
+        payload = payload or {}
+        results = []
+        for uid in payload.get('rfid_numbers', []):
+            status, _ = self.close_log('UID', uid, payload.get('time_out'))
+            results.append({'rfid_number': uid, 'ok': status == 200})
+        return 200, {'results': results}
+
+    def route_time_in_fingerprint(self, groups, query, payload):
+        return self.open_log(fingerprint_id=query.get('fingerprint_id'), user_name=query.get('user_name'),
+                             time_in=query.get('time_in'))
+
+    def route_time_out_fingerprint(self, groups, query, payload):
+        return self.close_log('fingerprint_id', query.get('fingerprint_id'), query.get('time_out'))
+
+    def route_update_fingerprint(self, groups, query, payload):
+        return 200, {'message': 'Fingerprint updated'}
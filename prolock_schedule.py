@@ -0,0 +1,221 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import requests
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS slots (
+    kind TEXT NOT NULL,
+    credential TEXT NOT NULL,
+    weekday TEXT,
+    specific_date TEXT,
+    start_min INTEGER NOT NULL,
+    end_min INTEGER NOT NULL,
+    is_makeup INTEGER NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS slots_regular ON slots (kind, credential, weekday, start_min);
+CREATE INDEX IF NOT EXISTS slots_makeup ON slots (kind, credential, specific_date, start_min);
+CREATE TABLE IF NOT EXISTS credentials (
+    kind TEXT NOT NULL,
+    credential TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    PRIMARY KEY (kind, credential)
+);
+"""
+
+
+def to_minutes(value):
+    """Convert 'HH:MM' or 'HH:MM:SS' to minutes since midnight, or None if it can't be parsed."""
+    try:
+        parts = str(value).split(':')
+        return int(parts[0]) * 60 + int(parts[1])
+    except (ValueError, IndexError):
+        return None
+
+
+def parse_date(value):
+    """Return a 'YYYY-MM-DD' string for a valid specific_date, otherwise None."""
+    if not value or value == 'N/A':
+        return None
+    try:
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+# Result of one access check: allowed (bool), the matched schedule dict (or None) and a short reason
+ScheduleDecision = namedtuple('ScheduleDecision', ['allowed', 'slot', 'reason'])
+
+
+class ScheduleStore:
+    """Offline-first copy of the lab schedules, indexed by credential, weekday/date and start time.
+
+    Schedules are downloaded per credential (fingerprint ID or RFID UID) and kept in SQLite, so
+    access checks are an indexed local lookup and keep working while the API is unreachable.
+    """
+
+    def __init__(self, client, urls, path='prolock_schedules.db', refresh_interval=900):
+        self.client = client
+        self.urls = urls  # kind -> schedule URL prefix, e.g. {'rfid': LAB_SCHEDULE_URL}
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.stop_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Refresh every known credential in the background every refresh_interval seconds."""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self.sync_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        self.wake_event.set()
+
+    def sync_loop(self):
+        while not self.stop_event.is_set():
+            for kind, credential in self.stale_credentials(self.refresh_interval):
+                if self.stop_event.is_set():
+                    return
+                self.sync(kind, credential)
+            self.wake_event.wait(60)
+            self.wake_event.clear()
+
+    def stale_credentials(self, max_age):
+        cutoff = time.time() - max_age
+        with self.lock:
+            return self.db.execute(
+                "SELECT kind, credential FROM credentials WHERE synced_at < ?", (cutoff,)).fetchall()
+
+    def track(self, kind, credential):
+        """Register a credential so the background sync picks it up on its next pass."""
+        with self.lock:
+            self.db.execute("INSERT OR IGNORE INTO credentials VALUES (?, ?, 0)", (kind, str(credential)))
+            self.db.commit()
+        self.wake_event.set()
+
+    def is_known(self, kind, credential):
+        with self.lock:
+            row = self.db.execute("SELECT synced_at FROM credentials WHERE kind = ? AND credential = ?",
+                                  (kind, str(credential))).fetchone()
+        return row is not None and row[0] > 0
+
+    def sync(self, kind, credential):
+        """Download the schedules of one credential and replace the stored copy. Returns True on success."""
+        try:
+            response = self.client.get(f"{self.urls[kind]}{credential}")
+            response.raise_for_status()
+            schedules = response.json()
+        except (requests.RequestException, ValueError) as e:
+            print(f"Error syncing schedule for {kind} {credential}: {e}")
+            return False
+        self.replace(kind, credential, schedules if isinstance(schedules, list) else [])
+        return True
+
+    def replace(self, kind, credential, schedules):
+        """Replace all stored slots for a credential with the given API schedule list."""
+        credential = str(credential)
+        rows = []
+        for schedule in schedules:
+            start_min = to_minutes(schedule.get('class_start'))
+            end_min = to_minutes(schedule.get('class_end'))
+            if start_min is None or end_min is None:
+                continue
+            weekday = schedule.get('day_of_the_week')
+            specific_date = parse_date(schedule.get('specific_date'))
+            is_makeup = 1 if schedule.get('is_makeup_class') == 1 or (specific_date and not weekday) else 0
+            rows.append((kind, credential, weekday.lower() if weekday else None, specific_date,
+                         start_min, end_min, is_makeup, json.dumps(schedule)))
+
+        with self.lock:
+            with self.db:
+                self.db.execute("DELETE FROM slots WHERE kind = ? AND credential = ?", (kind, credential))
+                self.db.executemany("INSERT INTO slots VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                self.db.execute("INSERT OR REPLACE INTO credentials VALUES (?, ?, ?)",
+                                (kind, credential, time.time()))
+
+    def ensure(self, kind, credential):
+        """Make sure a credential has been synced at least once; later refreshes happen in the background."""
+        if self.is_known(kind, credential):
+            return True
+        # Sync inline first: replace() registers the credential with its real synced_at, so the
+        # background loop doesn't download it a second time. Only a failed sync is left to the loop.
+        if self.sync(kind, credential):
+            return True
+        self.track(kind, credential)
+        return False
+
+    def find_regular_slot(self, kind, credential, weekday, current_time):
+        """Return the regular weekly slot covering weekday/current_time, or None."""
+        minute = to_minutes(current_time)
+        with self.lock:
+            row = self.db.execute(
+                "SELECT payload FROM slots WHERE kind = ? AND credential = ? AND weekday = ? AND is_makeup = 0 "
+                "AND start_min <= ? AND end_min >= ? ORDER BY start_min DESC LIMIT 1",
+                (kind, str(credential), weekday.lower(), minute, minute)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def find_makeup_slot(self, kind, credential, current_date, current_time):
+        """Return the make-up slot on current_date ('YYYY-MM-DD') covering current_time, or None."""
+        minute = to_minutes(current_time)
+        with self.lock:
+            row = self.db.execute(
+                "SELECT payload FROM slots WHERE kind = ? AND credential = ? AND specific_date = ? "
+                "AND start_min <= ? AND end_min >= ? ORDER BY start_min DESC LIMIT 1",
+                (kind, str(credential), current_date, minute, minute)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def evaluate(self, kind, credential, weekday, current_date, current_time):
+        """Check make-up and regular slots together and return a ScheduleDecision.
+
+        The credential's schedule is downloaded at most once (the first time it is seen);
+        every other check is answered from the local store.
+        """
+        if not self.ensure(kind, credential):
+            return ScheduleDecision(False, None, 'schedule unavailable')
+
+        slot = self.find_makeup_slot(kind, credential, current_date, current_time)
+        if slot:
+            return ScheduleDecision(True, slot, 'make-up class')
+
+        slot = self.find_regular_slot(kind, credential, weekday, current_time)
+        if slot:
+            return ScheduleDecision(True, slot, 'regular class')
+
+        with self.lock:
+            has_slots = self.db.execute("SELECT 1 FROM slots WHERE kind = ? AND credential = ? LIMIT 1",
+                                        (kind, str(credential))).fetchone()
+        return ScheduleDecision(False, None, 'outside schedule' if has_slots else 'no schedule')
+
+    def active_credentials(self, kind, weekday, current_date, current_time, margin=15):
+        """Return the credentials with a regular or make-up slot within margin minutes of current_time.
+
+        Only credentials seen at this door before are in the store, which is what a door's
+        likely next users are anyway.
+        """
+        minute = to_minutes(current_time)
+        with self.lock:
+            rows = self.db.execute(
+                "SELECT DISTINCT credential FROM slots WHERE kind = ? "
+                "AND (specific_date = ? OR (weekday = ? AND is_makeup = 0)) "
+                "AND start_min - ? <= ? AND end_min + ? >= ?",
+                (kind, current_date, weekday.lower(), margin, minute, margin, minute)).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        """Stop the background sync and close the database once it has finished its current request."""
+        self.stop()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=5)
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,122 @@
+import threading
+import time
+from collections import deque, namedtuple
+
+from prolock_hal import FingerprintStatus
+
+# Result of one search: the sensor status, the matched slot and score (None/0 on a miss), and
+# which stage answered: 'hot' for a hit in the hot set, 'full' for the whole-library search
+SearchResult = namedtuple('SearchResult', ['status', 'finger_id', 'confidence', 'path'])
+
+
+class HotSetSearch:
+    """Searches the sensor's library in two stages: the hot set first, then everything.
+
+    The hot set is the slots of the people most likely to touch the sensor next (at the
+    kiosk, faculty with a class at this door around now). Search time grows with the number
+    of slots searched, so a hit in a few ranged searches over the hot slots answers much
+    sooner than a full search; a miss costs those ranged searches on top of the full one.
+    Hot slots are covered by at most max_ranges contiguous ranges, bridging gaps of up to
+    max_gap empty slots; when the ranges would cover more than max_share of the library the
+    hot stage is skipped, since it could no longer win. Run search() on the thread that
+    owns the sensor.
+    """
+
+    def __init__(self, backend, finger, max_ranges=3, max_gap=8, max_share=0.25, refresh_interval=300,
+                 history=500):
+        self.backend = backend
+        self.finger = finger
+        self.capacity = getattr(finger, 'library_size', None) or 127
+        self.max_ranges = max_ranges
+        self.max_gap = max_gap
+        self.max_share = max_share
+        self.refresh_interval = refresh_interval
+        self.lock = threading.Lock()
+        self.hot_slots = ()
+        self.ranges = []  # (start, count) pairs searched in the hot stage
+        self.refreshed_at = None  # Monotonic time of the last set_hot_slots()
+        self.subscribers = []
+        self.latencies = {'hot': deque(maxlen=history), 'full': deque(maxlen=history)}  # Seconds to a match
+        self.counters = {'hot_hits': 0, 'hot_misses': 0, 'full_searches': 0, 'full_hits': 0}
+
+    def subscribe(self, callback):
+        """Register callback(path, seconds, matched), called on the sensor thread after each search."""
+        self.subscribers.append(callback)
+
+    def due(self):
+        return self.refreshed_at is None or time.monotonic() - self.refreshed_at >= self.refresh_interval
+
+    def set_hot_slots(self, slots):
+        """Replace the hot set; slots outside the library are ignored."""
+        slots = sorted({slot for slot in slots if 0 <= slot < self.capacity})
+        ranges = self.cover(slots)
+        if sum(count for _, count in ranges) > self.max_share * self.capacity:
+            ranges = []
+        with self.lock:
+            self.hot_slots = tuple(slots)
+            self.ranges = ranges
+            self.refreshed_at = time.monotonic()
+
+    def cover(self, slots):
+        """Return the fewest (start, count) ranges, at most max_ranges, that cover the sorted slots."""
+        if not slots:
+            return []
+        runs = [[slots[0], slots[0]]]
+        for slot in slots[1:]:
+            if slot - runs[-1][1] - 1 <= self.max_gap:
+                runs[-1][1] = slot
+            else:
+                runs.append([slot, slot])
+        while len(runs) > self.max_ranges:
+            # Bridge the narrowest gap between neighbouring runs
+            index = min(range(len(runs) - 1), key=lambda i: runs[i + 1][0] - runs[i][1])
+            runs[index][1] = runs.pop(index + 1)[1]
+        return [(first, last - first + 1) for first, last in runs]
+
+    def search(self):
+        """Search char buffer 1, hot ranges first. Returns a SearchResult."""
+        start = time.monotonic()
+        with self.lock:
+            ranges = list(self.ranges)
+        for first, count in ranges:
+            if self.backend.search_range(self.finger, first, count) == FingerprintStatus.OK:
+                return self.finished('hot', start, FingerprintStatus.OK)
+        if ranges:
+            with self.lock:
+                self.counters['hot_misses'] += 1
+        return self.finished('full', start, self.finger.finger_search())
+
+    def finished(self, path, start, status):
+        seconds = time.monotonic() - start
+        matched = status == FingerprintStatus.OK
+        with self.lock:
+            if path == 'hot':
+                self.counters['hot_hits'] += 1
+            else:
+                self.counters['full_searches'] += 1
+                self.counters['full_hits'] += matched
+            if matched:
+                self.latencies[path].append(seconds)
+        if matched:
+            result = SearchResult(status, self.finger.finger_id, self.finger.confidence, path)
+        else:
+            result = SearchResult(status, None, 0, path)
+        for callback in self.subscribers:
+            try:
+                callback(path, seconds, matched)
+            except Exception as e:
+                print(f"Search subscriber failed: {e}")
+        return result
+
+    def stats(self):
+        """Return hit counts, the hot set and p50/p95 milliseconds to a match for each path."""
+        with self.lock:
+            stats = dict(self.counters)
+            latencies = {path: sorted(values) for path, values in self.latencies.items()}
+            stats['hot_slots'] = len(self.hot_slots)
+            stats['hot_ranges'] = list(self.ranges)
+        for path, values in latencies.items():
+            if values:
+                stats[f'{path}_match_p50_ms'] = round(1000 * values[len(values) // 2], 3)
+                stats[f'{path}_match_p95_ms'] = round(1000 * values[min(len(values) - 1, int(len(values) * 0.95))], 3)
+        return stats
@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from prolock_hal import DEFAULT_BAUDRATE, FingerprintStatus
+
+# The R30x accepts 9600 * N baud for N = 1..12; tried fastest first, and never below the factory rate
+BAUD_RATES = tuple(9600 * n for n in range(12, 5, -1))
+# Data packet sizes in bytes and their set_sysparam(6, code) codes
+PACKET_SIZE_CODES = {32: 0, 64: 1, 128: 2, 256: 3}
+PACKET_SIZES = (256, 128, 64, 32)
+DEFAULT_PACKET_SIZE = 128  # The R30x factory setting
+
+
+class SensorLink:
+    """Opens the fingerprint sensor and keeps its UART at the fastest settings that work.
+
+    The sensor keeps its baud rate (set_sysparam parameter 4) and data packet size
+    (parameter 6) in flash, so the host has to know them before it can talk to it. The
+    settings in use are persisted to path; open() tries them first, then the factory
+    rate, then every other rate. negotiate() steps through faster settings, keeping the
+    first that passes probes round trips (and a template transfer, when the sensor holds
+    one) and reverting otherwise. report_error() falls back to the factory rate after
+    repeated garbled packets and remembers the rate as unstable.
+    """
+
+    def __init__(self, backend, path='prolock_sensor_link.json', baud_rates=BAUD_RATES, packet_sizes=PACKET_SIZES,
+                 probes=20, error_limit=3, error_window=60):
+        self.backend = backend
+        self.path = path
+        self.baud_rates = tuple(baud_rates)
+        self.packet_sizes = tuple(packet_sizes)
+        self.probes = probes
+        self.error_limit = error_limit
+        self.error_window = error_window
+        self.lock = threading.Lock()
+        self.finger = None
+        self.settings = {'baudrate': DEFAULT_BAUDRATE, 'packet_size': None, 'negotiated_at': None, 'unstable': []}
+        self.errors = deque()
+        self.counters = {'opens': 0, 'open_failures': 0, 'negotiations': 0, 'probe_failures': 0, 'fallbacks': 0}
+        self.load()
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as link_file:
+                self.settings.update(json.load(link_file))
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable sensor link file: {e}")
+
+    def save(self):
+        if not self.path:
+            return
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as link_file:
+            json.dump(self.settings, link_file)
+        os.replace(temp_path, self.path)
+
+    def open(self):
+        """Connect at the stored baud rate, falling back to the others. Returns the sensor or None."""
+        stored = self.settings['baudrate']
+        for baudrate in dict.fromkeys((stored, DEFAULT_BAUDRATE) + self.baud_rates):
+            finger = self.backend.open_fingerprint(baudrate)
+            if finger is not None:
+                if baudrate != stored:
+                    print(f"Fingerprint sensor found at {baudrate} baud instead of the stored {stored}.")
+                    self.settings['baudrate'] = baudrate
+                    self.save()
+                self.finger = finger
+                self.counters['opens'] += 1
+                return finger
+            self.counters['open_failures'] += 1
+        return None
+
+    def probe(self, count=None, transfer=True):
+        """Run count read_sysparam() round trips and, if the sensor holds a template, one upload. False on any error."""
+        try:
+            for _ in range(count or self.probes):
+                if self.finger.read_sysparam() != FingerprintStatus.OK:
+                    raise RuntimeError("read_sysparam failed")
+            if transfer and self.finger.read_templates() == FingerprintStatus.OK and self.finger.templates:
+                if self.finger.load_model(self.finger.templates[0], 1) != FingerprintStatus.OK:
+                    raise RuntimeError("load_model failed")
+                self.finger.get_fpdata("char", 1)
+            return True
+        except RuntimeError as e:
+            self.counters['probe_failures'] += 1
+            print(f"Sensor link probe failed at {self.settings['baudrate']} baud: {e}")
+            return False
+
+    def has_template(self):
+        try:
+            return self.finger.read_templates() == FingerprintStatus.OK and bool(self.finger.templates)
+        except RuntimeError:
+            return False
+
+    def set_baudrate(self, baudrate, attempts=3):
+        """Tell the sensor to change rate, then follow with the host side. False if the sensor never acknowledged."""
+        for _ in range(attempts):
+            try:
+                self.finger.set_sysparam(4, baudrate // 9600)
+                break
+            except RuntimeError as e:
+                print(f"Failed to set sensor baud rate to {baudrate}: {e}")
+        else:
+            return False
+        self.backend.set_link_baudrate(self.finger, baudrate)
+        self.settings['baudrate'] = baudrate
+        return True
+
+    def set_packet_size(self, size):
+        try:
+            self.finger.set_sysparam(6, PACKET_SIZE_CODES[size])
+        except RuntimeError as e:
+            print(f"Failed to set sensor packet size to {size}: {e}")
+            return False
+        self.settings['packet_size'] = size
+        return True
+
+    def recover(self):
+        """Find the rate the sensor is at by switching only the host side. Returns True if found."""
+        for baudrate in dict.fromkeys((self.settings['baudrate'], DEFAULT_BAUDRATE) + self.baud_rates):
+            self.backend.set_link_baudrate(self.finger, baudrate)
+            self.settings['baudrate'] = baudrate
+            if self.probe(count=2, transfer=False):
+                return True
+        return False
+
+    def fall_back(self, baudrate):
+        """Return to baudrate after a failed probe; recovers by scanning if the sensor doesn't follow."""
+        failed = self.settings['baudrate']
+        if failed not in self.settings['unstable']:
+            self.settings['unstable'].append(failed)
+        if not (self.set_baudrate(baudrate) and self.probe(count=2, transfer=False)):
+            self.recover()
+
+    def negotiate(self):
+        """Move to the fastest baud rate and largest packet size that pass the probes, and store them.
+
+        Call from the thread that owns the sensor. Returns the settings in use afterwards.
+        """
+        with self.lock:
+            self.counters['negotiations'] += 1
+            start = time.monotonic()
+            for baudrate in self.baud_rates:
+                if baudrate in self.settings['unstable']:
+                    continue
+                current = self.settings['baudrate']
+                if baudrate == current:
+                    if self.probe():
+                        break
+                    continue
+                if not self.set_baudrate(baudrate):
+                    continue
+                if self.probe():
+                    break
+                self.fall_back(current)
+
+            # Packet size only matters for image and template transfers, so it can only be tested with a template
+            if self.has_template():
+                for size in self.packet_sizes:
+                    current = self.settings['packet_size']
+                    if size != current and not self.set_packet_size(size):
+                        continue
+                    if self.probe():
+                        break
+                    if current is not None and size != current:
+                        self.set_packet_size(current)
+            else:
+                print("No stored template to test packet sizes with; keeping the sensor's packet size.")
+
+            self.settings['negotiated_at'] = time.time()
+            self.save()
+            print(f"Sensor link negotiated in {time.monotonic() - start:.1f} s: "
+                  f"{self.settings['baudrate']} baud, {self.settings['packet_size']} byte packets")
+            return dict(self.settings)
+
+    def negotiate_if_needed(self):
+        if self.finger is not None and self.settings['negotiated_at'] is None:
+            self.negotiate()
+
+    def report_error(self):
+        """Count a garbled exchange; after error_limit within error_window, drop to the factory rate."""
+        now = time.monotonic()
+        with self.lock:
+            self.errors.append(now)
+            while self.errors and now - self.errors[0] > self.error_window:
+                self.errors.popleft()
+            if len(self.errors) < self.error_limit:
+                return False
+            self.errors.clear()
+            self.counters['fallbacks'] += 1
+            print(f"Repeated sensor errors at {self.settings['baudrate']} baud; falling back to {DEFAULT_BAUDRATE}.")
+            if self.settings['baudrate'] != DEFAULT_BAUDRATE:
+                self.fall_back(DEFAULT_BAUDRATE)
+            else:
+                self.recover()
+            self.save()
+            return True
+
+    def stats(self):
+        stats = dict(self.counters)  # No lock: a negotiation holds it for seconds
+        stats.update(baudrate=self.settings['baudrate'], packet_size=self.settings['packet_size'],
+                     unstable=list(self.settings['unstable']))
+        return stats
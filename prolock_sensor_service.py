@@ -0,0 +1,178 @@
+import itertools
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+# Job priorities, lowest first: an enrollment never waits behind scan polling or maintenance
+ENROLL, SCAN, MAINTENANCE = 0, 1, 2
+PRIORITY_NAMES = {ENROLL: 'enroll', SCAN: 'scan', MAINTENANCE: 'maintenance'}
+
+# Sensor attributes set by a command (finger_search, read_templates, ...) that clients read afterwards
+STATE_ATTRIBUTES = ('finger_id', 'confidence', 'templates', 'template_count', 'library_size')
+
+
+class SensorBusy(Exception):
+    """The sensor is claimed by another owner. Not a RuntimeError, so it is never counted as a link error."""
+
+
+class SensorLinkError(RuntimeError):
+    """A sensor job failed with a RuntimeError, which adafruit_fingerprint raises on a bad or missing reply.
+
+    Only errors raised on the sensor thread are wrapped, so callers can count link trouble
+    without mistaking failures of their own code (API, journal, door) for garbled packets.
+    """
+
+
+class SensorService:
+    """The one thread that talks to the fingerprint sensor.
+
+    Scanning, enrollment and maintenance submit commands (or whole command sequences)
+    as jobs on a priority queue and get a Future back, so packets from two callers can
+    never interleave on the UART. claim(owner) hands the sensor to one owner: jobs from
+    anyone else, queued or new, fail with SensorBusy at once, which is how the scan
+    loop learns to step aside for enrollment without being joined. A job submitted from
+    the service thread itself (a client used inside a whole-sequence job) runs inline.
+    """
+
+    def __init__(self, finger, history=500):
+        self.finger = finger
+        self.jobs = queue.PriorityQueue()
+        self.sequence = itertools.count()  # FIFO order within a priority
+        self.lock = threading.Lock()
+        self.owner = None
+        self.waits = {priority: deque(maxlen=history) for priority in PRIORITY_NAMES}
+        self.counters = {'commands': 0, 'rejected': 0, 'failed': 0, 'claims': 0}
+        self.running = True
+        self.thread = threading.Thread(target=self.serve, name='prolock-sensor', daemon=True)
+        self.thread.start()
+
+    def submit(self, fn, *args, priority=SCAN, owner=None, **kwargs):
+        """Queue fn(*args, **kwargs) to run on the sensor thread. Returns a Future."""
+        future = Future()
+        if threading.current_thread() is self.thread:
+            self.execute(fn, args, kwargs, future)
+            return future
+        with self.lock:
+            if not self.running or (self.owner is not None and owner != self.owner):
+                self.counters['rejected'] += 1
+                future.set_exception(SensorBusy(f"The fingerprint sensor is in use by {self.owner}" if self.running
+                                                else "The fingerprint sensor service is stopped"))
+                return future
+        self.jobs.put((priority, next(self.sequence), fn, args, kwargs, future, owner, time.monotonic()))
+        return future
+
+    def run(self, fn, *args, priority=SCAN, owner=None, **kwargs):
+        """Submit fn and wait for its result, re-raising its exception here."""
+        return self.submit(fn, *args, priority=priority, owner=owner, **kwargs).result()
+
+    def client(self, priority=SCAN, owner=None):
+        """Return a stand-in for the sensor whose commands run through this service."""
+        return SensorClient(self, priority, owner)
+
+    def claim(self, owner):
+        """Reserve the sensor for owner until release(owner); pending jobs of other owners fail with SensorBusy."""
+        with self.lock:
+            self.owner = owner
+            self.counters['claims'] += 1
+
+    def release(self, owner):
+        with self.lock:
+            if self.owner == owner:
+                self.owner = None
+
+    def serve(self):
+        while True:
+            priority, _, fn, args, kwargs, future, owner, queued_at = self.jobs.get()
+            if fn is None:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            with self.lock:
+                holder = self.owner
+                if holder is not None and owner != holder:
+                    self.counters['rejected'] += 1
+                else:
+                    self.waits[priority].append(time.monotonic() - queued_at)
+            if holder is not None and owner != holder:
+                future.set_exception(SensorBusy(f"The fingerprint sensor is in use by {holder}"))
+                continue
+            self.execute(fn, args, kwargs, future)
+
+    def execute(self, fn, args, kwargs, future):
+        try:
+            result = fn(*args, **kwargs)
+        except RuntimeError as e:
+            with self.lock:
+                self.counters['failed'] += 1
+            if not isinstance(e, SensorLinkError):
+                error, e = e, SensorLinkError(str(e))
+                e.__cause__ = error
+            future.set_exception(e)
+            return
+        except BaseException as e:
+            with self.lock:
+                self.counters['failed'] += 1
+            future.set_exception(e)
+            return
+        with self.lock:
+            self.counters['commands'] += 1
+        future.set_result(result)
+
+    def queue_depth(self):
+        return self.jobs.qsize()
+
+    def close(self):
+        """Stop the sensor thread after the jobs already queued ahead of the stop marker."""
+        if self.running:
+            self.running = False
+            self.jobs.put((MAINTENANCE + 1, next(self.sequence), None, (), {}, None, None, 0.0))
+            self.thread.join(timeout=5)
+
+    def stats(self):
+        """Return job counts and the p50/p95 queue wait in milliseconds per priority."""
+        with self.lock:
+            stats = dict(self.counters)
+            waits = {priority: sorted(values) for priority, values in self.waits.items()}
+            stats['owner'] = self.owner
+        for priority, values in waits.items():
+            if values:
+                stats[f'{PRIORITY_NAMES[priority]}_wait_p50_ms'] = round(1000 * values[len(values) // 2], 3)
+                stats[f'{PRIORITY_NAMES[priority]}_wait_p95_ms'] = round(
+                    1000 * values[min(len(values) - 1, int(len(values) * 0.95))], 3)
+        stats['queued'] = self.queue_depth()
+        return stats
+
+
+class SensorClient:
+    """Looks like the sensor to FingerprintCapture and the enrollment code, but queues every command.
+
+    Attributes a command sets on the sensor (finger_id after finger_search, ...) are
+    copied into the client on the sensor thread as the command finishes, so the caller
+    reads its own result even if another caller's command runs right after.
+    """
+
+    def __init__(self, service, priority, owner):
+        self.service = service
+        self.priority = priority
+        self.owner = owner
+
+    def __getattr__(self, name):
+        value = getattr(self.service.finger, name)
+        if not callable(value):
+            return value
+
+        def command(*args, **kwargs):
+            return self.service.run(self.call, value, args, kwargs, priority=self.priority, owner=self.owner)
+
+        command.__name__ = name
+        return command
+
+    def call(self, method, args, kwargs):
+        result = method(*args, **kwargs)
+        finger = self.service.finger
+        for name in STATE_ATTRIBUTES:
+            if hasattr(finger, name):
+                self.__dict__[name] = getattr(finger, name)
+        return result
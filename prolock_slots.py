@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+import time
+
+from prolock_hal import FingerprintStatus
+
+
+class SlotAllocator:
+    """Hands out free fingerprint sensor slots from a persisted occupancy bitmap.
+
+    The bitmap is an int with bit n set when slot n holds a template (or is reserved for
+    an enrollment in progress). The lowest free slot is the lowest clear bit, found with
+    two integer operations instead of a read_templates() over the UART, so opening
+    enrollment costs nothing and slots freed on the sensor are reused. The bitmap is
+    rebuilt from read_templates() by reconcile(), which the owner of the sensor calls when
+    the UART is otherwise idle; allocate() only talks to the sensor if no bitmap has ever
+    been loaded.
+    """
+
+    def __init__(self, finger, path='prolock_slots.json', capacity=None, first_slot=1,
+                 reconcile_interval=24 * 3600):
+        self.finger = finger
+        self.path = path
+        self.capacity = capacity or getattr(finger, 'library_size', None) or 127
+        self.first_slot = first_slot  # Slots below this are never handed out (ID 0 reads as "no ID" upstream)
+        self.reconcile_interval = reconcile_interval
+        self.lock = threading.Lock()
+        self.occupied = None  # Bitmap; None until loaded from disk or read from the sensor
+        self.reserved = set()  # Allocated but not yet committed
+        self.reconciled_at = None  # Wall clock time of the last read_templates()
+        self.retry_at = 0.0  # Monotonic time before which a failed reconcile is not retried
+        self.counters = {'allocations': 0, 'commits': 0, 'releases': 0, 'reconciles': 0, 'reconcile_changes': 0}
+        self.load()
+
+    def blocked_mask(self):
+        """Bits for the low slots that are never handed out."""
+        return (1 << self.first_slot) - 1
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as slots_file:
+                stored = json.load(slots_file)
+            occupied = int(stored['occupied'], 16)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Ignoring unreadable fingerprint slot file: {e}")
+            return
+        if stored.get('capacity') != self.capacity:
+            print("Fingerprint slot file is for a different sensor capacity; it will be rebuilt from the sensor.")
+            return
+        with self.lock:
+            self.occupied = occupied
+            self.reconciled_at = stored.get('reconciled_at')
+
+    def save(self):
+        if not self.path:
+            return
+        with self.lock:
+            if self.occupied is None:
+                return
+            stored = {'capacity': self.capacity, 'occupied': format(self.occupied, 'x'),
+                      'reconciled_at': self.reconciled_at}
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as slots_file:
+            json.dump(stored, slots_file)
+        os.replace(temp_path, self.path)
+
+    def lowest_free(self, occupied):
+        used = occupied | self.blocked_mask()
+        slot = ((~used) & (used + 1)).bit_length() - 1  # Isolate the lowest clear bit
+        return slot if slot < self.capacity else None
+
+    def allocate(self):
+        """Reserve and return the lowest free slot, or None when the sensor library is full.
+
+        Reads the sensor only if there is no bitmap yet, so call it from a thread that owns
+        the sensor.
+        """
+        if self.occupied is None:
+            self.reconcile()
+        with self.lock:
+            slot = self.lowest_free(self.occupied | self.reserved_mask())
+            if slot is None:
+                return None
+            self.reserved.add(slot)
+            self.counters['allocations'] += 1
+            return slot
+
+    def reserved_mask(self):
+        mask = 0
+        for slot in self.reserved:
+            mask |= 1 << slot
+        return mask
+
+    def commit(self, slot):
+        """Mark an allocated slot as holding a template after store_model() succeeded."""
+        with self.lock:
+            self.reserved.discard(slot)
+            self.occupied = (self.occupied or 0) | (1 << slot)
+            self.counters['commits'] += 1
+        self.save()
+
+    def release(self, slot):
+        """Give back an allocated slot whose enrollment failed."""
+        with self.lock:
+            self.reserved.discard(slot)
+            self.counters['releases'] += 1
+
+    def mark_free(self, slot):
+        """Record that the template in slot was deleted from the sensor."""
+        with self.lock:
+            if self.occupied is not None:
+                self.occupied &= ~(1 << slot)
+        self.save()
+
+    def reconcile(self):
+        """Rebuild the bitmap from the sensor's template index. Returns True if it was read."""
+        if self.finger.read_templates() != FingerprintStatus.OK:
+            print("Failed to read the fingerprint template index; keeping the stored slot map.")
+            self.retry_at = time.monotonic() + 300
+            with self.lock:
+                if self.occupied is None:
+                    self.occupied = 0  # Nothing known; store_model() reports a clash as a failed enrollment
+            return False
+        occupied = 0
+        for slot in self.finger.templates:
+            if 0 <= slot < self.capacity:
+                occupied |= 1 << slot
+        with self.lock:
+            if self.occupied is not None and self.occupied != occupied:
+                self.counters['reconcile_changes'] += 1
+                print(f"Fingerprint slot map corrected from the sensor: "
+                      f"{bin(self.occupied).count('1')} -> {bin(occupied).count('1')} slots in use")
+            self.occupied = occupied
+            self.reconciled_at = time.time()
+            self.counters['reconciles'] += 1
+        self.save()
+        return True
+
+    def reconcile_due(self):
+        if time.monotonic() < self.retry_at:
+            return False
+        return self.reconciled_at is None or time.time() - self.reconciled_at >= self.reconcile_interval
+
+    def reconcile_if_due(self):
+        """Reconcile when the bitmap was never read from the sensor or is older than reconcile_interval."""
+        if self.reconcile_due():
+            return self.reconcile()
+        return False
+
+    def free_count(self):
+        with self.lock:
+            if self.occupied is None:
+                return None
+            used = self.occupied | self.blocked_mask() | self.reserved_mask()
+        return self.capacity - bin(used & ((1 << self.capacity) - 1)).count('1')
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats['reconciled_age'] = time.time() - self.reconciled_at if self.reconciled_at else None
+        stats['capacity'] = self.capacity
+        stats['free'] = self.free_count()
+        return stats
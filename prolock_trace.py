@@ -0,0 +1,179 @@
+import json
+import threading
+import time
+from collections import deque
+
+
+class Trace:
+    """Timed stages of one scan or tap. Times are time.monotonic() seconds."""
+
+    __slots__ = ('kind', 'started', 'wall_started', 'spans', 'attrs', 'outcome', 'ended')
+
+    def __init__(self, kind, started, attrs):
+        self.kind = kind
+        self.started = started
+        self.wall_started = time.time() - (time.monotonic() - started)
+        self.spans = []  # (name, start, end)
+        self.attrs = attrs
+        self.outcome = None
+        self.ended = None
+
+    def add_span(self, name, start, end):
+        self.spans.append((name, start, end))
+
+    def last_end(self):
+        return self.spans[-1][2] if self.spans else self.started
+
+    def total(self):
+        return (self.ended or time.monotonic()) - self.started
+
+    def to_dict(self):
+        return {
+            'kind': self.kind,
+            'started': round(self.wall_started, 3),
+            'outcome': self.outcome,
+            'total_ms': round(1000 * self.total(), 3),
+            'attrs': self.attrs,
+            'spans': [{'name': name, 'offset_ms': round(1000 * (start - self.started), 3),
+                       'ms': round(1000 * (end - start), 3)} for name, start, end in self.spans],
+        }
+
+
+class Span:
+    """Context manager that adds one span to a trace when the block exits."""
+
+    __slots__ = ('trace', 'name', 'start')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.monotonic()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.trace.spans.append((self.name, self.start, time.monotonic()))
+        return False
+
+
+class NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Tracer:
+    """Records per-stage timings of the scan pipeline into a ring buffer of recent traces.
+
+    Each reader thread has at most one trace in progress (a thread-local), so pipeline
+    methods can wrap a stage in `with tracer.span('name'):` without passing the trace
+    around. A span costs two clock reads and a list append; with no trace in progress or
+    the tracer disabled it is a shared no-op.
+    """
+
+    def __init__(self, capacity=200, enabled=True):
+        self.enabled = enabled
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.traces = deque(maxlen=capacity)
+        self.finished = 0
+        self.subscribers = []
+
+    def subscribe(self, callback):
+        """Register callback(trace), called on the reader thread after each trace finishes."""
+        self.subscribers.append(callback)
+
+    def start(self, kind, started_at=None, **attrs):
+        """Begin a trace on this thread, finishing any trace it left open. Returns the trace or None."""
+        if not self.enabled:
+            return None
+        if getattr(self.local, 'trace', None) is not None:
+            self.finish('abandoned')
+        trace = Trace(kind, time.monotonic() if started_at is None else started_at, attrs)
+        self.local.trace = trace
+        return trace
+
+    def current(self):
+        return getattr(self.local, 'trace', None)
+
+    def span(self, name):
+        trace = getattr(self.local, 'trace', None)
+        return NULL_SPAN if trace is None else Span(trace, name)
+
+    def mark(self, name):
+        """Close a span that started where the previous one ended (or at the trace start) and ends now."""
+        trace = getattr(self.local, 'trace', None)
+        if trace is not None:
+            trace.spans.append((name, trace.last_end(), time.monotonic()))
+
+    def set(self, **attrs):
+        """Attach attributes (e.g. the credential) to this thread's trace."""
+        trace = getattr(self.local, 'trace', None)
+        if trace is not None:
+            trace.attrs.update(attrs)
+
+    def finish(self, outcome=None):
+        """Close this thread's trace and keep it in the ring buffer. Returns the trace or None."""
+        trace = getattr(self.local, 'trace', None)
+        if trace is None:
+            return None
+        self.local.trace = None
+        trace.ended = time.monotonic()
+        if trace.outcome is None:
+            trace.outcome = outcome or 'done'
+        with self.lock:
+            self.traces.append(trace)
+            self.finished += 1
+        for callback in self.subscribers:
+            try:
+                callback(trace)
+            except Exception as e:
+                print(f"Trace subscriber failed: {e}")
+        return trace
+
+    def set_outcome(self, outcome):
+        """Record the outcome now; finish() keeps it instead of the caller's default."""
+        trace = getattr(self.local, 'trace', None)
+        if trace is not None:
+            trace.outcome = outcome
+
+    def recent(self, limit=None):
+        """Return finished traces as dicts, newest first."""
+        with self.lock:
+            traces = list(self.traces)
+        traces.reverse()
+        return [trace.to_dict() for trace in traces[:limit]]
+
+    def export_jsonl(self, path):
+        """Append the buffered traces to path, one JSON object per line. Returns the number written."""
+        traces = self.recent()
+        traces.reverse()  # Oldest first, like a log
+        with open(path, 'a', encoding='utf-8') as export_file:
+            for trace in traces:
+                export_file.write(json.dumps(trace, separators=(',', ':')) + '\n')
+        return len(traces)
+
+    def stats(self):
+        """Return p50/p95 milliseconds per stage and for whole traces, over the buffered traces."""
+        with self.lock:
+            traces = list(self.traces)
+        stages = {}
+        for trace in traces:
+            for name, start, end in trace.spans:
+                stages.setdefault(name, []).append(end - start)
+            stages.setdefault('total', []).append(trace.ended - trace.started)
+
+        def summary(values):
+            values.sort()
+            return {'count': len(values), 'p50_ms': round(1000 * values[len(values) // 2], 3),
+                    'p95_ms': round(1000 * values[min(len(values) - 1, int(len(values) * 0.95))], 3)}
+
+        return {'finished': self.finished, 'stages': {name: summary(values) for name, values in stages.items()}}
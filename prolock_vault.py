@@ -0,0 +1,195 @@
+"""Back up fingerprint templates off the sensor and restore them onto a replacement.
+
+Run with the kiosk stopped, since the sensor answers one program at a time:
+
+    python prolock_vault.py backup [--vault prolock_templates.vault]
+    python prolock_vault.py restore [--no-verify] [--slots 1 2 3]
+
+PROLOCK_HAL=sim runs against the simulated sensor.
+"""
+import argparse
+import os
+import struct
+import time
+import zlib
+
+from prolock_hal import FingerprintStatus, create_backend
+from prolock_sensor_link import SensorLink
+
+MAGIC = b'PLV1'
+HEADER = struct.Struct('<4sIH')  # Magic, saved at (unix seconds), record count
+RECORD = struct.Struct('<HHI')  # Slot, template length, CRC-32 of the template
+
+
+class TemplateVault:
+    """Fingerprint templates by sensor slot, kept in a compact binary file.
+
+    Each template is stored with its CRC-32, which is checked when the file is read
+    and again after a restore, against the copy read back from the sensor. The file holds
+    biometric data, so it is written readable by its owner only.
+    """
+
+    def __init__(self, path='prolock_templates.vault'):
+        self.path = path
+        self.templates = {}  # Slot -> template bytes
+        self.saved_at = None
+        if path and os.path.exists(path):
+            self.load()
+
+    def load(self):
+        with open(self.path, 'rb') as vault_file:
+            data = vault_file.read()
+        magic, saved_at, count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a template vault")
+        offset = HEADER.size
+        templates = {}
+        for _ in range(count):
+            slot, length, crc = RECORD.unpack_from(data, offset)
+            offset += RECORD.size
+            template = data[offset:offset + length]
+            offset += length
+            if len(template) != length or zlib.crc32(template) != crc:
+                print(f"Template for slot {slot} is damaged in {self.path}; skipping it.")
+                continue
+            templates[slot] = template
+        self.templates = templates
+        self.saved_at = saved_at
+
+    def save(self):
+        self.saved_at = int(time.time())
+        parts = [HEADER.pack(MAGIC, self.saved_at, len(self.templates))]
+        for slot, template in sorted(self.templates.items()):
+            parts.append(RECORD.pack(slot, len(template), zlib.crc32(template)))
+            parts.append(template)
+        temp_path = self.path + '.tmp'
+        descriptor = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, 'wb') as vault_file:
+            vault_file.write(b''.join(parts))
+            vault_file.flush()
+            os.fsync(vault_file.fileno())
+        os.replace(temp_path, self.path)
+
+    def read_template(self, finger, slot):
+        """Load one template from sensor flash into char buffer 1 and upload it. Returns bytes or None."""
+        if finger.load_model(slot, 1) != FingerprintStatus.OK:
+            return None
+        return bytes(finger.get_fpdata("char", 1))
+
+    def backup(self, finger, slots=None, progress=None):
+        """Copy templates from the sensor into the vault and save it; slots defaults to every stored template.
+
+        progress(done, total, slot, ok) is called after each template. Returns a report dict.
+        """
+        if slots is None:
+            if finger.read_templates() != FingerprintStatus.OK:
+                raise RuntimeError("Failed to read the sensor's template index")
+            slots = list(finger.templates)
+        report = Transfer('backup', len(slots))
+        for slot in slots:
+            try:
+                template = self.read_template(finger, slot)
+            except Exception as e:
+                print(f"Failed to read template {slot}: {e}")
+                template = None
+            if template is not None:
+                self.templates[slot] = template
+            report.add(slot, template, progress)
+        self.save()
+        return report.finish()
+
+    def restore(self, finger, slots=None, verify=True, progress=None):
+        """Write vault templates to the sensor in their original slots, back to back.
+
+        With verify, each stored template is read back and compared by CRC-32, which
+        doubles the UART traffic. Returns a report dict; failed slots are listed in it.
+        """
+        slots = sorted(self.templates) if slots is None else [slot for slot in slots if slot in self.templates]
+        report = Transfer('restore', len(slots))
+        for slot in slots:
+            template = self.templates[slot]
+            try:
+                ok = (finger.send_fpdata(list(template), "char", 1)
+                      and finger.store_model(slot, 1) == FingerprintStatus.OK)
+                if ok and verify:
+                    copy = self.read_template(finger, slot)
+                    ok = copy is not None and zlib.crc32(copy) == zlib.crc32(template)
+            except Exception as e:
+                print(f"Failed to restore template {slot}: {e}")
+                ok = False
+            report.add(slot, template if ok else None, progress, verified=verify and ok)
+        return report.finish()
+
+    def upload(self, client, url):
+        """Send the saved vault file to the server; raises requests.RequestException."""
+        with open(self.path, 'rb') as vault_file:
+            response = client.put(url, data=vault_file.read(),
+                                  headers={'Content-Type': 'application/octet-stream'})
+        response.raise_for_status()
+        return response
+
+
+class Transfer:
+    """Progress and throughput of one backup or restore."""
+
+    def __init__(self, kind, total):
+        self.kind = kind
+        self.total = total
+        self.done = 0
+        self.verified = 0
+        self.failed = []
+        self.bytes = 0
+        self.started = time.monotonic()
+
+    def add(self, slot, template, progress, verified=False):
+        self.done += 1
+        if template is None:
+            self.failed.append(slot)
+        else:
+            self.bytes += len(template)
+            self.verified += verified
+        if progress:
+            progress(self.done, self.total, slot, template is not None)
+
+    def finish(self):
+        seconds = time.monotonic() - self.started
+        return {
+            'kind': self.kind,
+            'templates': self.done - len(self.failed),
+            'failed': self.failed,
+            'verified': self.verified,
+            'bytes': self.bytes,
+            'seconds': round(seconds, 3),
+            'templates_per_s': round((self.done - len(self.failed)) / seconds, 2) if seconds else None,
+            'bytes_per_s': round(self.bytes / seconds) if seconds else None,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('action', choices=('backup', 'restore'))
+    parser.add_argument('--vault', default='prolock_templates.vault', help="Vault file to write or read")
+    parser.add_argument('--slots', type=int, nargs='+', help="Only these sensor slots")
+    parser.add_argument('--no-verify', action='store_true', help="Skip reading each restored template back")
+    args = parser.parse_args()
+
+    finger = SensorLink(create_backend()).open()  # At whatever baud rate the kiosk negotiated
+    if finger is None:
+        raise SystemExit("The fingerprint sensor is not connected.")
+    vault = TemplateVault(args.vault)
+
+    def progress(done, total, slot, ok):
+        print(f"\r{args.action}: {done}/{total} (slot {slot} {'ok' if ok else 'FAILED'})", end='', flush=True)
+
+    if args.action == 'backup':
+        report = vault.backup(finger, slots=args.slots, progress=progress)
+    else:
+        if not vault.templates:
+            raise SystemExit(f"No templates in {args.vault}.")
+        report = vault.restore(finger, slots=args.slots, verify=not args.no_verify, progress=progress)
+    print()
+    print(report)
+
+
+if __name__ == '__main__':
+    main()